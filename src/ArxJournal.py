@@ -0,0 +1,189 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Append-only journal of changes to an archive index (.arx) file.
+'''
+
+import os
+import ujson as json
+
+
+JOURNAL_EXT = '.arj'
+
+
+class JournalConflict(Exception):
+    pass
+
+
+def journalPath(index_file) :
+    '''
+    Name of the journal kept next to the given arx file
+    '''
+    return os.path.splitext(index_file)[0] + JOURNAL_EXT
+
+def writeIndex(index_file, arx, sync=True) :
+    '''
+    Write an archive index, replacing any existing one atomically
+    '''
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'w') as fout :
+        # Write it to be relatively human-readable
+        fout.write(json.dumps(arx, sort_keys=True, indent=4))
+        if sync :
+            fout.flush()
+            os.fsync(fout.fileno())
+    os.replace(tmp_file, index_file)
+
+
+class ArxJournal(object) :
+    '''
+    Journal of the file bounds that changed in an archive index, stored next
+    to it as an .arj file.
+
+    Each commit appends a single line: a JSON list of [field, n, bound] set
+    operations, where field is 'finished' (setting or appending the n-th
+    finished bound) or 'unfinished' (n is null). A commit only writes the
+    bounds that changed since the last one, so it costs the same however
+    long the archive's history.
+
+    The full index is the arx file with the journal replayed over it. Once
+    the journal grows long enough it's compacted: the merged index is
+    written to a temporary file and renamed over the arx, then the journal
+    is dropped. Operations set absolute values, so replaying a journal that
+    was already compacted in is harmless, and a line torn by a crash only
+    loses that one commit.
+
+    Each instance keeps track of how long it last saw the journal; a commit
+    that finds it grew past that (another TweetArchive on the same index
+    appended to it) raises JournalConflict rather than cut those entries off.
+    '''
+
+    COMPACT_ENTRIES = 256
+
+    def __init__(self, index_file, compact_entries=None, sync=True) :
+        self.index_file = index_file
+        self.journal_file = journalPath(index_file)
+        self.compact_entries = self.COMPACT_ENTRIES if compact_entries is None else compact_entries
+        self.sync = sync
+        self.num_entries = 0
+        self.size = 0               # End of the last good entry
+        self.seen = 0               # Length of the journal when we last looked
+        self.committed = {'finished' : [], 'unfinished' : None}
+
+    def exists(self) :
+        return os.path.exists(self.journal_file)
+
+    def load(self, arx) :
+        '''
+        Replay the journal over an arx loaded from disk, in place. Stops at
+        the first damaged entry; everything from there on is discarded by
+        the next commit.
+        '''
+        self.num_entries = 0; self.size = 0; self.seen = 0
+        try :
+            with open(self.journal_file, 'rb') as fopen :
+                self.seen = os.fstat(fopen.fileno()).st_size
+                for line in fopen :
+                    if not line.endswith(b'\n') :
+                        break
+                    try :
+                        if not self.apply(arx, json.loads(line)) :
+                            break
+                    except (ValueError, TypeError) :
+                        break
+                    self.num_entries += 1
+                    self.size += len(line)
+        except FileNotFoundError :
+            pass
+        self.snapshot(arx)
+        return arx
+
+    @staticmethod
+    def apply(arx, ops) :
+        '''
+        Apply one journal entry to an arx. False if it doesn't fit the arx.
+        '''
+        for field, n, bound in ops :
+            if field == 'unfinished' :
+                arx['unfinished'] = bound
+            elif field == 'finished' and n < len(arx['finished']) :
+                arx['finished'][n] = bound
+            elif field == 'finished' and n == len(arx['finished']) :
+                arx['finished'].append(bound)
+            else :
+                return False
+        return True
+
+    def snapshot(self, arx) :
+        '''
+        Remember the arx's bounds as committed
+        '''
+        self.committed = {'finished' : [tuple(bound) for bound in arx['finished']],
+                          'unfinished' : None if arx['unfinished'] is None else tuple(arx['unfinished'])}
+
+    def changes(self, arx) :
+        '''
+        Set operations taking the committed bounds to the arx's, or None if
+        they can't be expressed that way (finished files were dropped)
+        '''
+        committed = self.committed['finished']
+        finished = arx['finished']
+        if len(finished) < len(committed) :
+            return None
+        ops = [['finished', n, list(bound)] for n, bound in enumerate(finished)
+               if n >= len(committed) or tuple(bound) != committed[n]]
+        unfin = arx['unfinished']
+        if (None if unfin is None else tuple(unfin)) != self.committed['unfinished'] :
+            ops.append(['unfinished', None, None if unfin is None else list(unfin)])
+        return ops
+
+    def commit(self, arx) :
+        '''
+        Journal the arx's changes since the last commit, compacting the
+        journal into the arx file when it's due. Raises JournalConflict if
+        someone else appended to the journal since we last read or wrote it.
+        '''
+        ops = self.changes(arx)
+        if ops == [] :
+            return
+        if ops is None or self.num_entries + 1 >= self.compact_entries :
+            self.compact(arx)
+            return
+
+        entry = json.dumps(ops).encode('utf-8') + b'\n'
+        with open(self.journal_file, 'ab') as fout :
+            # Cut off anything past the last good entry (e.g. a torn line),
+            # as long as it's only what we saw there ourselves
+            end = fout.tell()
+            if end > self.seen :
+                raise JournalConflict('Index journal ' + self.journal_file + ' was appended to by another writer')
+            if end > self.size :
+                fout.truncate(self.size)
+            fout.write(entry)
+            if self.sync :
+                fout.flush()
+                os.fsync(fout.fileno())
+        self.num_entries += 1
+        self.size += len(entry)
+        self.seen = self.size
+        self.snapshot(arx)
+
+    def compact(self, arx) :
+        '''
+        Write the whole arx to its file atomically and start a fresh journal
+        '''
+        writeIndex(self.index_file, arx, self.sync)
+        self.remove()
+        self.snapshot(arx)
+
+    def remove(self) :
+        '''
+        Delete the journal
+        '''
+        try :
+            os.remove(self.journal_file)
+        except FileNotFoundError :
+            pass
+        self.num_entries = 0; self.size = 0; self.seen = 0
@@ -0,0 +1,552 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Compact array-backed graph for Collective Influence computations.
+'''
+
+from multiprocessing import shared_memory
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+
+class CIGraph(object) :
+    '''
+    Directed graph stored as forward and reverse CSR arrays over contiguous
+    int32 node IDs, for Collective Influence.
+
+    Nodes are numbered in sorted order of their labels (where labels can be
+    sorted), so ties between equal CI values break the same way they do for
+    the labels themselves. Removing a node only flips its bit in the removed
+    mask and updates the degree arrays; the CSR arrays never change.
+
+    share() moves the arrays into shared memory so that worker processes can
+    attach() to the same graph without copying it, and see nodes removed by
+    the parent as they go.
+    '''
+
+    SHARED_ARRAYS = ('out_ptr', 'out_idx', 'in_ptr', 'in_idx', 'out_deg', 'in_deg', 'removed')
+
+    def __init__(self, src, dst, labels) :
+        '''
+        Constructor:
+        Build the graph from parallel arrays of edge endpoints, given as node
+        IDs in range(len(labels)). Duplicate edges must already be removed.
+        '''
+        num_nodes = len(labels)
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+
+        self.labels = labels
+        self.num_nodes = num_nodes
+        self.num_edges = len(src)
+        self._label_ids = None
+
+        # Forward (successor) and reverse (predecessor) adjacency
+        self.out_ptr, self.out_idx = self._buildCSR(src, dst, num_nodes)
+        self.in_ptr, self.in_idx = self._buildCSR(dst, src, num_nodes)
+
+        # Live degrees; these drop as nodes are removed
+        self.out_deg = np.diff(self.out_ptr).astype(np.int32)
+        self.in_deg = np.diff(self.in_ptr).astype(np.int32)
+        self.removed = np.zeros(num_nodes, dtype=bool)
+
+        # Scratch space for the ball searches
+        self._stamp = np.zeros(num_nodes, dtype=np.int32)
+        self._tick = 0
+        self._shm = []
+        self._handle = None
+
+    @staticmethod
+    def _buildCSR(src, dst, num_nodes) :
+        order = np.argsort(src, kind='stable')
+        ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=ptr[1:])
+        return ptr, dst[order]
+
+    @classmethod
+    def fromNetworkX(cls, graph) :
+        '''
+        Build a CIGraph from a NetworkX DiGraph
+        '''
+        try :
+            labels = sorted(graph.nodes())
+        except TypeError :
+            labels = list(graph.nodes())
+        ids = {label : n for n, label in enumerate(labels)}
+
+        src = np.empty(graph.number_of_edges(), dtype=np.int32)
+        dst = np.empty(graph.number_of_edges(), dtype=np.int32)
+        for n, (u, v) in enumerate(graph.edges_iter()) :
+            src[n] = ids[u]
+            dst[n] = ids[v]
+
+        cig = cls(src, dst, labels)
+        cig._label_ids = ids
+        return cig
+
+    def __len__(self) :
+        return self.num_nodes
+
+    def share(self) :
+        '''
+        Move the graph arrays into shared memory blocks, and return a small
+        picklable handle that attach() accepts in other processes. Call
+        unshare() once the workers are done.
+        '''
+        if self._shm :
+            return self._handle
+        handle = {'num_nodes' : self.num_nodes, 'num_edges' : self.num_edges, 'arrays' : {}}
+        for name in self.SHARED_ARRAYS :
+            array = getattr(self, name)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+            view[:] = array
+            setattr(self, name, view)
+            self._shm.append(shm)
+            handle['arrays'][name] = (shm.name, array.shape, array.dtype.str)
+        self._handle = handle
+        return handle
+
+    def unshare(self) :
+        '''
+        Copy the graph arrays back into private memory and free the shared
+        memory blocks
+        '''
+        if not self._shm :
+            return
+        for name in self.SHARED_ARRAYS :
+            setattr(self, name, np.array(getattr(self, name)))
+        for shm in self._shm :
+            shm.close()
+            shm.unlink()
+        self._shm = []
+        self._handle = None
+
+    @classmethod
+    def attach(cls, handle) :
+        '''
+        Attach to a graph shared by another process with share(). Labels are
+        not shared; the attached graph works in node IDs only.
+        '''
+        cig = cls.__new__(cls)
+        cig.labels = None
+        cig.num_nodes = handle['num_nodes']
+        cig.num_edges = handle['num_edges']
+        cig._label_ids = None
+        cig._shm = []
+        cig._handle = None
+        for name, (shm_name, shape, dtype) in handle['arrays'].items() :
+            shm = shared_memory.SharedMemory(name=shm_name)
+            setattr(cig, name, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+            cig._shm.append(shm)
+        cig._stamp = np.zeros(cig.num_nodes, dtype=np.int32)
+        cig._tick = 0
+        return cig
+
+    def nodeID(self, label) :
+        '''
+        Node ID of the given label
+        '''
+        if self._label_ids is None :
+            self._label_ids = {label : n for n, label in enumerate(self.labels)}
+        return self._label_ids[label]
+
+    def degree(self, nodes) :
+        '''
+        Live total degree of a node or an array of nodes
+        '''
+        return self.out_deg[nodes] + self.in_deg[nodes]
+
+    def successors(self, node) :
+        neighbors = self.out_idx[self.out_ptr[node]:self.out_ptr[node + 1]]
+        return neighbors[~self.removed[neighbors]]
+
+    def predecessors(self, node) :
+        neighbors = self.in_idx[self.in_ptr[node]:self.in_ptr[node + 1]]
+        return neighbors[~self.removed[neighbors]]
+
+    def removeNode(self, node) :
+        '''
+        Remove a node, updating the degrees of its live neighbors
+        '''
+        if self.removed[node] :
+            return
+        self.removed[node] = True
+        self.in_deg[self.successors(node)] -= 1
+        self.out_deg[self.predecessors(node)] -= 1
+        self.out_deg[node] = 0
+        self.in_deg[node] = 0
+
+    def reset(self) :
+        '''
+        Bring back every removed node, restoring the full degrees
+        '''
+        self.removed[:] = False
+        self.out_deg[:] = np.diff(self.out_ptr)
+        self.in_deg[:] = np.diff(self.in_ptr)
+
+    def _nextTick(self) :
+        # Fresh visit marker; only clear the stamps when the counter wraps
+        self._tick += 1
+        if self._tick == np.iinfo(np.int32).max :
+            self._stamp[:] = 0
+            self._tick = 1
+        return self._tick
+
+    def rings(self, node, depth, reverse=False) :
+        '''
+        Breadth-first shells around a live node: rings[k] holds the live nodes
+        exactly k hops away, for k = 0..depth. Hops follow edges forwards, or
+        backwards if reverse is set.
+        '''
+        if reverse :
+            ptr = self.in_ptr; idx = self.in_idx
+        else :
+            ptr = self.out_ptr; idx = self.out_idx
+        removed = self.removed
+        stamp = self._stamp
+        tick = self._nextTick()
+
+        frontier = np.array([node], dtype=np.int32)
+        stamp[node] = tick
+        rings = [frontier]
+        for ring in range(depth) :
+            if len(frontier) == 1 :
+                neighbors = idx[ptr[frontier[0]]:ptr[frontier[0] + 1]]
+            else :
+                # Gather every neighbor list of the frontier in one go
+                starts = ptr[frontier]
+                counts = ptr[frontier + 1] - starts
+                total = int(counts.sum())
+                positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+                neighbors = idx[positions]
+            neighbors = neighbors[(stamp[neighbors] != tick) & ~removed[neighbors]]
+            if len(neighbors) > 1 :
+                # Drop repeats, keeping the first copy of each node in place
+                first = np.unique(neighbors, return_index=True)[1]
+                neighbors = neighbors[np.sort(first)]
+            stamp[neighbors] = tick
+            rings.append(neighbors)
+            frontier = neighbors
+        return rings
+
+    def calcCI(self, node, ball_rad, directed=True, treelike=True, CP=False) :
+        '''
+        Collective Influence of a node: (k - 1) times the degrees (less one
+        each, undirected) of the shell ball_rad hops out, or the size of the
+        shell one hop further if not treelike. Directed CI uses out-degrees.
+        -1 for a removed node.
+        '''
+
+        # If this node isn't in the graph, it VERY isn't influential
+        if self.removed[node] :
+            return -1
+
+        degree = int(self.out_deg[node]) + int(self.in_deg[node])
+        if degree < 2 :
+            return 0
+
+        # Build the ball; the frontier shell is only needed for weblike CI
+        rings = self.rings(node, ball_rad if treelike else ball_rad + 1)
+
+        # CALCULATE THE CI VALUE
+        if directed :
+            own_deg = int(self.out_deg[node])
+            if treelike :
+                ci_value = (own_deg - 1) * int(self.out_deg[rings[ball_rad]].sum())
+            else :
+                ci_value = (own_deg - 1) * len(rings[ball_rad + 1])
+        else :
+            if treelike :
+                shell = rings[ball_rad]
+                ci_value = (degree - 1) * (int(self.degree(shell).sum()) - len(shell))
+            else :
+                ci_value = (degree - 1) * len(rings[ball_rad + 1])
+
+        # Alternate algorithm; *~new and improved~!*
+        if CP :
+            # l-Factorial algorithm
+            tot = 0
+            poly = 1
+            for shell in rings[0:ball_rad] :
+                shelldeg = int(self.degree(shell).sum()) - len(shell)
+                if shelldeg > 0 :
+                    tot += shelldeg
+                poly *= tot
+            ci_value = poly
+
+        return ci_value
+
+    def batchCI(self, ball_rad, directed=True, treelike=True, CP=False, nodes=None, chunk_size=4096) :
+        '''
+        Collective Influence of every node (or of the given array of nodes) at
+        once, equal to calcCI for each.
+
+        The breadth-first shells of a block of chunk_size nodes are expanded
+        together as sparse boolean matrix products with the adjacency matrix,
+        and the shell degree sums are sparse matrix-vector products. Returns
+        a list of CI values in node order.
+        '''
+        num_nodes = self.num_nodes
+        if nodes is None :
+            nodes = np.arange(num_nodes)
+        degree = self.degree(np.arange(num_nodes)).astype(np.int64)
+        out_deg = self.out_deg.astype(np.int64)
+        adjacency = self._liveAdjacency()
+
+        # Weights summed over the shells, and how far out the shells go
+        if directed :
+            own_deg = out_deg
+            shell_weight = out_deg
+        else :
+            own_deg = degree
+            shell_weight = degree - 1
+        if CP :
+            depth = ball_rad - 1
+        elif treelike :
+            depth = ball_rad
+        else :
+            depth = ball_rad + 1
+
+        ci_values = []
+        for start in range(0, len(nodes), chunk_size) :
+            rows = nodes[start:start + chunk_size]
+            shells = self._batchShells(adjacency, rows, depth)
+
+            if CP :
+                # l-Factorial algorithm over shells 0..ball_rad-1
+                tot = np.zeros(len(rows), dtype=np.int64)
+                poly = [1] * len(rows)
+                for shell in shells :
+                    shelldeg = self._shellSum(shell, degree - 1)
+                    tot += np.maximum(shelldeg, 0)
+                    poly = [p * t for p, t in zip(poly, tot.tolist())]
+                chunk_CIs = poly
+            elif treelike :
+                shell_sum = self._shellSum(shells[ball_rad], shell_weight)
+                chunk_CIs = [(k - 1) * s for k, s in zip(own_deg[rows].tolist(), shell_sum.tolist())]
+            else :
+                shell_size = np.diff(shells[ball_rad + 1].indptr)
+                chunk_CIs = [(k - 1) * s for k, s in zip(own_deg[rows].tolist(), shell_size.tolist())]
+
+            # Leaves and removed nodes aren't influential
+            for n in np.flatnonzero(degree[rows] < 2).tolist() :
+                chunk_CIs[n] = 0
+            for n in np.flatnonzero(self.removed[rows]).tolist() :
+                chunk_CIs[n] = -1
+            ci_values += chunk_CIs
+
+        return ci_values
+
+    def shellSums(self, ball_rad, nodes=None, chunk_size=4096) :
+        '''
+        Sum of the live out-degrees of the nodes exactly ball_rad hops from
+        every node (or from each of the given array of nodes), as an int64
+        array. This is the frontier term of directed, treelike CI.
+        '''
+        if nodes is None :
+            nodes = np.arange(self.num_nodes)
+        out_deg = self.out_deg.astype(np.int64)
+        adjacency = self._liveAdjacency()
+
+        sums = np.empty(len(nodes), dtype=np.int64)
+        for start in range(0, len(nodes), chunk_size) :
+            rows = nodes[start:start + chunk_size]
+            shells = self._batchShells(adjacency, rows, ball_rad)
+            sums[start:start + len(rows)] = self._shellSum(shells[ball_rad], out_deg)
+        return sums
+
+    def giantComponentSize(self, alive=None, strong=True) :
+        '''
+        Size of the largest strongly (or weakly) connected component among
+        the live nodes, or among the nodes flagged in alive if given
+        '''
+        if alive is None :
+            alive = ~self.removed
+        if not alive.any() :
+            return 0
+        labels = connected_components(self._subgraph(alive), directed=True,
+                                      connection='strong' if strong else 'weak')[1]
+        return int(np.bincount(labels[alive]).max())
+
+    def weakGiantCurve(self, order) :
+        '''
+        Size of the giant weakly connected component as the nodes in order
+        are removed one by one: entry k is the size with order[:k] removed.
+        All of order must already be removed; the graph isn't changed.
+
+        Works backwards from the final graph, adding the nodes back in
+        reverse order and merging components with a union-find.
+        '''
+        num_nodes = self.num_nodes
+        alive = ~self.removed
+
+        # Components of the final graph become the union-find's starting sets
+        num_comps, labels = connected_components(self._subgraph(alive), directed=True, connection='weak')
+        comp_sizes = np.bincount(labels[alive], minlength=num_comps)
+        parent = np.where(alive, num_nodes + labels, np.arange(num_nodes)).tolist()
+        parent += range(num_nodes, num_nodes + num_comps)
+        size = [0] * num_nodes + comp_sizes.tolist()
+        giant = int(comp_sizes.max()) if alive.any() else 0
+        alive = alive.tolist()
+
+        def find(node) :
+            while parent[node] != node :
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        curve = [0] * len(order)
+        for k in range(len(order) - 1, -1, -1) :
+            node = order[k]
+            alive[node] = True
+            size[node] = 1
+            neighbors = self.out_idx[self.out_ptr[node]:self.out_ptr[node + 1]].tolist()
+            neighbors += self.in_idx[self.in_ptr[node]:self.in_ptr[node + 1]].tolist()
+            root = node
+            for neighbor in neighbors :
+                if not alive[neighbor] :
+                    continue
+                other = find(neighbor)
+                if other == root :
+                    continue
+                # Union by size
+                if size[other] > size[root] :
+                    root, other = other, root
+                parent[other] = root
+                size[root] += size[other]
+            giant = max(giant, size[root])
+            curve[k] = giant
+        return curve
+
+    def _subgraph(self, alive) :
+        # Adjacency restricted to edges between the flagged nodes
+        keep = alive[self.out_idx] & np.repeat(alive, np.diff(self.out_ptr))
+        return self._adjacency(keep, np.int8)
+
+    def _liveAdjacency(self) :
+        # Adjacency over live nodes only; removed nodes can't relay a search
+        return self._adjacency(~self.removed[self.out_idx], np.float32)
+
+    def _adjacency(self, keep, dtype) :
+        # Sparse matrix of the kept edges, leaving the CSR arrays untouched
+        num_nodes = self.num_nodes
+        rows = np.repeat(np.arange(num_nodes), np.diff(self.out_ptr))
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=num_nodes), out=indptr[1:])
+        return sp.csr_matrix((np.ones(int(indptr[-1]), dtype=dtype), self.out_idx[keep], indptr),
+                             shape=(num_nodes, num_nodes))
+
+    @staticmethod
+    def _batchShells(adjacency, rows, depth) :
+        # Shell k of each row's node, k = 0..depth, as sparse 0/1 matrices
+        num_nodes = adjacency.shape[0]
+        frontier = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), rows, np.arange(len(rows) + 1)),
+                                 shape=(len(rows), num_nodes))
+        visited = frontier.copy()
+        shells = [frontier]
+        for ring in range(depth) :
+            reached = frontier @ adjacency
+            reached.data[:] = 1
+            frontier = reached - reached.multiply(visited)
+            frontier.eliminate_zeros()
+            visited = visited + frontier
+            shells.append(frontier)
+        return shells
+
+    @staticmethod
+    def _shellSum(shell, weight) :
+        # Exact integer sum of weight over each row's shell
+        ones = np.ones(len(shell.indices), dtype=np.int64)
+        return sp.csr_matrix((ones, shell.indices, shell.indptr), shape=shell.shape) @ weight
+
+    def inBall(self, node, ball_rad) :
+        '''
+        Nodes whose CI may change when this node is removed: everything up to
+        ball_rad + 1 hops upstream of it, as rings by distance
+        '''
+        if self.removed[node] :
+            return []
+        return self.rings(node, ball_rad + 1, reverse=True)
+
+
+class IncrementalCI(object) :
+    '''
+    Directed, treelike Collective Influence kept current as nodes are removed.
+
+    For every node i we hold S[i], the sum of the out-degrees of the nodes
+    exactly ball_rad hops from i, so CI(i) = (k_out(i) - 1) * S[i]. Removing
+    a node x only changes S for nodes whose ball reached it:
+      - nodes less than ball_rad hops upstream of x may lose paths through
+        x, so their shells are searched again;
+      - nodes exactly ball_rad hops upstream lose x's own out-degree;
+      - nodes exactly ball_rad hops upstream of a predecessor p of x (up to
+        ball_rad + 1 from x) lose 1 for p's lost edge to x.
+    Distances from every other node are unaffected, so the rest of S stays.
+    '''
+
+    def __init__(self, cig, ball_rad, shell_sums=None) :
+        '''
+        Constructor:
+        Track CI on the given CIGraph, whose nodes must be removed through
+        this object from now on. The initial shell sums are computed unless
+        given.
+        '''
+        self.cig = cig
+        self.ball_rad = ball_rad
+        if shell_sums is None :
+            shell_sums = cig.shellSums(ball_rad)
+        self.shell_sums = np.asarray(shell_sums, dtype=np.int64)
+
+    def calcCI(self, node) :
+        '''
+        Current CI of a node, equal to cig.calcCI(node, ball_rad)
+        '''
+        cig = self.cig
+        if cig.removed[node] :
+            return -1
+        if int(cig.out_deg[node]) + int(cig.in_deg[node]) < 2 :
+            return 0
+        return (int(cig.out_deg[node]) - 1) * int(self.shell_sums[node])
+
+    def allCIs(self) :
+        '''
+        Current CI of every node, as a list indexed by node ID
+        '''
+        cig = self.cig
+        ci_values = (cig.out_deg.astype(np.int64) - 1) * self.shell_sums
+        ci_values[cig.degree(np.arange(cig.num_nodes)) < 2] = 0
+        ci_values[cig.removed] = -1
+        return ci_values.tolist()
+
+    def removeNode(self, node, in_ball=None) :
+        '''
+        Remove a node from the graph and update the shell sums. in_ball may
+        pass in cig.inBall(node, ball_rad) if it's already been found.
+        '''
+        cig = self.cig
+        ball_rad = self.ball_rad
+        shell_sums = self.shell_sums
+        if cig.removed[node] :
+            return
+        if in_ball is None :
+            in_ball = cig.rings(node, ball_rad, reverse=True)
+        removed_deg = int(cig.out_deg[node])
+
+        cig.removeNode(node)
+
+        # Node was on the frontier of these balls
+        shell_sums[in_ball[ball_rad]] -= removed_deg
+
+        # Predecessors lost an out-edge; charge it to the balls they frontier
+        for pred in cig.predecessors(node) :
+            shell_sums[cig.rings(pred, ball_rad, reverse=True)[ball_rad]] -= 1
+
+        # Balls that might have routed through the node get searched again
+        for ring in in_ball[1:ball_rad] :
+            for inner in ring.tolist() :
+                shell_sums[inner] = cig.out_deg[cig.rings(inner, ball_rad)[ball_rad]].sum()
+        shell_sums[node] = 0
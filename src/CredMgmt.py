@@ -54,6 +54,12 @@ class CredMgmt(object) :
         
         return TwiAPIer(api_keys=permissions_bundle)
     
+    def giveAPIs(self) :
+        '''
+        One API object for each of our credentials
+        '''
+        return [self.giveAPI() for secrets in self.secrets_list]
+    
     def getBearerToken(self, application_name) :
         
         # Twitter Oauth2 token-dispensing endpoint
@@ -0,0 +1,149 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Columnar edge lists for the influence graphs of TAJ files.
+
+An edge list is a (4, N) int64 NumPy array whose rows are the columns
+SRC, DST, TWEET_ID and EDGE_TYPE: one entry per (influencer -> tweeter)
+relation found in a tweet. Each column is contiguous on disk, so a stored
+edge list can be memory-mapped and sliced without parsing anything.
+'''
+
+import os
+from array import array
+import numpy as np
+
+# Columns
+SRC = 0
+DST = 1
+TWEET_ID = 2
+EDGE_TYPE = 3
+NUM_COLUMNS = 4
+
+# Edge types
+RETWEET = 0
+REPLY = 1
+MENTION = 2
+QUOTE = 3
+
+# Edge types making up each kind of graph
+GRAPH_TYPES = {
+    'retweet' : (RETWEET,),
+    'reply' : (REPLY,),
+    'mention' : (MENTION,),
+    'quote' : (QUOTE,),
+    'influence' : (RETWEET, REPLY, MENTION, QUOTE)
+}
+
+
+def emptyEdges() :
+    '''
+    An edge list with no edges
+    '''
+    return np.empty((NUM_COLUMNS, 0), dtype=np.int64)
+
+def newRows() :
+    '''
+    Growable int64 buffer for collecting src, dst, tweet_id, edge_type values
+    '''
+    return array('q')
+
+def edgesFromRows(rows) :
+    '''
+    Build an edge list from a flat sequence (a list, or a buffer from
+    newRows) of src, dst, tweet_id, edge_type, src, dst, ... values.
+    A newRows buffer is read in place; each column is gathered from it
+    straight into the (4, N) result.
+    '''
+    if isinstance(rows, array) :
+        flat = np.frombuffer(rows, dtype=np.int64)
+    else :
+        flat = np.asarray(rows, dtype=np.int64)
+    edges = np.empty((NUM_COLUMNS, len(flat) // NUM_COLUMNS), dtype=np.int64)
+    for column in range(NUM_COLUMNS) :
+        edges[column] = flat[column::NUM_COLUMNS]
+    return edges
+
+def uniqueEdges(edges) :
+    '''
+    Drop repeated edges (same src, dst, tweet_id and edge_type), leaving
+    the edge list sorted
+    '''
+    if edges.shape[1] < 2 :
+        return edges
+    order = np.lexsort(edges[::-1])
+    edges = edges[:, order]
+    first = np.ones(edges.shape[1], dtype=bool)
+    first[1:] = (edges[:, 1:] != edges[:, :-1]).any(axis=0)
+    return edges[:, first]
+
+def writeEdges(edges, filename) :
+    '''
+    Store an edge list, replacing any existing one atomically
+    '''
+    tmp_file = filename + '.tmp'
+    with open(tmp_file, 'wb') as fout :
+        np.save(fout, np.ascontiguousarray(edges, dtype=np.int64))
+    os.replace(tmp_file, filename)
+
+def loadEdges(filename, mmap=True) :
+    '''
+    Load a stored edge list. Memory-mapped lists are read-only.
+    '''
+    return np.load(filename, mmap_mode='r' if mmap else None)
+
+def concatEdges(edge_lists) :
+    '''
+    Concatenate several edge lists into one
+    '''
+    edge_lists = [edges for edges in edge_lists if edges.shape[1] > 0]
+    if len(edge_lists) == 0 :
+        return emptyEdges()
+    return np.concatenate(edge_lists, axis=1)
+
+def selectEdges(edges, graph_type='influence') :
+    '''
+    Keep only the edges belonging to the given kind of graph
+    '''
+    if graph_type not in GRAPH_TYPES :
+        raise ValueError('Inappropriate graph_type')
+    edge_types = GRAPH_TYPES[graph_type]
+    if len(edge_types) == len(GRAPH_TYPES['influence']) :
+        return edges
+    return edges[:, np.isin(edges[EDGE_TYPE], edge_types)]
+
+def edgesToGraph(edges, graph, save_tweet_ids=False) :
+    '''
+    Add the edges of an edge list to a NetworkX graph.
+
+    If save_tweet_ids is set, each edge gets a 'tweet_id' attribute holding
+    the set of tweet IDs it was seen in (merged with any existing set).
+    '''
+    if edges.shape[1] == 0 :
+        return graph
+
+    # Sort so that repeats of the same (src, dst) pair are adjacent
+    order = np.lexsort((edges[DST], edges[SRC]))
+    src = edges[SRC][order]
+    dst = edges[DST][order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+
+    if not save_tweet_ids :
+        graph.add_edges_from(zip(src[first].tolist(), dst[first].tolist()))
+        return graph
+
+    # Group tweet IDs by (src, dst) pair
+    tweet_ids = edges[TWEET_ID][order].tolist()
+    starts = np.flatnonzero(first).tolist() + [len(order)]
+    src = src.tolist(); dst = dst.tolist()
+    for n in range(len(starts) - 1) :
+        u = src[starts[n]]; v = dst[starts[n]]
+        id_set = set(tweet_ids[starts[n]:starts[n+1]])
+        if graph.has_edge(u, v) and 'tweet_id' in graph.edge[u][v] :
+            graph.edge[u][v]['tweet_id'].update(id_set)
+        else :
+            graph.add_edge(u, v, {'tweet_id' : id_set})
+    return graph
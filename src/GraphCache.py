@@ -0,0 +1,79 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+In-process cache of the merged edge lists behind TweetArchive.buildGraph.
+'''
+
+import threading
+from collections import OrderedDict
+
+
+class GraphCache(object) :
+    '''
+    Least-recently-used cache of merged edge lists, bounded by the bytes
+    they take up.
+
+    Entries are read-only edge arrays (see EdgeStore) plus the graph
+    attributes that go with them. Callers build their own graph from an
+    entry, so they may change that graph freely while the arrays behind it
+    stay shared. Safe to use from several threads at once.
+    '''
+
+    DEFAULT_BUDGET = 1 << 30
+
+    def __init__(self, max_bytes=None) :
+        '''
+        Constructor:
+        Make an empty cache holding up to max_bytes of edge arrays
+        '''
+        self.max_bytes = self.DEFAULT_BUDGET if max_bytes is None else max_bytes
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) :
+        return len(self._entries)
+
+    def get(self, key) :
+        '''
+        Return the (edges, graph_attrs) stored under key, or None
+        '''
+        with self._lock :
+            entry = self._entries.get(key)
+            if entry is None :
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, edges, graph_attrs) :
+        '''
+        Store an edge list and its graph attributes under key, evicting the
+        least recently used entries to stay within budget. Edge lists bigger
+        than the whole budget aren't kept.
+        '''
+        if edges.nbytes > self.max_bytes :
+            return
+        if edges.flags.writeable :
+            edges.flags.writeable = False
+        with self._lock :
+            if key in self._entries :
+                self.num_bytes -= self._entries.pop(key)[0].nbytes
+            self._entries[key] = (edges, dict(graph_attrs))
+            self.num_bytes += edges.nbytes
+            while self.num_bytes > self.max_bytes :
+                old_edges = self._entries.popitem(last=False)[1][0]
+                self.num_bytes -= old_edges.nbytes
+
+    def clear(self) :
+        '''
+        Drop every entry
+        '''
+        with self._lock :
+            self._entries.clear()
+            self.num_bytes = 0
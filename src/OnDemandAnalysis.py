@@ -93,12 +93,7 @@ def OnDemandAnalysis(query,num_queries=60,old_CI=False,ball_radius=2,my_api=None
         else :
             top_inf = influencers
 
-        # Garbage collect old graph, hopefully
-        graph = None
-        time.sleep(0)
-        
-        # Rebuild graph so you can make the influencer subgraph
-        graph = ARX.buildGraph()
+        # siteCI leaves the graph intact, so it makes the influencer subgraph too
             
         usr_info = api.resolveUsers(top_inf)
         screen_names = []; follower_counts = []; mapping = {}
@@ -146,7 +141,7 @@ def OnDemandAnalysis(query,num_queries=60,old_CI=False,ball_radius=2,my_api=None
         
         print('\nCycle took ' + str(time.time()-cycle_start) + ' to complete.')
 
-        # Kill Twitter API connection
+        # Let go of the Twitter API session; it stays pooled for the next job on these credentials
         api.disconnect()
         
         return query, (infdict, graph_data)
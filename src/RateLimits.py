@@ -0,0 +1,292 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Request budgets of the Twitter REST API, kept up to date from the rate-limit
+headers of its responses.
+'''
+
+import threading
+import time
+
+
+WINDOW_SECONDS = 15 * 60        # Length of a rate-limiting window
+SEARCH_LIMIT = 180              # Search requests per window, with user auth
+
+LIMIT_HEADER = 'x-rate-limit-limit'
+REMAINING_HEADER = 'x-rate-limit-remaining'
+RESET_HEADER = 'x-rate-limit-reset'
+
+
+def headerInt(headers, name) :
+    '''
+    Integer value of a response header, or None if it's missing or garbled
+    '''
+    try :
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError) :
+        return None
+
+
+class RateBudget(object) :
+    '''
+    Requests left to one credential on one endpoint in the current
+    rate-limiting window, and when that window resets.
+
+    take() spends a request before it's sent; update() then corrects the
+    count with what the response's headers say. Until the first response
+    comes back, the budget assumes a full window starting with the first
+    request. Safe to use from several threads at once.
+    '''
+
+    def __init__(self, limit=SEARCH_LIMIT, window=WINDOW_SECONDS) :
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset = None           # Epoch time the window resets, once one started
+        self._lock = threading.Lock()
+
+    def __getstate__(self) :
+        # Locks don't pickle; API objects carry budgets to worker processes
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state) :
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _refresh(self, now) :
+        # A new window starts with the full limit
+        if self.reset is not None and now >= self.reset :
+            self.remaining = self.limit
+            self.reset = None
+
+    def take(self, now=None) :
+        '''
+        Spend a request if there's one left in the window. False if not.
+        '''
+        if now is None : now = time.time()
+        with self._lock :
+            self._refresh(now)
+            if self.remaining <= 0 :
+                return False
+            self.remaining -= 1
+            if self.reset is None :
+                self.reset = now + self.window
+            return True
+
+    def update(self, response, now=None) :
+        '''
+        Take in the rate-limit headers of a response to one of our requests.
+        A 429 without them empties the budget for the rest of the window.
+        '''
+        if now is None : now = time.time()
+        headers = response.headers
+        limit = headerInt(headers, LIMIT_HEADER)
+        remaining = headerInt(headers, REMAINING_HEADER)
+        reset = headerInt(headers, RESET_HEADER)
+        if response.status_code == 429 :
+            remaining = 0
+
+        with self._lock :
+            self._refresh(now)
+            if limit is not None :
+                self.limit = limit
+            if reset is not None and reset != self.reset :
+                # Twitter started a window we didn't know about
+                if remaining is not None :
+                    self.remaining = remaining
+                self.reset = reset
+            elif remaining is not None :
+                # Requests still in flight may not be counted yet
+                self.remaining = min(self.remaining, remaining)
+            if self.reset is None :
+                self.reset = now + self.window
+
+    def wait(self, now=None) :
+        '''
+        Seconds until the budget has a request to spend again
+        '''
+        if now is None : now = time.time()
+        with self._lock :
+            self._refresh(now)
+            if self.remaining > 0 :
+                return 0.0
+            return max(self.reset - now, 0.0)
+
+    def state(self) :
+        '''
+        (limit, remaining, reset) as of now
+        '''
+        with self._lock :
+            self._refresh(time.time())
+            return self.limit, self.remaining, self.reset
+
+
+class BudgetPool(object) :
+    '''
+    The rate-limit budgets of several credentials, handing out requests from
+    whichever credential has some left, in turn. Safe to use from several
+    threads at once.
+    '''
+
+    MIN_WAIT = 1.0      # Seconds to wait at least when every budget is spent
+
+    def __init__(self, keys, limit=SEARCH_LIMIT, window=WINDOW_SECONDS) :
+        '''
+        Constructor:
+        One fresh budget for each key (any hashable standing for a credential)
+        '''
+        self.keys = list(keys)
+        self.budgets = {key : RateBudget(limit, window) for key in self.keys}
+        self._next = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, block=True) :
+        '''
+        Spend a request from the next credential that has one, and return
+        its key. If none do, wait for one to reset, or return None if not
+        blocking.
+        '''
+        with self._cond :
+            while True :
+                now = time.time()
+                for k in range(len(self.keys)) :
+                    n = (self._next + k) % len(self.keys)
+                    if self.budgets[self.keys[n]].take(now) :
+                        self._next = (n + 1) % len(self.keys)
+                        return self.keys[n]
+                if not block or len(self.keys) == 0 :
+                    return None
+                delay = min(budget.wait(now) for budget in self.budgets.values())
+                self._cond.wait(max(delay, self.MIN_WAIT))
+
+    def update(self, key, response) :
+        '''
+        Take in the rate-limit headers of a response to a request made with
+        the given credential
+        '''
+        self.budgets[key].update(response)
+        with self._cond :
+            self._cond.notify_all()
+
+    def remaining(self) :
+        '''
+        Requests left across every credential in their current windows
+        '''
+        return sum(budget.state()[1] for budget in self.budgets.values())
+
+
+class RateScheduler(object) :
+    '''
+    Paces search requests on one credential against the rate-limit window
+    its responses report, and shares the window's requests out among the
+    topics being collected in proportion to their recent yield (tweets per
+    request), so busy topics get more of it.
+
+    Every topic gets at least MIN_REQUESTS per allocation so a quiet topic
+    is still sampled and can win requests back once it picks up. Topics
+    without a record yet are allocated like the best-yielding one.
+    Safe to use from several threads at once.
+    '''
+
+    MIN_REQUESTS = 1
+    SMOOTHING = 0.5         # Weight of the latest yield against the ones before
+    RESET_SLACK = 1.0       # Seconds to stay clear of the reset, for clock skew
+
+    def __init__(self, limit=SEARCH_LIMIT, window=WINDOW_SECONDS) :
+        self.budget = RateBudget(limit, window)
+        self.yields = {}        # topic : tweets per request, smoothed
+        self.allocated = {}     # topic : requests in the latest allocation
+        self.used = {}          # topic : requests used since then
+        self._lock = threading.Lock()
+
+    def __getstate__(self) :
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state) :
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def update(self, response) :
+        '''
+        Take in the rate-limit headers of a response
+        '''
+        self.budget.update(response)
+
+    def waitTime(self) :
+        '''
+        Seconds to wait before the budget has a request again
+        '''
+        delay = self.budget.wait()
+        return delay + self.RESET_SLACK if delay > 0 else 0.0
+
+    def sleepUntilReset(self) :
+        '''
+        Sleep until the window resets if the budget is spent. Returns the
+        seconds slept.
+        '''
+        delay = self.waitTime()
+        if delay > 0 :
+            time.sleep(delay)
+        return delay
+
+    def record(self, topic, num_requests, num_tweets) :
+        '''
+        Note what num_requests searches for a topic brought in
+        '''
+        if num_requests <= 0 :
+            return
+        with self._lock :
+            latest = num_tweets / float(num_requests)
+            if topic in self.yields :
+                latest = self.SMOOTHING * latest + (1.0 - self.SMOOTHING) * self.yields[topic]
+            self.yields[topic] = latest
+            self.used[topic] = self.used.get(topic, 0) + num_requests
+
+    def allocate(self, topics, num_requests=None) :
+        '''
+        Share num_requests (by default, what's left in the window) among the
+        topics by their recent yield. Returns {topic : requests}.
+        '''
+        topics = list(topics)
+        if num_requests is None :
+            num_requests = self.budget.state()[1]
+        num_requests = max(int(num_requests), 0)
+        if len(topics) == 0 :
+            return {}
+
+        with self._lock :
+            # Everyone gets their floor, the rest goes by yield
+            floor = min(self.MIN_REQUESTS, num_requests // len(topics))
+            spare = num_requests - floor * len(topics)
+            best = max(self.yields.values()) if len(self.yields) > 0 else 1.0
+            weights = [self.yields.get(topic, best) for topic in topics]
+            total = sum(weights)
+            if total <= 0 :
+                weights = [1.0] * len(topics); total = float(len(topics))
+            shares = [spare * weight / total for weight in weights]
+
+            # Hand out the remainders to the largest fractions
+            allocation = [floor + int(share) for share in shares]
+            left = num_requests - sum(allocation)
+            by_fraction = sorted(range(len(topics)), key=lambda n : shares[n] - int(shares[n]), reverse=True)
+            for n in by_fraction[:left] :
+                allocation[n] += 1
+
+            self.allocated = dict(zip(topics, allocation))
+            self.used = {topic : 0 for topic in topics}
+            return dict(self.allocated)
+
+    def topicBudgets(self) :
+        '''
+        {topic : (requests allocated, requests used, tweets per request)}
+        as of the latest allocation
+        '''
+        with self._lock :
+            return {topic : (self.allocated.get(topic, 0), self.used.get(topic, 0), self.yields.get(topic))
+                    for topic in set(self.allocated) | set(self.yields)}
@@ -0,0 +1,164 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Tweets kept as the raw JSON bytes of the API response they came in.
+'''
+
+import re
+import numpy as np
+import ujson as json
+
+
+KEY_PATTERN = re.compile(rb'"(id|created_at)"\s*:\s*')
+HEAD_PATTERNS = (
+    re.compile(rb'\{\s*"created_at"\s*:\s*"([^"\\]*)"\s*,\s*"id"\s*:\s*(-?\d+)'),
+    re.compile(rb'\{\s*"id"\s*:\s*(-?\d+)\s*,\s*"created_at"\s*:\s*"([^"\\]*)"'),
+)
+INT_PATTERN = re.compile(rb'-?\d+')
+STRING_PATTERN = re.compile(rb'"((?:[^"\\]|\\.)*)"')
+
+
+class RawTweet(dict) :
+    '''
+    A tweet as the raw JSON bytes it arrived in, along with the only fields
+    needed to sort it and file it in an archive: its 'id' and 'created_at'.
+    Those work with the Tweet accessors as usual; use parse() for the rest.
+    TajWriter writes the raw bytes out as they are.
+    '''
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw, tweet_id, created_at) :
+        dict.__init__(self, id=tweet_id, created_at=created_at)
+        self.raw = raw
+
+    def parse(self) :
+        '''
+        The whole tweet, decoded
+        '''
+        return json.loads(self.raw)
+
+    @classmethod
+    def fromTweet(cls, tweet) :
+        '''
+        Wrap an already-decoded tweet
+        '''
+        return cls(json.dumps(tweet).encode('utf-8'), tweet.get('id'), tweet.get('created_at'))
+
+
+def _structure(a) :
+    '''
+    Byte offsets of the unescaped quotes in a JSON document, and of its
+    brackets outside strings along with whether each opens, and the nesting
+    depth after each
+    '''
+    special = np.flatnonzero((a == 34) | (a == 123) | (a == 125) | (a == 91) | (a == 93))
+    chars = a[special]
+    is_quote = chars == 34
+    
+    # Drop escaped quotes: those after an odd run of backslashes
+    escaped = np.flatnonzero(is_quote & (special > 0) & (a[special - 1] == 92))
+    k = 2; run = np.ones(len(escaped), dtype=np.int64)
+    live = np.arange(len(escaped))
+    while len(live) > 0 :
+        live = live[special[escaped[live]] >= k]
+        live = live[a[special[escaped[live]] - k] == 92]
+        run[live] += 1
+        k += 1
+    is_quote[escaped[run % 2 == 1]] = False
+    quotes = special[is_quote]
+    if len(quotes) % 2 != 0 :
+        raise ValueError('Unterminated string')
+    
+    # Brackets preceded by an even number of quotes are outside strings
+    outside = ~is_quote & (np.cumsum(is_quote) % 2 == 0) & (chars != 34)
+    brackets = special[outside]
+    is_open = (chars[outside] == 123) | (chars[outside] == 91)
+    depth = np.cumsum(np.where(is_open, 1, -1))
+    if len(depth) == 0 or depth[-1] != 0 or depth.min() < 0 :
+        raise ValueError('Unbalanced brackets')
+    return quotes, brackets, is_open, depth
+
+def splitArray(body, key=b'statuses') :
+    '''
+    Find the objects in the array under the given key of a JSON document's
+    top-level object, without decoding it. Returns a list of RawTweets, or
+    None if the document doesn't have that key.
+
+    Raises ValueError if it can't make sense of the document; it may still
+    be valid JSON, just not laid out the way this expects.
+    '''
+    a = np.frombuffer(body, dtype=np.uint8)
+    quotes, brackets, is_open, depth = _structure(a)
+
+    # Find the key at the top level
+    key = b'"' + key + b'"'
+    start = body.find(key)
+    while start >= 0 :
+        n = np.searchsorted(brackets, start)
+        if n > 0 and depth[n - 1] == 1 and np.searchsorted(quotes, start) % 2 == 0 :
+            break
+        start = body.find(key, start + 1)
+    if start < 0 :
+        return None
+    if n >= len(brackets) or a[brackets[n]] != 91 or body[start + len(key) :brackets[n]].strip(b' \t\r\n:') :
+        raise ValueError('Key is not followed by an array')
+
+    # The array holds everything until the nesting drops back to the top
+    end = n + int(np.flatnonzero(depth[n :] == 1)[0])
+    inner = slice(n + 1, end)
+    starts = brackets[inner][(depth[inner] == 3) & is_open[inner]]
+    stops = brackets[inner][(depth[inner] == 2) & ~is_open[inner]] + 1
+    if len(starts) != len(stops) or (a[starts] != 123).any() :
+        raise ValueError('Array holds something other than objects')
+
+    # Each object's own keys sit one level down from it, usually up front
+    tweets = []
+    created_first, id_first = HEAD_PATTERNS
+    for s, e in zip(starts.tolist(), stops.tolist()) :
+        
+        # API statuses lead with their 'created_at' and 'id'
+        head = created_first.match(body, s)
+        if head is not None :
+            tweets.append(RawTweet(body[s :e], int(head.group(2)), head.group(1).decode('utf-8')))
+            continue
+        head = id_first.match(body, s)
+        if head is not None :
+            tweets.append(RawTweet(body[s :e], int(head.group(1)), head.group(2).decode('utf-8')))
+            continue
+        
+        fields = {}
+        for match in KEY_PATTERN.finditer(body, s, e) :
+            key = match.group(1)
+            pos = match.start()
+            if key in fields or depth[brackets.searchsorted(pos) - 1] != 3 or quotes.searchsorted(pos) % 2 != 0 :
+                continue
+            if key == b'id' :
+                value = INT_PATTERN.match(body, match.end())
+                fields[key] = None if value is None else int(value.group())
+            else :
+                value = STRING_PATTERN.match(body, match.end())
+                if value is not None :
+                    value = value.group()
+                    value = json.loads(value) if b'\\' in value else value[1 :-1].decode('utf-8')
+                fields[key] = value
+            if len(fields) == 2 :
+                break
+        tweets.append(RawTweet(body[s :e], fields.get(b'id'), fields.get(b'created_at')))
+    return tweets
+
+def rawTweets(body, key='statuses') :
+    '''
+    The tweets in a raw API response body, as RawTweets, or None if the
+    response doesn't have the key. Falls back to a full decode if the body
+    can't be split as is. Raises ValueError for mangled JSON.
+    '''
+    try :
+        return splitArray(body, key.encode('utf-8'))
+    except ValueError :
+        data = json.loads(body)
+        if not isinstance(data, dict) or key not in data :
+            return None
+        return [RawTweet.fromTweet(tweet) for tweet in data[key] or []]
@@ -0,0 +1,162 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Search API collection for several archives at once, spread over all of our
+credentials.
+'''
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+import RateLimits
+from RateLimits import BudgetPool
+from CredMgmt import CredMgmt
+from TwAPIer import collectSearch
+from TwArchive import TweetArchive
+
+
+class SearchCollector(object) :
+    '''
+    Collects search results for several archives concurrently, one thread
+    per archive, like TwiAPIer.archiveSearch does for one.
+
+    Requests are drawn from a pool of API objects, one per credential (see
+    CredMgmt.giveAPIs). Each request goes out on whichever credential still
+    has budget in its rate-limiting window, as the x-rate-limit-* headers of
+    its responses tell (see RateLimits), so collection scales with the
+    number of credentials instead of stalling on a single one's limit.
+    '''
+
+    MAX_RECONNECTS = 3      # Connection errors in a row before giving up
+    MAX_MANGLED = 3         # Retries of a response that won't parse
+
+    def __init__(self, apis=None, creds=None, num_threads=None,
+                 limit=RateLimits.SEARCH_LIMIT, verbose=True) :
+        '''
+        Constructor:
+        Collect with the given API objects, or with one for each credential
+        in creds (a CredMgmt, loaded from the default token file if None).
+        Each starts with a full window of limit requests.
+        '''
+        if apis is None :
+            if creds is None :
+                creds = CredMgmt()
+            apis = creds.giveAPIs()
+        self.apis = list(apis)
+        self.num_threads = num_threads
+        self.verbose = verbose
+        self.budgets = BudgetPool(self.apis, limit)
+        self._lock = threading.Lock()
+
+    def connect(self) :
+        '''
+        Open a session for every API object that doesn't have one yet
+        '''
+        with self._lock :
+            for api in self.apis :
+                if api.tcp_sess is None :
+                    api.connect()
+
+    def reconnect(self, api) :
+        '''
+        Replace an API object's session after a connection error
+        '''
+        with self._lock :
+            api.reconnect()
+
+    def disconnect(self) :
+        '''
+        Let go of every API object's session (see TwiAPIer.disconnect)
+        '''
+        with self._lock :
+            for api in self.apis :
+                api.disconnect()
+
+    def collect(self, archives, req_limit=0, wait_on_rate_limit=True, exhaust_on_ratelimit=False,
+                auto_exhaust=False, archive_dir=None) :
+        '''
+        Search for the queries of several archives at once, and journal the
+        results in each (see TwiAPIer.archiveSearch for the options).
+        Archives may be given as TweetArchives or as queries, opened from
+        archive_dir.
+
+        Returns {query : (exhausted, rate_limited)}
+        '''
+        archives = [arx if isinstance(arx, TweetArchive) else TweetArchive(arx, archive_dir=archive_dir)
+                    for arx in archives]
+        if len(archives) == 0 :
+            return {}
+        self.connect()
+
+        num_threads = len(archives) if self.num_threads is None else self.num_threads
+        with ThreadPoolExecutor(max_workers=num_threads) as ex :
+            jobs = [(arx['query'], ex.submit(self.archiveSearch, arx, req_limit, wait_on_rate_limit,
+                                             exhaust_on_ratelimit, auto_exhaust))
+                    for arx in archives]
+            return {query : job.result() for query, job in jobs}
+
+    def archiveSearch(self, arx, req_limit=0, wait_on_rate_limit=True, exhaust_on_ratelimit=False,
+                      auto_exhaust=False) :
+        '''
+        TwiAPIer.archiveSearch on our pool of credentials.
+        Returns (exhausted, rate_limited).
+        '''
+        def send(query, bounds, lang, filters, wait) :
+            resp, tweets = self.searchQuery(query, bounds, lang, filters, wait)
+            return resp, tweets, resp is None
+        
+        exhausted, rate_limited, num_requests, num_tweets = collectSearch(arx, send, req_limit, wait_on_rate_limit,
+                                                                          exhaust_on_ratelimit, auto_exhaust)
+        if self.verbose :
+            print('Collected ' + str(num_tweets) + ' tweets for ' + arx['query'] + ' in ' + str(num_requests) + ' requests.')
+        return exhausted, rate_limited
+
+    def searchQuery(self, query, bounds, lang='en', filters=None, block=True) :
+        '''
+        One search request, on whichever credential has budget for it.
+        Rate-limited requests are retried on another credential, waiting for
+        one to reset if block is set.
+
+        Returns (response, tweets), with the tweets as RawTweets (empty for
+        an error response), or (None, None) once every credential is out of
+        requests and we're not waiting.
+        '''
+        reconnects = 0; mangled = 0
+        while True :
+            api = self.budgets.acquire(block)
+            if api is None :
+                return None, None
+
+            # Send it, reconnecting if the connection dropped
+            try :
+                reply = api.searchQuery(query, bounds, lang, filters=filters, verbose=False)
+            except requests.exceptions.ConnectionError :
+                reconnects += 1
+                if reconnects > self.MAX_RECONNECTS :
+                    raise
+                if self.verbose : print('Connection terminated: Reconnecting...')
+                self.reconnect(api)
+                continue
+            self.budgets.update(api, reply)
+
+            # Query until we get valid JSON
+            try :
+                statuses = api.getRawTweets(reply)
+            except ValueError :
+                mangled += 1
+                if mangled > self.MAX_MANGLED :
+                    print('WARNING: Mangled tweet in desired range.')
+                    raise
+                continue
+
+            # Rate limited on this credential; its budget knows to wait now
+            if reply.status_code == 429 :
+                if self.verbose : print('HTTP Code : 429 - Rate limited!')
+                continue
+
+            if statuses is None :
+                return reply, []
+            return reply, api.siftTweets(statuses)
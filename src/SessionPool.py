@@ -0,0 +1,85 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Long-lived HTTP sessions to the Twitter API, one per credential.
+'''
+
+import threading
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool(object) :
+    '''
+    Open sessions kept by credential, so that every search, user lookup and
+    job made with the same credential shares one session and its keep-alive
+    connections, rather than redoing the OAuth setup and TLS handshake.
+
+    Each session gets an HTTPAdapter holding up to pool_maxsize connections
+    to each of up to pool_connections hosts; raise pool_maxsize to match the
+    threads sharing a session. Safe to use from several threads at once.
+    '''
+
+    POOL_CONNECTIONS = 4
+    POOL_MAXSIZE = 16
+
+    def __init__(self, pool_connections=None, pool_maxsize=None) :
+        self.pool_connections = self.POOL_CONNECTIONS if pool_connections is None else pool_connections
+        self.pool_maxsize = self.POOL_MAXSIZE if pool_maxsize is None else pool_maxsize
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) :
+        return len(self._sessions)
+
+    def get(self, key, factory) :
+        '''
+        The session kept for a credential key, made with factory() the
+        first time it's asked for
+        '''
+        with self._lock :
+            session = self._sessions.get(key)
+        if session is not None :
+            return session
+
+        # Set up the session without holding up other credentials
+        session = factory()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        # Another thread may have made one for this key in the meantime
+        with self._lock :
+            pooled = self._sessions.setdefault(key, session)
+        if pooled is not session :
+            session.close()
+        return pooled
+
+    def owns(self, session) :
+        '''
+        Whether a session is one of ours
+        '''
+        with self._lock :
+            return any(session is pooled for pooled in self._sessions.values())
+
+    def discard(self, session) :
+        '''
+        Close a session and forget it, e.g. after its connections broke; its
+        credential gets a fresh one next time
+        '''
+        with self._lock :
+            for key, pooled in list(self._sessions.items()) :
+                if pooled is session :
+                    del self._sessions[key]
+        session.close()
+
+    def close(self) :
+        '''
+        Close every session
+        '''
+        with self._lock :
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions :
+            session.close()
@@ -0,0 +1,912 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Low-level helpers for reading and writing TAJ (Tweet Archive JSON) files.
+'''
+
+import io
+import mmap
+import os
+import re
+import struct
+import zlib
+from bisect import bisect_left, bisect_right
+import ujson as json
+
+
+COMPRESSED_EXT = '.tajz'
+BLOCK_LINES = 256
+BLOCK_RECORD = struct.Struct('<qq')
+TRAILER = struct.Struct('<qq4s')
+MAGIC = b'TAJZ'
+BLANK_LINE = re.compile(rb'\n[ \t\r\f\v]*(?=\n)')
+
+
+def indexPath(taj_file) :
+    '''
+    Name of the sidecar line-offset index for the given TAJ file
+    '''
+    return os.path.splitext(taj_file)[0] + '.tjx'
+
+def isCompressed(taj_file) :
+    '''
+    True for block-compressed TAJ files (see compressTAJ)
+    '''
+    return taj_file.endswith(COMPRESSED_EXT)
+
+def openTAJ(taj_file, mode='r') :
+    '''
+    Open a TAJ file for reading, compressed or not. Compressed files read
+    like the plain file they were made from, seek() and byte offsets
+    included, so .tjx indexes stay valid across compression.
+    '''
+    if not isCompressed(taj_file) :
+        return open(taj_file, mode)
+    if any(flag in mode for flag in 'wa+') :
+        raise ValueError('Compressed TAJ files are read-only')
+    reader = io.BufferedReader(TajzFile(taj_file), buffer_size=1024 * 1024)
+    if 'b' in mode :
+        return reader
+    return io.TextIOWrapper(reader, encoding='utf-8')
+
+def reverseLines(fopen, end=None, buf_size=8388608) :
+    '''
+    Generator over the lines of a binary file from last to first, without
+    their newlines. Empty lines are skipped. If end is given, only the part
+    of the file before that offset is read.
+    
+    Lines come as memoryview slices of the mmapped file, valid until the
+    generator finishes; use bytes(line) to keep or parse one. Files that
+    can't be mapped, like compressed ones, are read backwards in buf_size
+    chunks instead.
+    '''
+    fopen.flush()
+    try :
+        fileno = fopen.fileno()
+    except (OSError, io.UnsupportedOperation) :
+        fileno = None
+    
+    if fileno is None :
+        # Chunks from the end, carrying each one's partial first line over
+        pos = fopen.seek(0, os.SEEK_END)
+        if end is not None and end < pos :
+            pos = end
+        segment = b''
+        while pos > 0 :
+            size = min(buf_size, pos)
+            pos -= size
+            fopen.seek(pos)
+            chunk = fopen.read(size) + segment
+            view = memoryview(chunk)
+            stop = len(chunk)
+            newline = chunk.rfind(b'\n', 0, stop)
+            while newline >= 0 :
+                if newline + 1 < stop :
+                    yield view[newline + 1 :stop]
+                stop = newline
+                newline = chunk.rfind(b'\n', 0, stop)
+            segment = chunk[0 :stop]
+        if segment :
+            yield memoryview(segment)
+        return
+    
+    size = os.fstat(fileno).st_size
+    if end is not None and end < size :
+        size = end
+    if size == 0 :
+        return
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try :
+        stop = size
+        while stop > 0 :
+            start = mapped.rfind(b'\n', 0, stop) + 1
+            if start < stop :
+                yield view[start :stop]
+            stop = start - 1
+    finally :
+        view.release()
+        try :
+            mapped.close()
+        except BufferError :
+            # The caller still holds a line; the map goes with it
+            pass
+
+def tajSize(taj_file) :
+    '''
+    Size in bytes of a TAJ file's contents, uncompressed
+    '''
+    if not isCompressed(taj_file) :
+        return os.path.getsize(taj_file)
+    with open(taj_file, 'rb') as fopen :
+        return readBlockTable(fopen)[2]
+
+def compressTAJ(taj_file, block_lines=BLOCK_LINES, level=6) :
+    '''
+    Write a block-compressed copy of a TAJ file next to it and return its
+    name. The original is left for the caller to remove.
+    
+    A .tajz file is a run of independently zlib-compressed blocks of
+    block_lines lines each, followed by a table of (compressed offset,
+    uncompressed offset) int64 pairs, one per block plus a closing
+    (table offset, uncompressed size) pair, and a (table offset, number of
+    blocks, MAGIC) trailer. Readers find the block holding any byte of the
+    original through the table, so only that block gets decompressed.
+    '''
+    tajz_file = os.path.splitext(taj_file)[0] + COMPRESSED_EXT
+    tmp_file = tajz_file + '.tmp'
+    
+    table = []; offset = 0; data_offset = 0
+    with open(taj_file, 'rb') as fin, open(tmp_file, 'wb') as fout :
+        lines = []
+        for line in fin :
+            lines.append(line)
+            if len(lines) >= block_lines :
+                table.append((offset, data_offset))
+                block = b''.join(lines); lines = []
+                offset += fout.write(zlib.compress(block, level))
+                data_offset += len(block)
+        if lines :
+            table.append((offset, data_offset))
+            block = b''.join(lines)
+            offset += fout.write(zlib.compress(block, level))
+            data_offset += len(block)
+        
+        # Block table and trailer
+        table.append((offset, data_offset))
+        fout.write(b''.join(BLOCK_RECORD.pack(*record) for record in table))
+        fout.write(TRAILER.pack(offset, len(table) - 1, MAGIC))
+        fout.flush()
+        os.fsync(fout.fileno())
+    
+    # Swap the compressed file in atomically
+    os.replace(tmp_file, tajz_file)
+    return tajz_file
+
+def readBlockTable(fopen) :
+    '''
+    (compressed offsets, uncompressed offsets, uncompressed size) of the
+    blocks of an open .tajz file. Both offset lists close with the end of
+    the last block.
+    '''
+    fopen.seek(-TRAILER.size, os.SEEK_END)
+    table_offset, num_blocks, magic = TRAILER.unpack(fopen.read(TRAILER.size))
+    if magic != MAGIC :
+        raise ValueError('Not a compressed TAJ file')
+    fopen.seek(table_offset)
+    data = fopen.read((num_blocks + 1) * BLOCK_RECORD.size)
+    records = list(BLOCK_RECORD.iter_unpack(data))
+    block_offsets = [record[0] for record in records]
+    data_offsets = [record[1] for record in records]
+    return block_offsets, data_offsets, data_offsets[-1]
+
+
+class TajzFile(io.RawIOBase) :
+    '''
+    Read-only, seekable view of the uncompressed contents of a .tajz file
+    (see compressTAJ). Blocks are decompressed as reads reach them, and the
+    last one is kept for the reads that follow. Use openTAJ to get a
+    buffered or text reader on top of it.
+    '''
+
+    def __init__(self, tajz_file) :
+        '''
+        Constructor:
+        Open the file and read its block table
+        '''
+        super().__init__()
+        self.fopen = open(tajz_file, 'rb')
+        self.block_offsets, self.data_offsets, self.size = readBlockTable(self.fopen)
+        self.pos = 0
+        self.block_num = -1
+        self.block = b''
+
+    def readable(self) :
+        return True
+
+    def seekable(self) :
+        return True
+
+    def tell(self) :
+        return self.pos
+
+    def seek(self, offset, whence=os.SEEK_SET) :
+        if whence == os.SEEK_CUR :
+            offset += self.pos
+        elif whence == os.SEEK_END :
+            offset += self.size
+        if offset < 0 :
+            raise ValueError('Negative seek position')
+        self.pos = offset
+        return self.pos
+
+    def readinto(self, buffer) :
+        if self.pos >= self.size :
+            return 0
+        
+        # Decompress the block holding our position
+        n = bisect_right(self.data_offsets, self.pos) - 1
+        if n != self.block_num :
+            self.fopen.seek(self.block_offsets[n])
+            self.block = zlib.decompress(self.fopen.read(self.block_offsets[n + 1] - self.block_offsets[n]))
+            self.block_num = n
+        
+        # Copy out as much of it as fits
+        start = self.pos - self.data_offsets[n]
+        chunk = self.block[start :start + len(buffer)]
+        buffer[0 :len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+    def close(self) :
+        if not self.closed :
+            self.fopen.close()
+        super().close()
+
+
+def tweetEpoch(Tweet, tweet) :
+    '''
+    Integer epoch seconds of a tweet's 'created_at', or -1 if it has none
+    '''
+    if hasattr(Tweet, 'getEpoch') :
+        epoch = Tweet.getEpoch(tweet)
+        return -1 if epoch is None else epoch
+    timestamp = Tweet.getTimeStamp(tweet)
+    if timestamp is None :
+        return -1
+    return int(timestamp.timestamp())
+
+
+class TajIndex(object) :
+    '''
+    Sparse line-offset index for a TAJ file, stored next to it as a .tjx file.
+
+    The first line starting at or past every STRIDE bytes of TAJ data is
+    recorded as a little-endian (tweet_id, created_at epoch, byte offset)
+    triple of int64s. Records are kept in file order, so they ascend by tweet
+    ID for finished files and descend for the new-to-old "unfinished" file.
+
+    Range readers binary-search the records to seek() straight to the
+    neighbourhood of the tweets they want. The TAJ files are append-only, so
+    a record can only ever go stale by being missing; an index that lags its
+    file just means a little more scanning.
+    '''
+
+    STRIDE = 256 * 1024
+    RECORD = struct.Struct('<qqq')
+
+    def __init__(self, taj_file, Tweet, stride=None) :
+        '''
+        Constructor:
+        Open the (possibly missing) index of the given TAJ file. Call load()
+        before searching it.
+        '''
+        self.taj_file = taj_file
+        self.index_file = indexPath(taj_file)
+        self.Tweet = Tweet
+        self.stride = self.STRIDE if stride is None else stride
+
+        self.ids = []
+        self.epochs = []
+        self.offsets = []
+        self.pending = []
+        self.next_mark = 0
+
+    def __len__(self) :
+        return len(self.offsets)
+
+    def exists(self) :
+        return os.path.exists(self.index_file)
+
+    def load(self, rebuild=True) :
+        '''
+        Read the sidecar file. Legacy TAJ files without a usable index have
+        theirs rebuilt on the spot, unless rebuild is False.
+
+        Returns True if the index is usable.
+        '''
+        self.ids = []; self.epochs = []; self.offsets = []; self.pending = []
+        self.next_mark = 0
+
+        try :
+            with open(self.index_file, 'rb') as fopen :
+                data = fopen.read()
+            taj_size = tajSize(self.taj_file)
+        except (FileNotFoundError, OSError) :
+            data = None
+
+        if data is not None :
+            # Drop a torn trailing record, and anything that can't be right
+            usable = len(data) - len(data) % self.RECORD.size
+            for tweet_id, epoch, offset in self.RECORD.iter_unpack(data[:usable]) :
+                if offset >= taj_size or (self.offsets and offset <= self.offsets[-1]) :
+                    break
+                self.ids.append(tweet_id)
+                self.epochs.append(epoch)
+                self.offsets.append(offset)
+            if self.offsets :
+                self.next_mark = self.offsets[-1] + self.stride
+            if len(self.offsets) > 0 or taj_size == 0 :
+                return True
+
+        # Legacy file (or a damaged index); recreate it from the TAJ itself
+        if rebuild and os.path.exists(self.taj_file) :
+            self.rebuild()
+            return True
+        return False
+
+    def rebuild(self) :
+        '''
+        Regenerate the index by scanning its TAJ file. Only the sampled lines
+        are parsed.
+        '''
+        self.ids = []; self.epochs = []; self.offsets = []; self.pending = []
+        self.next_mark = 0
+
+        with openTAJ(self.taj_file, 'rb') as fopen :
+            offset = 0
+            for line in fopen :
+                if offset >= self.next_mark :
+                    self.note(offset, line)
+                offset += len(line)
+
+        # Swap the new index in atomically
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'wb') as fout :
+            fout.write(b''.join(self.RECORD.pack(*record) for record in self.pending))
+        os.replace(tmp_file, self.index_file)
+        self.pending = []
+
+    def wants(self, offset) :
+        '''
+        True if a line starting at this byte offset should be indexed
+        '''
+        return offset >= self.next_mark
+
+    def add(self, tweet_id, epoch, offset) :
+        '''
+        Record a line; flush() writes pending records to disk
+        '''
+        self.ids.append(tweet_id)
+        self.epochs.append(epoch)
+        self.offsets.append(offset)
+        self.pending.append((tweet_id, epoch, offset))
+        self.next_mark = offset + self.stride
+
+    def note(self, offset, tweet) :
+        '''
+        Record the tweet written at this offset if the stride calls for it.
+        The tweet may be a parsed object or its raw JSON line, as a string,
+        bytes or a memoryview.
+        '''
+        if offset < self.next_mark :
+            return
+        if isinstance(tweet, memoryview) :
+            tweet = tweet.tobytes()
+        if isinstance(tweet, (str, bytes)) :
+            try :
+                tweet = json.loads(tweet)
+            except ValueError :
+                return
+        tweet_id = self.Tweet.getTweetID(tweet)
+        if tweet_id is None :
+            return
+        self.add(tweet_id, tweetEpoch(self.Tweet, tweet), offset)
+
+    def flush(self) :
+        '''
+        Append records added since the last flush to the sidecar file
+        '''
+        if len(self.pending) == 0 :
+            return
+        with open(self.index_file, 'ab') as fout :
+            fout.write(b''.join(self.RECORD.pack(*record) for record in self.pending))
+        self.pending = []
+
+    def remove(self) :
+        '''
+        Delete the sidecar file
+        '''
+        try :
+            os.remove(self.index_file)
+        except FileNotFoundError :
+            pass
+
+    def _keys(self, newest_first) :
+        # Bisectable (ascending) view of the tweet IDs
+        if newest_first :
+            return [-tweet_id for tweet_id in self.ids]
+        return self.ids
+
+    def startOffset(self, min_bound, max_bound, newest_first=False) :
+        '''
+        Byte offset to start a forward read from so that no tweet in
+        [min_bound, max_bound] is skipped. Lines before it all fall outside
+        the range.
+        '''
+        if newest_first :
+            # Last record still newer than the range
+            n = bisect_left(self._keys(True), -max_bound) - 1
+        else :
+            # Last record still older than the range
+            n = bisect_left(self.ids, min_bound) - 1
+        if n < 0 :
+            return 0
+        return self.offsets[n]
+
+    def endOffset(self, min_bound, max_bound, newest_first=False) :
+        '''
+        Byte offset to end a reverse read at so that no tweet in
+        [min_bound, max_bound] is skipped, or None for the end of the file.
+        Lines from it onwards all fall outside the range.
+        '''
+        if newest_first :
+            # First record already older than the range
+            n = bisect_right(self._keys(True), -min_bound)
+        else :
+            # First record already newer than the range
+            n = bisect_right(self.ids, max_bound)
+        if n >= len(self.offsets) :
+            return None
+        return self.offsets[n]
+
+
+
+def histogramPath(taj_file) :
+    '''
+    Name of the sidecar tweet count histogram for the given TAJ file
+    '''
+    return os.path.splitext(taj_file)[0] + '.tjh'
+
+
+class TajHistogram(object) :
+    '''
+    Tweet counts per time bin for a TAJ file, stored next to it as a .tjh
+    file.
+
+    The sidecar is a run of little-endian (bin start epoch, count) pairs of
+    int64s. It opens with a (HEADER, bin seconds) pair, and every flush
+    appends the counts it adds followed by a (COVERED, TAJ size) pair. Counts
+    for the same bin add up, so writers only ever append. A histogram whose
+    last COVERED size doesn't match its TAJ file is stale and gets rebuilt.
+    '''
+
+    BIN_SECONDS = 60
+    RECORD = struct.Struct('<qq')
+    HEADER = -1
+    COVERED = -2
+
+    def __init__(self, taj_file, Tweet, bin_seconds=None) :
+        '''
+        Constructor:
+        Open the (possibly missing) histogram of the given TAJ file. Call
+        load() before counting with it.
+        '''
+        self.taj_file = taj_file
+        self.hist_file = histogramPath(taj_file)
+        self.Tweet = Tweet
+        self.bin_seconds = self.BIN_SECONDS if bin_seconds is None else bin_seconds
+
+        self.counts = {}
+        self.pending = {}
+        self.bins = None
+        self.cumulative = None
+
+    def __len__(self) :
+        return len(self.counts)
+
+    def exists(self) :
+        return os.path.exists(self.hist_file)
+
+    def load(self, rebuild=True) :
+        '''
+        Read the sidecar file. Legacy or stale histograms are rebuilt from
+        the TAJ file on the spot, unless rebuild is False.
+
+        Returns True if the histogram is usable.
+        '''
+        self.counts = {}; self.pending = {}; self.bins = None
+
+        try :
+            with open(self.hist_file, 'rb') as fopen :
+                data = fopen.read()
+            taj_size = tajSize(self.taj_file)
+        except (FileNotFoundError, OSError) :
+            data = None
+
+        if data is not None :
+            # Only trust counts up to the last flush that covers the whole file
+            usable = len(data) - len(data) % self.RECORD.size
+            records = list(self.RECORD.iter_unpack(data[:usable]))
+            if len(records) > 0 and records[0] == (self.HEADER, self.bin_seconds) :
+                counts = {}; covered = 0
+                for bin_start, count in records[1:] :
+                    if bin_start == self.COVERED :
+                        covered = count
+                        self.counts = dict(counts)
+                    else :
+                        counts[bin_start] = counts.get(bin_start, 0) + count
+                if covered == taj_size :
+                    return True
+                self.counts = {}
+
+        # Legacy file (or a stale histogram); recreate it from the TAJ itself
+        if rebuild and os.path.exists(self.taj_file) :
+            self.rebuild()
+            return True
+        return False
+
+    def rebuild(self) :
+        '''
+        Regenerate the histogram by parsing every tweet in its TAJ file
+        '''
+        self.counts = {}; self.pending = {}; self.bins = None
+
+        with openTAJ(self.taj_file, 'rb') as fopen :
+            for line in fopen :
+                self.note(line)
+            taj_size = fopen.tell()
+        self.counts = self.pending; self.pending = {}
+
+        # Swap the new histogram in atomically
+        tmp_file = self.hist_file + '.tmp'
+        with open(tmp_file, 'wb') as fout :
+            fout.write(self._pack(self.counts, taj_size, header=True))
+        os.replace(tmp_file, self.hist_file)
+
+    def _pack(self, counts, taj_size, header=False) :
+        # Sidecar records for the given counts
+        records = [(self.HEADER, self.bin_seconds)] if header else []
+        records.extend(sorted(counts.items()))
+        records.append((self.COVERED, taj_size))
+        return b''.join(self.RECORD.pack(*record) for record in records)
+
+    def binOf(self, epoch) :
+        '''
+        Start epoch of the bin holding this epoch
+        '''
+        return int(epoch // self.bin_seconds) * self.bin_seconds
+
+    def add(self, epoch, count=1) :
+        '''
+        Count tweets at this epoch; flush() writes pending counts to disk
+        '''
+        bin_start = self.binOf(epoch)
+        self.pending[bin_start] = self.pending.get(bin_start, 0) + count
+
+    def note(self, tweet) :
+        '''
+        Count a tweet. The tweet may be a parsed object or its raw JSON line,
+        as a string, bytes or a memoryview.
+        '''
+        if isinstance(tweet, memoryview) :
+            tweet = tweet.tobytes()
+        if isinstance(tweet, (str, bytes)) :
+            try :
+                tweet = json.loads(tweet)
+            except ValueError :
+                return
+        epoch = tweetEpoch(self.Tweet, tweet)
+        if epoch >= 0 :
+            self.add(epoch)
+
+    def flush(self, taj_size=None) :
+        '''
+        Append counts added since the last flush to the sidecar file, marked
+        as covering the first taj_size bytes of the TAJ file (all of it, by
+        default)
+        '''
+        if taj_size is None :
+            taj_size = tajSize(self.taj_file)
+        header = not os.path.exists(self.hist_file)
+        with open(self.hist_file, 'ab') as fout :
+            fout.write(self._pack(self.pending, taj_size, header))
+        for bin_start, count in self.pending.items() :
+            self.counts[bin_start] = self.counts.get(bin_start, 0) + count
+        self.pending = {}; self.bins = None
+
+    def remove(self) :
+        '''
+        Delete the sidecar file
+        '''
+        try :
+            os.remove(self.hist_file)
+        except FileNotFoundError :
+            pass
+
+    def _prefix(self) :
+        # Sorted bins and running totals, for counting windows by bisection
+        if self.bins is None :
+            self.bins = sorted(self.counts)
+            self.cumulative = [0]
+            for bin_start in self.bins :
+                self.cumulative.append(self.cumulative[-1] + self.counts[bin_start])
+        return self.bins, self.cumulative
+
+    def count(self, min_epoch=None, max_epoch=None) :
+        '''
+        Number of tweets in the bins starting in [min_epoch, max_epoch).
+        Exact when both ends fall on bin edges.
+        '''
+        bins, cumulative = self._prefix()
+        a = 0 if min_epoch is None else bisect_left(bins, min_epoch)
+        b = len(bins) if max_epoch is None else bisect_left(bins, max_epoch)
+        return cumulative[b] - cumulative[a] if b > a else 0
+
+    def series(self, min_epoch=None, max_epoch=None) :
+        '''
+        (bin start epoch, count) pairs of the non-empty bins starting in
+        [min_epoch, max_epoch), in time order
+        '''
+        bins = self._prefix()[0]
+        a = 0 if min_epoch is None else bisect_left(bins, min_epoch)
+        b = len(bins) if max_epoch is None else bisect_left(bins, max_epoch)
+        return [(bin_start, self.counts[bin_start]) for bin_start in bins[a:b]]
+
+
+def _probe(fopen, end, Tweet) :
+    # First timestamped tweet starting between the current position and end,
+    # as (start offset, end offset, tweet, epoch); None if there's none
+    while True :
+        start = fopen.tell()
+        if start >= end :
+            return None
+        line = fopen.readline()
+        if not line :
+            return None
+        try :
+            tweet = json.loads(line)
+        except ValueError :
+            continue
+        epoch = tweetEpoch(Tweet, tweet)
+        if epoch >= 0 :
+            return start, fopen.tell(), tweet, epoch
+
+def splitByTime(taj_file, Tweet, epoch, inclusive=False, newest_first=False, index=None) :
+    '''
+    Binary-search a TAJ file for where its tweets go from older than epoch
+    (or at it, if inclusive) to newer. Each probe seeks to a byte offset,
+    skips to the next line and parses just that one tweet, so this reads
+    O(log file size) lines. The index, if given, narrows the search first.
+    Relies on tweet times rising with tweet IDs.
+
+    Returns (offset, older, newer): the byte offset of the line where the
+    split falls, and the tweets either side of it in ID order (None when
+    that side of the file is empty).
+    '''
+    def older(tweet_epoch) :
+        return tweet_epoch <= epoch if inclusive else tweet_epoch < epoch
+    
+    # Whether a line falls before the split in file order
+    if newest_first :
+        before = lambda tweet_epoch : not older(tweet_epoch)
+    else :
+        before = older
+    
+    with openTAJ(taj_file, 'rb') as fopen :
+        
+        # Lines before lo come before the split, the line ending at lo is
+        # last_before, and lines from hi onwards come after the split
+        lo = 0; hi = fopen.seek(0, os.SEEK_END)
+        last_before = None
+        
+        # Start from the index records either side of the split
+        if index is not None :
+            records = [(rec_epoch, offset) for rec_epoch, offset in zip(index.epochs, index.offsets)
+                       if rec_epoch >= 0]
+            a = 0; b = len(records)
+            while a < b :
+                mid = (a + b) // 2
+                if before(records[mid][0]) :
+                    a = mid + 1
+                else :
+                    b = mid
+            if a < len(records) :
+                hi = records[a][1]
+            if a > 0 :
+                fopen.seek(records[a - 1][1])
+                probe = _probe(fopen, hi, Tweet)
+                if probe is not None and before(probe[3]) :
+                    lo = probe[1]; last_before = probe[2]
+        
+        # Bisect by byte offset
+        while lo < hi :
+            mid = (lo + hi) // 2
+            fopen.seek(mid)
+            if mid > lo :
+                fopen.readline()
+            probe = _probe(fopen, hi, Tweet)
+            if probe is None and mid > lo :
+                # No tweet starts past the midpoint; take the first one instead
+                fopen.seek(lo)
+                probe = _probe(fopen, hi, Tweet)
+            if probe is None :
+                lo = hi
+                break
+            start, end, tweet, tweet_epoch = probe
+            if before(tweet_epoch) :
+                lo = end; last_before = tweet
+            else :
+                hi = start
+        
+        # First tweet past the split
+        fopen.seek(lo)
+        probe = _probe(fopen, float('inf'), Tweet)
+        first_after = None if probe is None else probe[2]
+    
+    if newest_first :
+        return lo, first_after, last_before
+    return lo, last_before, first_after
+
+def firstTweet(fopen, offset=0) :
+    '''
+    First parseable tweet of a binary file starting at or after the given
+    line-start offset, or None
+    '''
+    fopen.seek(offset)
+    for line in fopen :
+        try :
+            return json.loads(line)
+        except ValueError :
+            continue
+    return None
+
+def countLines(taj_file, start=0, end=None, buf_size=8388608) :
+    '''
+    Number of tweets in a TAJ file between two line-start byte offsets,
+    counted as the non-blank lines there without parsing them. Lines that
+    aren't valid JSON still count.
+    '''
+    num_lines = 0
+    # Whether the line being read has been all whitespace so far
+    blank = True
+    with openTAJ(taj_file, 'rb') as fopen :
+        fopen.seek(start)
+        remaining = float('inf') if end is None else end - start
+        while remaining > 0 :
+            buffer = fopen.read(int(min(buf_size, remaining)))
+            if not buffer :
+                break
+            # A newline ends a blank line if only whitespace came since the last one
+            num_lines += buffer.count(b'\n') - len(BLANK_LINE.findall((b'\n' if blank else b'') + buffer))
+            last = buffer.rfind(b'\n')
+            blank = not buffer[last + 1:].strip() and (blank or last >= 0)
+            remaining -= len(buffer)
+    return num_lines
+
+
+FSYNC_POLICIES = ('none', 'commit', 'periodic')
+
+class TajWriter(object) :
+    '''
+    Buffered appender for a TAJ file, writing whole lines only.
+
+    Lines are held until buffer_bytes of them have built up, then written
+    in one call (os.writev on the buffered lines where available, so they
+    needn't be joined first). Tweets may be given parsed, or as the raw
+    JSON bytes they came in, which are written as they are. The file's
+    TajIndex and TajHistogram, if given, are kept up to date as tweets go
+    in and flushed on close().
+
+    The fsync policy is one of:
+    'none' - leave it to the OS
+    'commit' - sync on close()
+    'periodic' - also sync after every fsync_bytes written
+    '''
+
+    BUFFER_BYTES = 1024 * 1024
+    FSYNC_BYTES = 64 * 1024 * 1024
+    IOV_MAX = 1024
+
+    def __init__(self, taj_file, index=None, histogram=None, buffer_bytes=None,
+                 fsync='none', fsync_bytes=None, writev=True) :
+        if fsync not in FSYNC_POLICIES :
+            raise ValueError('Unknown fsync policy: ' + str(fsync))
+        self.taj_file = taj_file
+        self.index = index
+        self.histogram = histogram
+        self.buffer_bytes = self.BUFFER_BYTES if buffer_bytes is None else buffer_bytes
+        self.fsync = fsync
+        self.fsync_bytes = self.FSYNC_BYTES if fsync_bytes is None else fsync_bytes
+        self.writev = writev and hasattr(os, 'writev')
+        self.fout = open(taj_file, 'ab', buffering=0)
+        self.offset = self.fout.seek(0, os.SEEK_END)
+        self.pending = []
+        self.pending_bytes = 0
+        self.unsynced_bytes = 0
+        self.num_lines = 0
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        self.close()
+
+    def write(self, tweet, raw=None) :
+        '''
+        Append a tweet. raw, if given, is its JSON as bytes (or a str), and
+        is written in place of re-serializing the tweet; RawTweets bring
+        their own.
+        '''
+        if raw is None :
+            raw = getattr(tweet, 'raw', None)
+        if raw is None :
+            line = json.dumps(tweet).encode('utf-8')
+        else :
+            line = raw.encode('utf-8') if isinstance(raw, str) else bytes(raw)
+            line = line.strip()
+            if b'\n' in line :
+                # Pretty-printed; it has to go on one line
+                line = json.dumps(json.loads(line)).encode('utf-8')
+        offset = self.writeLine(line)
+        if self.index is not None :
+            self.index.note(offset, tweet)
+        if self.histogram is not None :
+            self.histogram.note(tweet)
+        return offset
+
+    def writeLine(self, line) :
+        '''
+        Append one already-serialized line (bytes, without its newline).
+        Returns the byte offset it starts at.
+        '''
+        offset = self.offset
+        self.pending.append(line)
+        self.pending.append(b'\n')
+        self.offset += len(line) + 1
+        self.pending_bytes += len(line) + 1
+        self.num_lines += 1
+        if self.pending_bytes >= self.buffer_bytes :
+            self.flush()
+        return offset
+
+    def flush(self) :
+        '''
+        Write out the buffered lines
+        '''
+        if self.pending :
+            if self.writev :
+                self._writev(self.pending)
+            else :
+                self.fout.write(b''.join(self.pending))
+            self.unsynced_bytes += self.pending_bytes
+            self.pending = []; self.pending_bytes = 0
+        if self.fsync == 'periodic' and self.unsynced_bytes >= self.fsync_bytes :
+            self.sync()
+
+    def _writev(self, buffers) :
+        # Scatter-write the buffers, picking up after short writes
+        fd = self.fout.fileno()
+        n = 0
+        while n < len(buffers) :
+            written = os.writev(fd, buffers[n :n + self.IOV_MAX])
+            while n < len(buffers) and written >= len(buffers[n]) :
+                written -= len(buffers[n])
+                n += 1
+            if written > 0 :
+                buffers[n] = buffers[n][written:]
+
+    def sync(self) :
+        '''
+        Flush the file to disk
+        '''
+        os.fsync(self.fout.fileno())
+        self.unsynced_bytes = 0
+
+    def close(self) :
+        '''
+        Write out everything, sync as the policy says, and flush the index
+        and histogram
+        '''
+        if self.fout.closed :
+            return
+        self.flush()
+        if self.fsync != 'none' and self.unsynced_bytes > 0 :
+            self.sync()
+        self.fout.close()
+        if self.index is not None :
+            self.index.flush()
+        if self.histogram is not None :
+            self.histogram.flush(self.offset)
@@ -4,6 +4,7 @@ import requests
 
 from TwAPIer import TwiAPIer
 from TwArchive import TweetArchive
+from RateLimits import RateScheduler
 
 import time
 
@@ -12,6 +13,9 @@ class RatelimitError(requests.exceptions.HTTPError) :
     """Twitter wants us to chill out and wait a little while before trying to reconnect."""
 
 class TopicTracker(object) :
+    
+    APP_SEARCH_LIMIT = 450      # Search requests per window, with application-only auth
+    
     def __init__(self, fout='tweetstream_JSON.taj') :
         '''
         Twitter Streaming API collection entity. Writes all valid tweets collected to fout in JSON format,
@@ -27,6 +31,8 @@ class TopicTracker(object) :
         # Output files
         self.fout = fout
         self.error_logs = 'logs/topic_tracking_errors.log'
+        # Shares each rate-limiting window out among the topics by how busy they are
+        self.scheduler = RateScheduler(limit=self.APP_SEARCH_LIMIT)
     
     # Error handling for stream connection
     def reset_errors(self) :
@@ -139,7 +145,10 @@ class TopicTracker(object) :
     def collectTopics(self, query_list, archive_dir=None, sample_evenness=1.0,
                       lang='en') :
         '''
-        Collect an even sampling of tweets across several topics, up to all available Tweets.
+        Collect a sampling of tweets across several topics, up to all available Tweets. Each rate-limiting window's
+        requests are shared out among the topics by their recent yield (tweets per request), so busy topics get more
+        of them; every topic still gets at least one request per pass. Once the window's requests are spent, we sleep
+        until Twitter resets it. See self.scheduler.topicBudgets() for how the latest pass was shared out.
 
         NOTE: This function uses application-only auth and has no user context. It uses the credentials returned by
         your api_secrets.py oauth2() function. Ensure that user_idx in api_secrets.py is adjusted to return the bearer
@@ -147,33 +156,45 @@ class TopicTracker(object) :
 
         :param query_list: List of strings specifying search queries
         :param archive_dir: Override your default archive_dir if desired
-        :param sample_evenness: Increase for shorter collection intervals on each topic. (Warning: If set too high, this
-        may cause you to undershoot your rate-limit because there is a small time-overhead in changing query topics.)
+        :param sample_evenness: Increase for more, shorter passes over the topics in each window. (Warning: If set too
+        high, this may cause you to undershoot your rate-limit because there is a small time-overhead in changing query
+        topics.)
         :return:
         '''
     
         # Initialization
         if sample_evenness < 1.0 : sample_evenness = 1.0
-        if sample_evenness > 450 / len(query_list) : sample_evenness = 450.0 / float(len(query_list))
-        MAX_QUERIES = 450 / (len(query_list) * sample_evenness)
-        time_alloc = 15.0 * 60.0 / (float(len(query_list)) * sample_evenness)
+        if sample_evenness > self.APP_SEARCH_LIMIT / len(query_list) :
+            sample_evenness = self.APP_SEARCH_LIMIT / float(len(query_list))
+        
+        # Wait out the window if we've spent it
+        rest = self.scheduler.sleepUntilReset()
+        if rest > 0 :
+            print('Rate-limiting window spent. Rested for ' + str(rest) + ' seconds.')
+        
+        # Share this pass's requests out among the topics
+        limit, remaining = self.scheduler.budget.state()[0 :2]
+        allocation = self.scheduler.allocate(query_list, min(remaining, limit / sample_evenness))
     
-        # Connect to Twitter API
-        api = TwiAPIer()
+        pass_start = time.time()
+    
+        # Connect to Twitter API, on the session kept for our app credentials across passes
+        api = TwiAPIer(scheduler=self.scheduler)
+        try :
+            api.connect(user=False)
+        except :
+            print('Error connecting to Twitter API!')
+            raise
     
         # Iterate through keywords
         for query in query_list :
+            if allocation[query] == 0 :
+                continue
         
             # Begin cycle
             qstart = time.time()
-            print('\n\n\nProcessing: ' + query + '\nStart time: ' + str(qstart))
-        
-            # Connect to API
-            try :
-                api.connect(user=False)
-            except :
-                print('Error connecting to Twitter API!')
-                raise
+            print('\n\n\nProcessing: ' + query + '\nStart time: ' + str(qstart) + \
+                  '\nRequests allotted: ' + str(allocation[query]))
         
             # Initialize archive
             try :
@@ -184,28 +205,32 @@ class TopicTracker(object) :
         
             # Collect new tweets and append them to our archive
             try :
-                DONE_READING, RATE_LIMITED = api.archiveSearch(ARX, MAX_QUERIES, wait_on_rate_limit=True,
-                                                               auto_exhaust=True, lang=lang)
+                DONE_READING, RATE_LIMITED = api.archiveSearch(ARX, allocation[query], wait_on_rate_limit=True,
+                                                               auto_exhaust=True)
                 if RATE_LIMITED :
                     print('Warning! Rate limit reached. Verify that you aren\'t collecting too quickly.')
             except :
                 print('Exception during archive search!')
                 raise
         
-            # Disconnect API session
-            try :
-                api.disconnect()
-            except :
-                print('Error disconnecting from Twitter API!')
-                api.tcp_sess = None
+            print('End time: ' + str(time.time()))
+        
+        # Let go of the API session; it stays open for the next pass
+        try :
+            api.disconnect()
+        except :
+            print('Error disconnecting from Twitter API!')
+            api.tcp_sess = None
         
-            # Preserve even query spacing, don't exceed rate-limit
-            qfin = time.time()
-            print('End time: ' + str(qfin))
-            t_interval = qfin - qstart
-            if t_interval < time_alloc :
-                print('Finished early. Resting for ' + str(time_alloc - t_interval) + ' seconds.')
-                time.sleep(time_alloc - t_interval)
+        # Preserve even spacing of the passes, but don't sit past the window resetting
+        pass_end = pass_start + self.scheduler.budget.window / sample_evenness
+        reset = self.scheduler.budget.state()[2]
+        if reset is not None :
+            pass_end = min(pass_end, reset + self.scheduler.RESET_SLACK)
+        rest = pass_end - time.time()
+        if rest > 0 :
+            print('Finished early. Resting for ' + str(rest) + ' seconds.')
+            time.sleep(rest)
 
 # use  topics_automation/run_topictracker.py instead
 #if __name__ == "__main__" :
@@ -11,15 +11,26 @@ from rauth import OAuth1Service
 import requests
 import api_secrets
 import Tweet, config_sys
+import RawTweet
+import RateLimits
+from RateLimits import RateScheduler
+from SessionPool import SessionPool
 from TwArchive import TweetArchive
 import time
 
+# Search endpoint; point it elsewhere (e.g. a local fake) in config_sys
+SEARCH_URL = getattr(config_sys, 'SEARCH_URL', 'https://api.twitter.com/1.1/search/tweets.json')
+
+# Sessions shared by every TwiAPIer in the process, by credential
+SESSION_POOL = SessionPool(getattr(config_sys, 'HTTP_POOL_CONNECTIONS', None),
+                           getattr(config_sys, 'HTTP_POOL_MAXSIZE', None))
+
 class TwiAPIer(object):
     """
     Twitter API interface object
     """
     
-    def __init__(self, api_keys=None):
+    def __init__(self, api_keys=None, scheduler=None):
         """
         Constructor
         """
@@ -27,6 +38,9 @@ class TwiAPIer(object):
         self.MAX_QUERIES = 60           # Max requests to use in one search
         self.tcp_sess = None
         self.secrets = api_keys
+        
+        # Search rate limits of these credentials (share it between APIers on the same ones)
+        self.scheduler = RateScheduler() if scheduler is None else scheduler
     
     def getSecrets(self, user=True) :
         if self.secrets is None :
@@ -91,14 +105,40 @@ class TwiAPIer(object):
         
         return sess
     
+    def credentialKey(self, user=True) :
+        """
+        What tells our credentials apart in the session pool
+        """
+        if user :
+            secrets = self.getSecrets(user=True)
+            return ('user', secrets['consumer_key'], secrets['token_key'])
+        else :
+            return ('app',) + tuple(api_secrets.oauth2())
+    
+    def getSession(self, user=True, verbose=False) :
+        """
+        The pooled session for our credentials, set up the first time
+        anyone in the process asks for it (see SESSION_POOL)
+        """
+        if user :
+            factory = lambda : self.generateUserSession(verbose=verbose)
+        else :
+            factory = lambda : self.generateAppSession(verbose=verbose)
+        return SESSION_POOL.get(self.credentialKey(user), factory)
+    
     # Extract the tweets from a given query
-    def getTweets(self, response) :
+    def getTweets(self, response, raw=False) :
         """
-        Get the tweets contained in a response.
+        Get the tweets contained in a response. With raw set, they're
+        RawTweets: the statuses' original bytes plus their IDs and dates,
+        sliced out of the response without decoding it (see getRawTweets).
         """
         
         # Parse the json data
         if response is not None :
+            if raw :
+                tweets = self.getRawTweets(response)
+                return [] if tweets is None else self.siftTweets(tweets)
             data = response.json()
         else :
             return []
@@ -113,6 +153,17 @@ class TwiAPIer(object):
         
         return tweets
     
+    def getRawTweets(self, response) :
+        """
+        The statuses in a response as RawTweets, or None if it has none
+        (e.g. it's an error). Raises ValueError for mangled JSON. The result
+        is kept on the response, so checking it and then archiving it only
+        scans it once.
+        """
+        if not hasattr(response, 'raw_tweets') :
+            response.raw_tweets = RawTweet.rawTweets(response.content)
+        return response.raw_tweets
+    
     # Sort and log tweets
     def siftTweets(self, tweets) :
         """
@@ -152,25 +203,8 @@ class TwiAPIer(object):
              
             '''
             
-            # Load your API keys
-            secrets = self.getSecrets(user=True)
-            if verbose : print('\nSecrets loaded')
-            
-            # Create rauth request
-            twitter = OAuth1Service(
-                                    consumer_key= secrets['consumer_key'],
-                                    consumer_secret= secrets['consumer_secret'],
-                                    name='twitter',
-                                    access_token_url='https://api.twitter.com/oauth/access_token',
-                                    authorize_url='https://api.twitter.com/oauth/authorize',
-                                    request_token_url='https://api.twitter.com/oauth/request_token',
-                                    base_url='https://api.twitter.com/1.1/')
-            if verbose: print('oAuth service started')
-            
-            # Get a session
-            session = twitter.get_session(
-                        (secrets['token_key'],secrets['token_secret']))
-            if verbose : print('oAuth session created')
+            # Our long-lived session for these credentials
+            session = self.getSession(user=True, verbose=verbose)
             
             # Fill out query parameters
             query = ''; ctr = 0
@@ -213,25 +247,8 @@ class TwiAPIer(object):
 
             '''
         
-            # Load your API keys
-            secrets = self.getSecrets(user=True)
-            if verbose : print('\nSecrets loaded')
-        
-            # Create rauth request
-            twitter = OAuth1Service(
-                consumer_key=secrets['consumer_key'],
-                consumer_secret=secrets['consumer_secret'],
-                name='twitter',
-                access_token_url='https://api.twitter.com/oauth/access_token',
-                authorize_url='https://api.twitter.com/oauth/authorize',
-                request_token_url='https://api.twitter.com/oauth/request_token',
-                base_url='https://api.twitter.com/1.1/')
-            if verbose : print('oAuth service started')
-        
-            # Get a session
-            session = twitter.get_session(
-                (secrets['token_key'], secrets['token_secret']))
-            if verbose : print('oAuth session created')
+            # Our long-lived session for these credentials
+            session = self.getSession(user=True, verbose=verbose)
         
             # Fill out query parameters
             query = ''
@@ -301,10 +318,7 @@ class TwiAPIer(object):
         if verbose : print('oAuth session created')
         '''
         
-        if user :
-            session = self.generateUserSession(verbose=verbose)
-        else :
-            session = self.generateAppSession(verbose=verbose)
+        session = self.getSession(user=user, verbose=verbose)
 
         # If you don't have a session yet, this is your default
         if self.tcp_sess is None :
@@ -315,14 +329,26 @@ class TwiAPIer(object):
     def disconnect(self, session=None) :
         """
         Disconnect the Twitter session specified. If no session is provided, the default
-        session will be ended, if it exists.
+        session will be ended, if it exists. Pooled sessions are only let go of, and stay
+        open for the next user of the same credentials.
         """
         if session is None :
-            if self.tcp_sess is not None :
-                self.tcp_sess.close()
-                self.tcp_sess = None
-        else :
+            session = self.tcp_sess
+            self.tcp_sess = None
+        if session is not None and not SESSION_POOL.owns(session) :
             session.close()
+    
+    def reconnect(self, session=None, user=True, verbose=False) :
+        """
+        Replace a broken session (by default, ours) with a fresh one
+        """
+        if session is None :
+            session = self.tcp_sess
+        if session is self.tcp_sess :
+            self.tcp_sess = None
+        if session is not None :
+            SESSION_POOL.discard(session)
+        return self.connect(user=user, verbose=verbose)
 
     def searchQuery(self, query, bounds, lang='en', filters=None, session=None, verbose=True) :
         """
@@ -348,7 +374,7 @@ class TwiAPIer(object):
             print('\nSending search request...')
             print('If this takes a long time, be sure to check availability:')
             print('https://dev.twitter.com/overview/status\n')
-        TWITTER_URL = 'https://api.twitter.com/1.1/search/tweets.json'
+        TWITTER_URL = SEARCH_URL
 
         # Send the request to Twitter and give the result
         if session is None :
@@ -419,21 +445,33 @@ class TwiAPIer(object):
     def searchQuerySafe(self, query, bounds, lang='en', filters=None, session=None, retry_on_rate_limit=False, verbose=True) :
         """
         Wrapper for sendQuery to handle exceptions and rate-limiting by Twitter API.
+        Rate limits are waited out until the window resets, as Twitter's
+        response headers report it (see RateLimits.RateScheduler).
         """
         # Watch network errors and wait if timed out
-        failhard = False; ctr = 0
-        WAIT_INTERVAL = 60; MAX_TRIES = 900 / WAIT_INTERVAL
+        failhard = False; waited = 0.0
         while not failhard :
 
             # Make requests until one succeeds or we surrender
             try :
                 
+                # Don't bother Twitter when we know we're out of requests
+                if not self.scheduler.budget.take() :
+                    if verbose : print('Out of requests for this rate-limiting window!')
+                    delay = self.rateLimitWait(waited, retry_on_rate_limit, verbose)
+                    if delay is None :
+                        failhard = True
+                    else :
+                        waited += delay
+                    continue
+                
                 # Query until we get valid JSON
                 brokentweetctr = 0
                 while True :
                     reply = self.searchQuery(query, bounds, lang, filters=filters, session=session, verbose=False)
+                    self.scheduler.update(reply)
                     try :
-                        data = reply.json()
+                        statuses = self.getRawTweets(reply)
                     except ValueError :
                         if brokentweetctr < 3 :
                             brokentweetctr += 1
@@ -445,17 +483,14 @@ class TwiAPIer(object):
                     
 
                 # If we're being rate limited
-                if reply.status_code == 429 or 'statuses' not in data :
+                if reply.status_code == 429 or statuses is None :
                     if verbose :
                         print('HTTP Code : ' + str(reply.status_code) + ' - Rate limited!')
-                    ctr += 1
-
-                    # If we haven't waited a full time period, keep waiting
-                    if ctr < MAX_TRIES and retry_on_rate_limit :
-                        if verbose : print('Attempt ' + str(ctr+1) + ' in ' + str(WAIT_INTERVAL) + ' seconds...\n')
-                        time.sleep(WAIT_INTERVAL)
-                    else :
+                    delay = self.rateLimitWait(waited, retry_on_rate_limit, verbose)
+                    if delay is None :
                         failhard = True
+                    else :
+                        waited += delay
 
                 # Not rate limited; not handling other HTTP errors yet
                 else :
@@ -463,8 +498,7 @@ class TwiAPIer(object):
             
             except ConnectionError :
                 if verbose : print('Connection terminated: Reconnecting...')
-                self.disconnect(session)
-                self.connect()
+                self.reconnect(session)
                 if verbose : print('Reconnection successful.')
                 continue
             
@@ -477,6 +511,24 @@ class TwiAPIer(object):
         if verbose and retry_on_rate_limit : print('Failed hard! Not getting new rate-limiting periods!')
         return None, failhard
 
+    def rateLimitWait(self, waited, retry_on_rate_limit, verbose=True) :
+        """
+        Wait out a rate limit: until the window resets, or a short while if
+        Twitter didn't say when that is. Returns the seconds waited, or None
+        if we shouldn't wait (any longer than a full window, all told).
+        """
+        WAIT_INTERVAL = 60
+        MAX_WAIT = RateLimits.WINDOW_SECONDS + WAIT_INTERVAL
+        
+        delay = self.scheduler.waitTime()
+        if delay <= 0 :
+            delay = WAIT_INTERVAL
+        if not retry_on_rate_limit or waited + delay > MAX_WAIT :
+            return None
+        if verbose : print('Next attempt in ' + str(int(delay)) + ' seconds...\n')
+        time.sleep(delay)
+        return delay
+
     def archiveSearch(self, arx, req_limit=0, wait_on_rate_limit=True, exhaust_on_ratelimit=False, auto_exhaust=False) :
         """
 
@@ -490,96 +542,111 @@ class TwiAPIer(object):
         :return:
         """
         
-        # You can't take unlimited queries AND keep waiting for new ones
-        if req_limit == 0 : wait_on_rate_limit = False
-        
         # Verify archive index provided
         if not isinstance(arx, TweetArchive) :
             print('Invalid arx specified!\n')
         else :
             print('Archive index validated.\n')
-        
-        
-        query = arx['query']
-        filters = arx['filters']
-
-        # Pick the language for your search
-        if filters is not None and 'lang' in filters :
-            lang = filters['lang']
-            filters.pop('lang', None)
-        else :
-            lang = 'en'
-        
-        
-        bounds = arx.getBounds()
-
-        tweets = []
-        exhausted = False
-        rate_limited = False
 
         # Say hi to Twitter
         if self.tcp_sess is None :
             self.connect()
             print('Session connected.')
-
+        
+        def send(query, bounds, lang, filters, wait) :
+            resp, rate_limited = self.searchQuerySafe(query, bounds, lang=lang, filters=filters, retry_on_rate_limit=wait)
+            return resp, self.getTweets(resp, raw=True), rate_limited
+        
         # Catch up on things, see what's new
         try :
-            ctr = 0; exhaustion = 0
-            while ctr < req_limit or req_limit == 0 :
+            exhausted, rate_limited, num_requests, num_tweets = collectSearch(arx, send, req_limit, wait_on_rate_limit,
+                                                                              exhaust_on_ratelimit, auto_exhaust)
+        
+        # If the discussion gets out of hand, end it
+        except Exception :
+            self.disconnect()
+            raise
+        
+        # Keep track of how busy the topic is
+        self.scheduler.record(arx['query'], num_requests, num_tweets)
+        return exhausted, rate_limited
 
-                # Send Twitter a query
-                resp, rate_limited = self.searchQuerySafe(query, bounds, lang=lang, filters=filters, retry_on_rate_limit=wait_on_rate_limit)
-                
-                # If you got a bad answer or gave up waiting for rate-limit
-                if resp is None :
-                    if wait_on_rate_limit : print('No response! Breaking collection.')
-                    break
 
-                # We've used a request
-                ctr += 1
+def collectSearch(arx, send, req_limit=0, wait_on_rate_limit=True, exhaust_on_ratelimit=False, auto_exhaust=False) :
+    """
+    Page back through the search results for an archive's query and journal
+    them in it; the collection loop behind TwiAPIer.archiveSearch and
+    SearchCollector. send(query, bounds, lang, filters, wait) makes one
+    search request and returns (response, tweets, rate_limited), with the
+    response None once we should stop.
+    
+    Returns (exhausted, rate_limited, requests used, tweets collected)
+    """
+    
+    # You can't take unlimited queries AND keep waiting for new ones
+    if req_limit == 0 : wait_on_rate_limit = False
+    
+    # Pick the language for your search, leaving the archive's filters be
+    query = arx['query']
+    filters = arx['filters']
+    if filters is not None and 'lang' in filters :
+        filters = dict(filters)
+        lang = filters.pop('lang')
+    else :
+        lang = 'en'
+    
+    bounds = arx.getBounds()
 
-                # Parse the reply
-                resp_code = resp.status_code
-                twpart = self.siftTweets(self.getTweets(resp))
-                
-                # Rectify bounds so we don't collect the same set of tweets over and over again
-                if len(twpart) > 0 :
-                    bounds = (bounds[0],Tweet.getTweetID(twpart[-1])-1,bounds[2],Tweet.getDate(twpart[-1]))
-                
-                # If we got tweets in response
-                if resp_code == 200 :
-
-                    # Add these to your tweets
-                    tweets += twpart
-
-                    # If you didn't get too many
-                    if len(twpart) < 10 :
-                        
-                        # Start to worry we're running out of tweets
-                        exhaustion += 1
-                        
-                        # We're done collecting; nothing more to find
-                        if exhaustion == 3 or len(twpart) == 0:
-                            exhausted = True
-                            break
-
-                    # We're not running out of tweets
-                    else :
-                        exhaustion = 0
+    tweets = []
+    exhausted = False
+    rate_limited = False
 
+    ctr = 0; exhaustion = 0
+    while ctr < req_limit or req_limit == 0 :
 
-        # If the discussion gets out of hand, end it
-        except Exception :
-            self.disconnect()
-            raise
+        # Send Twitter a query
+        resp, twpart, rate_limited = send(query, bounds, lang, filters, wait_on_rate_limit)
         
-        # We might want to ignore earlier tweets if we know we can't keep up
-        if exhaust_on_ratelimit :
-            effective_exhausted = exhausted or rate_limited
-        else :
-            effective_exhausted = exhausted
-        effective_exhausted = effective_exhausted or auto_exhaust
+        # If you got a bad answer or gave up waiting for rate-limit
+        if resp is None :
+            if wait_on_rate_limit : print('No response! Breaking collection.')
+            break
+
+        # We've used a request
+        ctr += 1
         
-        # Archive what we collected
-        arx.appendTweets(tweets, effective_exhausted)
-        return exhausted, rate_limited
\ No newline at end of file
+        # Rectify bounds so we don't collect the same set of tweets over and over again
+        if len(twpart) > 0 :
+            bounds = (bounds[0],Tweet.getTweetID(twpart[-1])-1,bounds[2],Tweet.getDate(twpart[-1]))
+        
+        # If we got tweets in response
+        if resp.status_code == 200 :
+
+            # Add these to your tweets
+            tweets += twpart
+
+            # If you didn't get too many
+            if len(twpart) < 10 :
+                
+                # Start to worry we're running out of tweets
+                exhaustion += 1
+                
+                # We're done collecting; nothing more to find
+                if exhaustion == 3 or len(twpart) == 0:
+                    exhausted = True
+                    break
+
+            # We're not running out of tweets
+            else :
+                exhaustion = 0
+    
+    # We might want to ignore earlier tweets if we know we can't keep up
+    if exhaust_on_ratelimit :
+        effective_exhausted = exhausted or rate_limited
+    else :
+        effective_exhausted = exhausted
+    effective_exhausted = effective_exhausted or auto_exhaust
+    
+    # Archive what we collected
+    arx.appendTweets(tweets, effective_exhausted)
+    return exhausted, rate_limited, ctr, len(tweets)
@@ -4,17 +4,42 @@ Created on Nov 4, 2015
 @author: geofurb
 '''
 
-# NetworkX performs network analytics (computes scc)
 # BitAPIer.py is only used to find the archive directory (no TCP connections)
 
 
 import time
 from multiprocessing import Pool
-from functools import partial
 import heapq
 
-import networkx as nx
-from math import log
+import numpy as np
+
+from CIGraph import CIGraph, IncrementalCI
+
+
+# CI worker processes attach to the shared graph once, then take tasks
+_worker_graph = None
+
+def _attachCIGraph(handle) :
+    global _worker_graph
+    _worker_graph = CIGraph.attach(handle)
+
+def _rangeCI(task) :
+    # CI of the nodes in [start, stop)
+    start, stop, sparse, ball_rad, directed, treelike, CP = task
+    if sparse :
+        return _worker_graph.batchCI(ball_rad, directed, treelike, CP, nodes=np.arange(start, stop))
+    return [_worker_graph.calcCI(node, ball_rad, directed, treelike, CP) for node in range(start, stop)]
+
+def _rangeShellSums(task) :
+    # Directed shell degree sums of the nodes in [start, stop)
+    start, stop, ball_rad = task
+    return _worker_graph.shellSums(ball_rad, nodes=np.arange(start, stop))
+
+def _nodesCI(task) :
+    # CI of a list of nodes
+    nodes, ball_rad, directed, treelike, CP = task
+    return [_worker_graph.calcCI(node, ball_rad, directed, treelike, CP) for node in nodes]
+
 
 class TwiAnalytics(object) :
     '''
@@ -24,6 +49,9 @@ class TwiAnalytics(object) :
     
     ALGORITHM_DB = 'flavioman/'
     
+    # Stale nodes recalculated per worker in each batch
+    RECALC_PER_CORE = 8
+    
     def __init__(self, num_ci_threads=1) :
         '''
         Constructor
@@ -31,9 +59,34 @@ class TwiAnalytics(object) :
         self.CORES = num_ci_threads
         self.CP = False
     
-    # Threaded CI routine
+    # Threaded CI routine; graph may be a NetworkX DiGraph or a CIGraph
     def siteCI(self, graph, ball_rad=2, directed=True, treelike=True,
-                           verbose=True, flashy=True, G_q_filename=None) :
+                           verbose=True, flashy=True, G_q_filename=None, sparse_init=True,
+                           incremental=True, G_q_step=0.01, G_q_strong=False) :
+        
+        # The top 100 influencers, with CI rescaled to the size of a degree
+        return self.collapseCI(graph, ball_rad, directed, treelike, verbose, flashy, G_q_filename,
+                               sparse_init, incremental, G_q_step, G_q_strong, max_winners=100, ci_root=True)
+    
+    # Threaded CI routine; graph may be a NetworkX DiGraph or a CIGraph
+    def deferredThreadedCI(self, graph, ball_rad=2, directed=True, treelike=True,
+                           verbose=True, flashy=True, G_q_filename=None, sparse_init=True,
+                           incremental=True, G_q_step=0.01, G_q_strong=False) :
+        
+        # Every influencer down to CI < 1
+        return self.collapseCI(graph, ball_rad, directed, treelike, verbose, flashy, G_q_filename,
+                               sparse_init, incremental, G_q_step, G_q_strong)
+    
+    # Remove influencers by CI until the graph collapses
+    def collapseCI(self, graph, ball_rad=2, directed=True, treelike=True,
+                   verbose=True, flashy=True, G_q_filename=None, sparse_init=True,
+                   incremental=True, G_q_step=0.01, G_q_strong=False, max_winners=None, ci_root=False) :
+        '''
+        Remove the node of highest CI, one at a time, until no node has a
+        CI of 1 or more (or max_winners are found). Returns the influencers'
+        labels, starting degrees and CIs at removal, the CIs taken to the
+        1/ball_rad power if ci_root is set.
+        '''
         
         start = time.time()
         main_proc_time = 0
@@ -44,247 +97,62 @@ class TwiAnalytics(object) :
         winners = []
         winner_deg = []
         winners_ci = []
-        
-        
-        if G_q_filename is not None:
-            G_q_file = open(G_q_filename, 'w')
-        
-        # Start thread pool
-        pool = Pool(self.CORES)
-        f = partial(self.cleanCalcCI, graph, ball_rad=ball_rad, directed=directed, treelike=treelike)
-        
-        # Calculate CI for entire graph
-        if verbose : print('\nMultitasking with ' + str(self.CORES) + ' threads.\n')
-        
-        num_nodes = len(graph.nodes())
-        
-        
-        newtime = time.time()
-        main_proc_time += newtime - start
-        newtime = time.time()
-        
-        node_CIs = pool.map(f, graph.nodes())
-        
-        CI_time += time.time() - newtime
-        newtime = time.time()
-        
-        pile = []
-        for n, node in enumerate(graph.nodes()) :
-            graph.node[node]['CI'] = node_CIs[n]
-            graph.node[node]['start_deg'] = graph.degree(node)
-            graph.node[node]['start_CI'] = node_CIs[n]
-            pile.append((-1 * node_CIs[n], node))
-            n += 1
-        
-        # Our hybrid heap/hashmap wizardry
-        updated = set()
-        heapq.heapify(pile)
-        
+        removed_nodes = []
+        
+        # Compact array copy of the graph for the CI computations; a CIGraph
+        # passed in may hold removals from an earlier run, so start it afresh
+        if isinstance(graph, CIGraph) :
+            cig = graph
+            cig.reset()
+        else :
+            cig = CIGraph.fromNetworkX(graph)
+        
+        # Start worker pool; the workers attach to the graph in shared memory
+        pool = None
         try :
-            max_bundle = heapq.heappop(pile)
-        except IndexError :
-            max_bundle = None
+            if self.CORES > 1 :
+                pool = Pool(self.CORES, initializer=_attachCIGraph, initargs=(cig.share(),))
+            ci_args = (ball_rad, directed, treelike, self.CP)
             
-        
-        main_proc_time += time.time() - newtime
-        newtime = time.time()
-        
-        # Remove influencers until none remain
-        while max_bundle is not None and len(winners) < 100 :
+            # Calculate CI for entire graph
+            if verbose : print('\nMultitasking with ' + str(self.CORES) + ' threads.\n')
             
+            num_nodes = cig.num_nodes
+            start_deg = cig.degree(np.arange(num_nodes))
             
-                max_CI = max_bundle[0] * -1
-                max_node = max_bundle[1]
-                
-                # Remove influencer
-                main_proc_time += time.time() - newtime
-                newtime = time.time()
-                
-                max_ball = self.buildInBall(graph, max_node, ball_rad)
-                
-                build_in_time += time.time() - newtime
-                newtime = time.time()
-                
-                winners.append(max_node)
-                winner_deg.append(graph.node[max_node]['start_deg'])
-                winners_ci.append(max_CI ** (1/ball_rad))
-                #winners_ci.append(graph.node[max_node]['start_CI'])
-                
-                if G_q_filename is not None:
-                    # print q and G(g)
-                    q = 1-graph.number_of_nodes()/num_nodes
-                    gc_nodes = max(nx.strongly_connected_components(graph), key=len)
-                    nodes_in_gc = [node for node in graph.nodes_iter() if node in gc_nodes]
-                    
-                    
-                    print("{:.6f}".format(q) + ', ' + "{:.6f}".format(len(nodes_in_gc)/num_nodes), file=G_q_file)
-                
-                graph.remove_node(max_node)
-                
-                if flashy :
-                    print('#',end="",flush=True)
-                    if len(winners) % 100 == 0 :
-                            print('')
+            newtime = time.time()
+            main_proc_time += newtime - start
+            newtime = time.time()
             
-                # Mark nodes inside the ball for deferred CI update
-                # (Other CI values will not have changed)
-                for ring in max_ball :
-                    for node in ring :
-                        updated.add(node)
-                
-                main_proc_time += time.time() - newtime
-                newtime = time.time()
-                
-                # Find next influencer
-                max_bundle = None
-                while max_bundle is None and len(pile) > 0 :
-                    
-                    # Take the root item
-                    try :
-                        max_bundle = heapq.heappop(pile)
-                    except IndexError :
-                        max_bundle = None
-                        break
-                    max_CI = max_bundle[0] * -1
-                    max_node = max_bundle[1]
-                    
-                    
-                    # Check if it's up-to-date
-                    if max_node in updated :
-                        
-                        sort_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        new_CI = self.cleanCalcCI(graph, max_node, ball_rad=ball_rad, directed=directed, treelike=treelike)
-                        
-                        CI_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        updated.remove(max_node)
-                        heapq.heappush(pile, (-1 * new_CI, max_node))
-                        max_bundle = None
-                        continue
-                    '''
-                    # Threading this isn't worth the overhead
-                    # Saving this code for when it might be
-                    if max_node in updated :
-                        
-                        # Recalc CORES nodes at a time for efficiency
-                        recalc_nodes = []; no_recalc = []
-                        recalc_nodes.append(max_node)
-                        updated.remove(max_node)
-                        
-                        while len(recalc_nodes) < self.CORES and len(pile) > 0:
-                            next_bundle = heapq.heappop(pile)
-                            next_top = next_bundle[1]
-                            if next_top in updated :
-                                updated.remove(next_top)
-                                recalc_nodes.append(next_top)
-                            else :
-                                no_recalc.append(next_bundle)
-                        
-                        sort_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        # Calculate fresh CIs
-                        new_CIs = pool.map(f, recalc_nodes)
-                        
-                        CI_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        # Reinsert into heap with newly computed CI values
-                        for n, node in enumerate(recalc_nodes) :
-                            heapq.heappush(pile, (-1 * new_CIs[n], node))
-                        for node in no_recalc :
-                            heapq.heappush(pile, node)
-                        max_bundle = None
-                        continue
-                        '''
-                    
-                sort_time += time.time() - newtime
-                newtime = time.time()
-                
-                # Remove it
-                if max_CI < 1 :
-                    break
-                        
-        # Return your sorted list of influencers
-        if verbose :
-            print('\nMain proc: ' + str(main_proc_time))
-            print('CI time: ' + str(CI_time))
-            print('Sort time: ' + str(sort_time))
-            print('Build In: ' + str(build_in_time))
-            print('\nInfluencers Total: ' + str(len(winners)))
-            print('Number of Nodes: ' + str(num_nodes))
-            print('\n')
-        pool.close(); pool.join()
-        
-        if G_q_filename is not None:
-            G_q_file.close()
-        
-        return winners, winner_deg, winners_ci
-    
-    # Threaded CI routine
-    def deferredThreadedCI(self, graph, ball_rad=2, directed=True, treelike=True,
-                           verbose=True, flashy=True, G_q_filename=None) :
-        
-        start = time.time()
-        main_proc_time = 0
-        CI_time = 0
-        sort_time = 0
-        build_in_time = 0
-        
-        winners = []
-        winner_deg = []
-        winners_ci = []
-        
-        
-        if G_q_filename is not None:
-            G_q_file = open(G_q_filename, 'w')
-        
-        # Start thread pool
-        pool = Pool(self.CORES)
-        f = partial(self.cleanCalcCI, graph, ball_rad=ball_rad, directed=directed, treelike=treelike)
-        
-        # Calculate CI for entire graph
-        if verbose : print('\nMultitasking with ' + str(self.CORES) + ' threads.\n')
-        
-        num_nodes = len(graph.nodes())
-        
-        
-        newtime = time.time()
-        main_proc_time += newtime - start
-        newtime = time.time()
-        
-        node_CIs = pool.map(f, graph.nodes())
-        
-        CI_time += time.time() - newtime
-        newtime = time.time()
-        
-        pile = []
-        for n, node in enumerate(graph.nodes()) :
-            graph.node[node]['CI'] = node_CIs[n]
-            graph.node[node]['start_deg'] = graph.degree(node)
-            pile.append((-1 * node_CIs[n], node))
-            n += 1
-        
-        # Our hybrid heap/hashmap wizardry
-        updated = set()
-        heapq.heapify(pile)
-        
-        try :
-            max_bundle = heapq.heappop(pile)
-        except IndexError :
-            max_bundle = None
+            # Directed, treelike CI can be kept current by local updates instead of ball searches
+            if incremental and directed and treelike and not self.CP :
+                engine = self.incrementalCI(cig, pool, ball_rad)
+                node_CIs = engine.allCIs()
+            else :
+                engine = None
+                node_CIs = self.initialCIs(cig, pool, ci_args, sparse_init)
             
-        
-        main_proc_time += time.time() - newtime
-        newtime = time.time()
-        
-        # Remove influencers until none remain
-        while max_bundle is not None :
+            CI_time += time.time() - newtime
+            newtime = time.time()
             
+            pile = [(-1 * node_CI, node) for node, node_CI in enumerate(node_CIs)]
             
+            # Our hybrid heap/hashmap wizardry
+            updated = set()
+            prefetched = {}
+            heapq.heapify(pile)
+            
+            try :
+                max_bundle = heapq.heappop(pile)
+            except IndexError :
+                max_bundle = None
+            
+            main_proc_time += time.time() - newtime
+            newtime = time.time()
+            
+            # Remove influencers until none remain
+            while max_bundle is not None and (max_winners is None or len(winners) < max_winners) :
+                
                 max_CI = max_bundle[0] * -1
                 max_node = max_bundle[1]
                 
@@ -292,36 +160,32 @@ class TwiAnalytics(object) :
                 main_proc_time += time.time() - newtime
                 newtime = time.time()
                 
-                max_ball = self.buildInBall(graph, max_node, ball_rad)
+                max_ball = cig.inBall(max_node, ball_rad)
                 
                 build_in_time += time.time() - newtime
                 newtime = time.time()
                 
-                winners.append(max_node)
-                winner_deg.append(graph.node[max_node]['start_deg'])
-                winners_ci.append(max_CI)
+                winners.append(cig.labels[max_node])
+                winner_deg.append(int(start_deg[max_node]))
+                winners_ci.append(max_CI ** (1/ball_rad) if ci_root else max_CI)
                 
-                if G_q_filename is not None:
-                    # print q and G(g)
-                    q = 1-graph.number_of_nodes()/num_nodes
-                    gc_nodes = max(nx.strongly_connected_components(graph), key=len)
-                    nodes_in_gc = [node for node in graph.nodes_iter() if node in gc_nodes]
-                    
-                    
-                    print("{:.6f}".format(q) + ', ' + "{:.6f}".format(len(nodes_in_gc)/num_nodes), file=G_q_file)
+                removed_nodes.append(max_node)
                 
-                graph.remove_node(max_node)
+                if engine is not None :
+                    engine.removeNode(max_node, max_ball)
+                else :
+                    cig.removeNode(max_node)
                 
                 if flashy :
                     print('#',end="",flush=True)
                     if len(winners) % 100 == 0 :
-                            print('')
-            
+                        print('')
+                
                 # Mark nodes inside the ball for deferred CI update
                 # (Other CI values will not have changed)
                 for ring in max_ball :
-                    for node in ring :
-                        updated.add(node)
+                    updated.update(ring.tolist())
+                prefetched.clear()
                 
                 main_proc_time += time.time() - newtime
                 newtime = time.time()
@@ -339,188 +203,137 @@ class TwiAnalytics(object) :
                     max_CI = max_bundle[0] * -1
                     max_node = max_bundle[1]
                     
-                    
                     # Check if it's up-to-date
                     if max_node in updated :
                         
-                        sort_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        new_CI = self.cleanCalcCI(graph, max_node, ball_rad=ball_rad, directed=directed, treelike=treelike)
-                        
-                        CI_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        updated.remove(max_node)
-                        heapq.heappush(pile, (-1 * new_CI, max_node))
-                        max_bundle = None
-                        continue
-                    '''
-                    # Threading this isn't worth the overhead
-                    # Saving this code for when it might be
-                    if max_node in updated :
-                        
-                        # Recalc CORES nodes at a time for efficiency
-                        recalc_nodes = []; no_recalc = []
-                        recalc_nodes.append(max_node)
-                        updated.remove(max_node)
-                        
-                        while len(recalc_nodes) < self.CORES and len(pile) > 0:
-                            next_bundle = heapq.heappop(pile)
-                            next_top = next_bundle[1]
-                            if next_top in updated :
-                                updated.remove(next_top)
-                                recalc_nodes.append(next_top)
+                        # With workers, recalc the stale nodes nearest the top of the
+                        # heap in one batch. Their values hold until the next removal,
+                        # so they're used as the serial loop reaches them.
+                        if max_node not in prefetched :
+                            recalc_nodes = [max_node]; lookahead = []
+                            while pool is not None and engine is None and len(recalc_nodes) < self.CORES * self.RECALC_PER_CORE \
+                                    and len(lookahead) < 4 * self.CORES * self.RECALC_PER_CORE and len(pile) > 0 :
+                                next_bundle = heapq.heappop(pile)
+                                lookahead.append(next_bundle)
+                                if next_bundle[1] in updated and next_bundle[1] not in prefetched :
+                                    recalc_nodes.append(next_bundle[1])
+                            for next_bundle in lookahead :
+                                heapq.heappush(pile, next_bundle)
+                            
+                            sort_time += time.time() - newtime
+                            newtime = time.time()
+                            
+                            # Calculate fresh CIs
+                            if engine is not None :
+                                new_CIs = [engine.calcCI(max_node)]
+                            elif len(recalc_nodes) == 1 :
+                                new_CIs = [cig.calcCI(max_node, *ci_args)]
                             else :
-                                no_recalc.append(next_bundle)
-                        
-                        sort_time += time.time() - newtime
-                        newtime = time.time()
-                        
-                        # Calculate fresh CIs
-                        new_CIs = pool.map(f, recalc_nodes)
-                        
-                        CI_time += time.time() - newtime
-                        newtime = time.time()
+                                tasks = [(recalc_nodes[n::self.CORES],) + ci_args for n in range(self.CORES)]
+                                new_CIs = [None] * len(recalc_nodes)
+                                for n, chunk in enumerate(pool.map(_nodesCI, tasks)) :
+                                    new_CIs[n::self.CORES] = chunk
+                            prefetched.update(zip(recalc_nodes, new_CIs))
+                            
+                            CI_time += time.time() - newtime
+                            newtime = time.time()
                         
-                        # Reinsert into heap with newly computed CI values
-                        for n, node in enumerate(recalc_nodes) :
-                            heapq.heappush(pile, (-1 * new_CIs[n], node))
-                        for node in no_recalc :
-                            heapq.heappush(pile, node)
+                        # Reinsert into heap with newly computed CI value
+                        updated.remove(max_node)
+                        heapq.heappush(pile, (-1 * prefetched.pop(max_node), max_node))
                         max_bundle = None
                         continue
-                        '''
-                    
+                
                 sort_time += time.time() - newtime
                 newtime = time.time()
                 
                 # Remove it
                 if max_CI < 1 :
                     break
-                        
-        # Return your sorted list of influencers
-        if verbose :
-            print('\nMain proc: ' + str(main_proc_time))
-            print('CI time: ' + str(CI_time))
-            print('Sort time: ' + str(sort_time))
-            print('Build In: ' + str(build_in_time))
-            print('\nInfluencers Total: ' + str(len(winners)))
-            print('Number of Nodes: ' + str(num_nodes))
-            print('\n')
-        pool.close(); pool.join()
+            
+            # Return your sorted list of influencers
+            if verbose :
+                print('\nMain proc: ' + str(main_proc_time))
+                print('CI time: ' + str(CI_time))
+                print('Sort time: ' + str(sort_time))
+                print('Build In: ' + str(build_in_time))
+                print('\nInfluencers Total: ' + str(len(winners)))
+                print('Number of Nodes: ' + str(num_nodes))
+                print('\n')
+            if pool is not None :
+                pool.close(); pool.join()
+        except BaseException :
+            # Don't leave workers behind on errors or interrupts
+            if pool is not None :
+                pool.terminate(); pool.join()
+            raise
+        finally :
+            cig.unshare()
         
         if G_q_filename is not None:
-            G_q_file.close()
+            self.writeGq(cig, removed_nodes, G_q_filename, G_q_step, G_q_strong)
         
         return winners, winner_deg, winners_ci
-
-    # Calculate the CI value for the specified node
-    def cleanCalcCI(self, graph, node, ball_rad, directed, treelike) :
-        
-        # If this node isn't in the graph, it VERY isn't influential
-        if node not in graph :
-            return -1
-        
-        if graph.degree(node) < 2 :
-            return 0
-        
-        # Build the ball
-        visited = {node: 0}
-        ring = 0
-        rings = []
-        rings.append({node})
-        while ring < ball_rad + 1 :
-            ring += 1
-            nextring = []
-            for node_n in rings[ring-1] :
-                for neighb_n in graph.neighbors(node_n) :
-                    if neighb_n not in visited :
-                        nextring.append(neighb_n)
-                        visited[neighb_n] = ring
-            rings.append(nextring)
-        
-        # CALCULATE THE CI VALUE
-        if directed :
-            if treelike :
-                degsum = sum(graph.out_degree(shell_node) for shell_node in rings[ball_rad]) 
-                ci_value = (graph.out_degree(node) - 1) * degsum
-            else :
-                ci_value = (graph.out_degree(node) - 1) * len(rings[ball_rad+1])
-        else : 
-            if treelike :
-                degsum = 0
-                for shell_node in rings[ball_rad] :
-                    degsum += (graph.degree(shell_node) - 1)
-                ci_value = (graph.degree(node) - 1) * degsum
-            else :
-                ci_value = (graph.degree(node) - 1) * len(rings[ball_rad+1])
-        
-        # Alternate algorithm; *~new and improved~!*
-        if self.CP :
-            degsum = []
-            for n, shell in enumerate(rings[0:ball_rad]) :
-                shelldeg = 0
-                for shell_node in shell :
-                    shelldeg += (graph.degree(shell_node) - 1)
-                degsum.append(shelldeg)
-
-            # l-Factorial algorithm
-            tot = 0
-            poly = 1
-            for n, ring in enumerate(degsum) :
-                if ring > 0 :
-                    tot += ring
-                poly *= tot
-            ci_value = poly
-
-        return ci_value
     
-    # Build the inbound ball for a given node
-    def buildInBall(self, graph, node, ball_rad=2) :
-        
-        # If this node isn't in the graph, it VERY isn't influential
-        if node not in graph :
-            return []
-        
-        ring = 0
-        rings = []
-        rings.append([node])
-        while ring < ball_rad + 1 :
-            ring += 1
-            nextring = []
-            for node_n in rings[ring-1] :
-                nextring += self.markInRing(graph, node_n)
-            rings.append(nextring)
-        
-        # Clean up
-        for ring in rings :
-            for n in ring :
-                del graph.node[n]['inpath']
-                
-        return rings
+    # CI of every node, spread over the workers if there are any
+    def initialCIs(self, cig, pool, ci_args, sparse_init=True) :
+        num_nodes = cig.num_nodes
+        if pool is not None :
+            # Hand each worker contiguous ranges of node IDs
+            num_ranges = self.CORES if sparse_init else self.CORES * 8
+            bounds = np.linspace(0, num_nodes, num_ranges + 1).astype(int).tolist()
+            tasks = [(bounds[n], bounds[n+1], sparse_init) + ci_args for n in range(num_ranges)]
+            return [node_CI for chunk in pool.map(_rangeCI, tasks) for node_CI in chunk]
+        if sparse_init :
+            # One vectorized sweep over every node instead of a ball search each
+            return cig.batchCI(*ci_args)
+        return [cig.calcCI(node, *ci_args) for node in range(num_nodes)]
     
-    # Mark the N'th ring of nodes who influence a given node
-    def markInRing(self, graph, node) :
-        
-        # Determine the order of this ring
-        if 'inpath' not in graph[node] :
-            graph.node[node]['inpath'] = 1
-        n = graph.node[node]['inpath'] + 1
-        
-        # Look at this node's neighborhood of predecessors
-        try :
-            neighborhood = graph.predecessors(node)
-        except AttributeError :
-            neighborhood = graph.neighbors(node)
-        outer_neighbors = []
-        
-        # If we find a new node, mark it and add it to the new perimeter
-        for neighbor in neighborhood :
-            if 'inpath' not in graph.node[neighbor] :
-                graph.node[neighbor]['inpath'] = n
-                outer_neighbors.append(neighbor)
-        
-        # Return the new perimeter
-        return outer_neighbors
-    
\ No newline at end of file
+    # Incremental CI engine for the graph, its shell sums spread over the workers
+    def incrementalCI(self, cig, pool, ball_rad) :
+        if pool is not None :
+            bounds = np.linspace(0, cig.num_nodes, self.CORES + 1).astype(int).tolist()
+            tasks = [(bounds[n], bounds[n+1], ball_rad) for n in range(self.CORES)]
+            shell_sums = np.concatenate(pool.map(_rangeShellSums, tasks))
+        else :
+            shell_sums = cig.shellSums(ball_rad)
+        return IncrementalCI(cig, ball_rad, shell_sums)
+
+    # Percolation curve of the removals
+    def writeGq(self, cig, removed_nodes, G_q_filename, q_step=0.01, strong=False) :
+        '''
+        Write the "q, G(q)" curve of a CI run: the fraction of the giant
+        component left once a fraction q of the nodes has been removed, just
+        before each removal. Lines are sampled every q_step (every removal
+        if q_step is 0).
+        
+        By default G(q) is the giant weakly connected component, all of it
+        from one reverse union-find pass over the removals. With strong set
+        it's the exact giant strongly connected component instead, found
+        afresh at every sampled point: one full SCC pass per line, so keep
+        q_step coarse on large graphs.
+        '''
+        num_nodes = cig.num_nodes
+        
+        # Removals at which q crosses the next step
+        steps = []
+        last_bin = -1
+        for k in range(len(removed_nodes)) :
+            q_bin = int(k / num_nodes / q_step) if q_step > 0 else k
+            if q_bin > last_bin :
+                steps.append(k)
+                last_bin = q_bin
+        
+        if strong :
+            # Exact SCCs, opt-in: no incremental shortcut for those
+            alive = ~cig.removed
+            sizes = {}
+            for k in reversed(steps) :
+                alive[removed_nodes[k:]] = True
+                sizes[k] = cig.giantComponentSize(alive, strong=True)
+        else :
+            sizes = cig.weakGiantCurve(removed_nodes)
+        
+        with open(G_q_filename, 'w') as G_q_file :
+            for k in steps :
+                print("{:.6f}".format(k/num_nodes) + ', ' + "{:.6f}".format(sizes[k]/num_nodes), file=G_q_file)
@@ -6,6 +6,9 @@ Created on Feb 24, 2016
 
 
 import os
+import io
+import mmap
+import math
 import ujson as json
 import config_sys
 from networkx.classes.digraph import DiGraph
@@ -15,6 +18,22 @@ from uuid import uuid4
 from datetime import datetime
 from dateutil.parser import parse as parsedate
 import pytz
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import TajIO
+from TajIO import TajIndex, TajHistogram, TajWriter
+from ArxJournal import ArxJournal
+from GraphCache import GraphCache
+import EdgeStore
+
+# Merged edge lists of recent buildGraph calls, shared by every archive
+GRAPH_CACHE = GraphCache(getattr(config_sys, 'GRAPH_CACHE_BYTES', None))
+HISTOGRAM_BIN = getattr(config_sys, 'HISTOGRAM_BIN_SECONDS', None)
+ARX_COMPACT_ENTRIES = getattr(config_sys, 'ARX_COMPACT_ENTRIES', None)
+ARX_FSYNC = getattr(config_sys, 'ARX_FSYNC', True)
+TAJ_WRITE_BUFFER = getattr(config_sys, 'TAJ_WRITE_BUFFER_BYTES', None)
+TAJ_FSYNC = getattr(config_sys, 'TAJ_FSYNC', 'none')
+TAJ_FSYNC_BYTES = getattr(config_sys, 'TAJ_FSYNC_BYTES', None)
 
 class EmptyGraph(Exception):
     pass
@@ -25,58 +44,148 @@ class BeforeFirstTweet(Exception):
 class AfterLastTweet(Exception):
     pass
 
-def enildaer(filename, buf_size=8388608):
+def enildaer(filename, buf_size=8388608, end=None):
     '''
     A generator that returns the lines of a file in reverse order
+
+    If end is given, only the part of the file before that offset is read
+
+    Text files give str lines. Binary files give memoryviews, as
+    TajIO.reverseLines does, which saves copying every line.
     '''
     fh = filename
-    segment = None
-    offset = 0
-    file_size = fh.seek(0, os.SEEK_END)
-    total_size = remaining_size = fh.tell()
-    while remaining_size > 0:
-        offset = min(total_size, offset + buf_size)
-        fh.seek(file_size - offset)
-        buffer = fh.read(min(remaining_size, buf_size))
-        remaining_size -= buf_size
-        lines = buffer.split('\n')
+    if not isinstance(fh, io.TextIOBase) :
+        yield from TajIO.reverseLines(fh, end, buf_size)
+        return
+    
+    # Work on the bytes underneath; text streams can't seek by offset
+    fh.flush()
+    raw = fh.buffer
+    pos = raw.seek(0, os.SEEK_END)
+    if end is not None and end < pos :
+        pos = end
+    segment = b''
+    while pos > 0 :
+        size = min(buf_size, pos)
+        pos -= size
+        raw.seek(pos)
+        buffer = raw.read(size) + segment
         # the first line of the buffer is probably not a complete line so
         # we'll save it and append it to the last line of the next buffer
         # we read
-        if segment is not None:
-            # if the previous chunk starts right from the beginning of line
-            # do not concact the segment to the last line of new chunk
-            # instead, yield the segment first 
-            if buffer[-1] is not '\n':
-                lines[-1] += segment
-            else:
-                yield segment
-        segment = lines[0]
-        for index in range(len(lines) - 1, 0, -1):
-            if len(lines[index]):
+        cut = buffer.find(b'\n')
+        if cut < 0 :
+            segment = buffer
+            continue
+        segment = buffer[0 :cut]
+        lines = buffer[cut + 1 :].decode('utf-8').split('\n')
+        for index in range(len(lines) - 1, -1, -1) :
+            if len(lines[index]) :
                 yield lines[index]
     # Don't yield None if the file was empty
-    if segment is not None:
-        yield segment
+    if segment :
+        yield segment.decode('utf-8')
 
-def addEdgeWithTweetID(G, u, v, tweet_id):
-    """ add directed edge u,v to graph G and add tweet_id to the edge attribute
-        or update existing edge by adding tweet_id to the set of tweet_ids  """
+def tweetEdges(Tweet, tweet, rows, tweet_id=None) :
+    '''
+    Append the src, dst, tweet_id, edge_type values of every relation found
+    in a tweet to rows, a list or an array('q') (see EdgeStore)
+    '''
+    if tweet_id is None :
+        tweet_id = Tweet.getTweetID(tweet)
+        if tweet_id is None : tweet_id = -1
     
-    if G.has_edge(u,v):
-        G.edge[u][v]['tweet_id'].add(tweet_id)
-    else:
-        G.add_edge(u, v, {'tweet_id': {tweet_id}})
+    relations = Tweet.getRelations(tweet)
+    for edge_type, influencers in ((EdgeStore.RETWEET, relations.retweeted), (EdgeStore.REPLY, relations.replied),
+                                   (EdgeStore.MENTION, relations.mentions), (EdgeStore.QUOTE, relations.quoted)) :
+        for influencer in influencers :
+            rows.extend((influencer, relations.tweeter, tweet_id, edge_type))
 
-def addEdgesFromWithTweetID(G, H):
-    """ add edges from H to graph G and update the set of tweet_ids of the 
-        merged edges """
+def parseTAJEdges(taj_file, Tweet, min_bound=None, max_bound=None, index=None) :
+    '''
+    Parse the edge list of a TAJ file, or of only its tweets with IDs in
+    [min_bound, max_bound]. A loaded TajIndex of the file lets a bounded
+    parse skip straight to the tweets it wants.
+    '''
+    # Check if tweets are new-to-old or old-to-new
+    newest_first = os.path.basename(taj_file)[0:3] == 'new'
+    bounded = min_bound is not None or max_bound is not None
+    if min_bound is None : min_bound = 0
+    if max_bound is None : max_bound = float('inf')
     
-    for u, v, id_set in H.edges_iter(data='tweet_id'):
-        if G.has_edge(u,v):
-            G.edge[u][v]['tweet_id'].update(id_set)
-        else:
-            G.add_edge(u, v, {'tweet_id': id_set})
+    rows = EdgeStore.newRows()
+    with TajIO.openTAJ(taj_file, 'rb') as fopen :
+        
+        # Skip straight to the neighbourhood of the tweets you want
+        if bounded and index is not None :
+            fopen.seek(index.startOffset(min_bound, max_bound, newest_first))
+        
+        # Parse influencers
+        for line in fopen :
+            line = line.strip()
+            if line :
+                try :
+                    tweet = json.loads(line)
+                except ValueError :
+                    continue
+                tweet_id = Tweet.getTweetID(tweet)
+                
+                if bounded :
+                    # Skip tweets that occur before the ones you want
+                    if newest_first and tweet_id > max_bound \
+                        or not newest_first and tweet_id < min_bound :
+                        continue
+                    
+                    # Stop looking when you pass the tweets you want
+                    if newest_first and tweet_id < min_bound \
+                        or not newest_first and tweet_id > max_bound :
+                        break
+                
+                # Collect the tweets you want
+                tweetEdges(Tweet, tweet, rows, tweet_id)
+    return EdgeStore.edgesFromRows(rows)
+
+def storeTAJEdges(taj_file, edge_file, Tweet, verbose=True) :
+    '''
+    Parse every relation in a TAJ file, store them as its edge list and
+    return that edge list
+    '''
+    t1 = time.time()
+    
+    # Read tweet file, parse relations
+    edges = EdgeStore.uniqueEdges(parseTAJEdges(taj_file, Tweet))
+    
+    if verbose : print('Building graphs took ' + str(time.time() - t1) + ' to complete.')
+    with open('logs/performance.log','a+') as fout :
+        fout.write('\nBuilding graphs took ' + str(time.time() - t1) + ' to complete.')
+    t1 = time.time()
+    
+    # Store the edge list
+    try:
+        os.makedirs(os.path.dirname(edge_file), exist_ok=True)
+    except (FileNotFoundError, FileExistsError):
+        pass
+    EdgeStore.writeEdges(edges, edge_file)
+    
+        # Performance logging
+    if verbose : print('Storing graphs took ' + str(time.time() - t1) + ' to complete.')
+    with open('logs/performance.log','a+') as fout :
+        fout.write('\nStoring graphs took ' + str(time.time() - t1) + ' to complete.')
+    
+    # Return your edge list
+    return edges
+
+def _graphEdgesTask(task) :
+    # One TAJ file's share of buildGraph, run in a worker process
+    taj_file, edge_file, tweet_module, min_bound, max_bound, graph_type = task
+    Tweet = __import__(tweet_module)
+    if edge_file is not None :
+        edges = storeTAJEdges(taj_file, edge_file, Tweet)
+    else :
+        index = TajIndex(taj_file, Tweet)
+        index.load()
+        edges = parseTAJEdges(taj_file, Tweet, min_bound, max_bound, index)
+    return EdgeStore.selectEdges(edges, graph_type)
 
 class TweetArchive(object):
     '''
@@ -99,19 +208,33 @@ class TweetArchive(object):
     
     JSON File Types:
     .arx - Archive Index, JSON format
+    .arj - Archive Index journal, one JSON list of changes per line
     .taj - Tweet Archive JSON, one JSON tweet object per line
-    .jnld - JSON Node Link Data, JSON formatted NetworkX graph
+    .jnld - JSON Node Link Data, JSON formatted NetworkX graph (see writeJSON)
+    
+    Binary File Types:
+    .npy - Columnar edge list of a TAJ file's relations (see EdgeStore)
+    .tjx - TAJ line-offset index, (tweet ID, epoch, byte offset) records
+    .tjh - TAJ tweet count histogram, (bin start epoch, count) records
+    .tajz - Block-compressed TAJ, read transparently (see TajIO.compressTAJ)
     '''
 
     def __init__(self, query, filters=None, archive_dir=None,
-                 tweet_format='Twitter') :
+                 tweet_format='Twitter', compress=None) :
         '''
         Constructor:
         Load the archive file specified by the given query and optional filters
+        
+        With compress set, finished TAJ files are compressed as soon as
+        they fill up (see compressFinished)
         '''
 		
         self.SIZE_LIMIT = 400 * 1024 * 1024
+        if compress is None :
+            compress = getattr(config_sys, 'COMPRESS_TAJ', False)
+        self.COMPRESS = compress
         self.arx = None
+        self.histograms = {}
 
         if tweet_format == 'Gnip' or query[:4] == 'gnip':
             self.Tweet = __import__('GnipTweet')
@@ -142,20 +265,22 @@ class TweetArchive(object):
         index_file = self.ARCHIVE_DIR + query + '/index' + filter_string + '.arx'
         
         # Load the index file if it exists, else create it
+        self.journal = ArxJournal(index_file, ARX_COMPACT_ENTRIES, ARX_FSYNC)
         with open(index_file, 'a+') as fopen :
             fopen.seek(0)
             data = fopen.read()
-            if len(data) > 0 :
-                arx = json.loads(data)
-                self.arx = arx
-            else :
-                arx = {'query' : query,
-                       'filters' : filters,
-                       'unfinished' : None,
-                       'finished' : []
-                }
-                self.arx = arx
-                fopen.write(json.dumps(self.arx, sort_keys=True, indent=4))
+        if len(data) > 0 :
+            self.arx = self.journal.load(json.loads(data))
+        else :
+            self.arx = {'query' : query,
+                        'filters' : filters,
+                        'unfinished' : None,
+                        'finished' : []
+            }
+            self.journal.compact(self.arx)
+        
+        # Sorted lookup tables over the file bounds
+        self.refreshBoundIndex()
 
     def __getitem__(self, item) :
         if self.arx is not None and item in self.arx :
@@ -174,28 +299,104 @@ class TweetArchive(object):
 
     def commitArchive(self) :
         '''
-        Overwrite the appropriate arx file with your new archive
+        Save your changes to the archive index. Only the changed file bounds
+        are appended to the index's journal; the arx file itself is rewritten
+        (atomically) once the journal gets long. See ArxJournal.
         '''
         
-        query = self.arx['query']
-        filters = self.arx['filters']
-        
         # Make the directory if it doesn't exist
         try:
-            os.makedirs(self.ARCHIVE_DIR + query + '/', exist_ok=True)
+            os.makedirs(self.ARCHIVE_DIR + self.arx['query'] + '/', exist_ok=True)
         except (FileNotFoundError, FileExistsError):
             pass
         
-        # Add filters to the name of your index file so multiple indexes can coexist
-        filter_string = self.getFilterString(filters)
+        self.journal.commit(self.arx)
         
-        # Name your index file
-        index_file = self.ARCHIVE_DIR + query + '/index' + filter_string + '.arx'
+        # Keep the lookup tables in step with the index
+        self.refreshBoundIndex()
+    
+    def compactArchive(self) :
+        '''
+        Rewrite the arx file with your whole archive index and clear its journal
+        '''
+        self.journal.compact(self.arx)
+    
+    def refreshBoundIndex(self) :
+        '''
+        Precompute the sorted tweet ID and epoch time bounds of every file in
+        the archive index, so that finding the files holding a tweet ID or a
+        date is a binary search. Called whenever the index is committed.
+        '''
+        bounds = list(self.arx['finished'])
+        if self.arx['unfinished'] is not None :
+            bounds.append(self.arx['unfinished'])
+        self.bound_list = bounds
+        
+        # Tweet ID bounds, in file order (which is also ID order)
+        self.id_positions = [n for n, bound in enumerate(bounds)
+                             if bound[1] is not None and bound[2] is not None]
+        self.min_ids = [bounds[n][1] for n in self.id_positions]
+        self.max_ids = [bounds[n][2] for n in self.id_positions]
+        self.fin_min_ids = [bound[1] for bound in self.arx['finished']]
+        self.fin_max_ids = [bound[2] for bound in self.arx['finished']]
+        
+        # Epoch bounds are parsed on first use by a date query
+        self.time_index = None
+    
+    def timeIndex(self) :
+        '''
+        (start_epochs, time_positions, first_time, last_time, end_epochs,
+        end_positions) for the files in the archive index. The start epochs
+        are sorted by the time of each file's first tweet, the end epochs are
+        the times of each file's last tweet in file order.
+        '''
+        if self.time_index is None :
+            dated = [(parsedate(bound[3]), parsedate(bound[4]), n) for n, bound in enumerate(self.bound_list)
+                     if bound[3] is not None and bound[4] is not None]
+            end_epochs = [end.timestamp() for start, end, n in dated]
+            end_positions = [n for start, end, n in dated]
+            dated.sort(key=lambda date_bound : date_bound[0].timestamp())
+            start_epochs = [start.timestamp() for start, end, n in dated]
+            time_positions = [n for start, end, n in dated]
+            if len(dated) > 0 :
+                first_time = dated[0][0]
+                last_time = max((end for start, end, n in dated), key=lambda end : end.timestamp())
+            else :
+                first_time = last_time = None
+            self.time_index = (start_epochs, time_positions, first_time, last_time, end_epochs, end_positions)
+        return self.time_index
+    
+    def filePointers(self, min_bound, max_bound) :
+        '''
+        Slice [min_ptr:max_ptr] of the archive's files that may hold tweet IDs
+        in [min_bound, max_bound], and whether the first and last of those
+        files only partly fall within it. Returns None if every file comes
+        after the range.
+        '''
+        min_ptr = -1; max_ptr = -1
+        reparse_min = False; reparse_max = False
         
-        # Dump your archive index to file
-        with open(index_file, 'w+') as fopen :
-            # Write it to be relatively human-readable
-            fopen.write(json.dumps(self.arx, sort_keys=True, indent=4))
+        # First file ending at or past the min bound
+        n = bisect_left(self.max_ids, min_bound)
+        if n < len(self.max_ids) :
+            min_ptr = self.id_positions[n]
+            reparse_min = min_bound >= self.min_ids[n]
+        
+            # First file ending at or past the max bound
+            n = bisect_left(self.max_ids, max_bound, n)
+            if n < len(self.max_ids) :
+                if max_bound < self.min_ids[n] :
+                    if self.id_positions[n] > 0 :
+                        max_ptr = self.id_positions[n]
+                    else :
+                        return None
+                else :
+                    max_ptr = self.id_positions[n] + 1; reparse_max = True
+        
+        # Eliminate bounds outside collection range
+        if min_ptr == -1 : min_ptr = 0
+        if max_ptr == -1 : max_ptr = len(self.bound_list)
+        return min_ptr, max_ptr, reparse_min, reparse_max
     
     def getFilterString(self, filters) :
         '''
@@ -223,7 +424,7 @@ class TweetArchive(object):
         # Max bounds are the min bounds of your unfinished data
         if self.arx['unfinished'] is not None :
             bounds[1] = self.arx['unfinished'][1]
-            timestamps = self.arx['unfinished'][3]
+            timestamps[1] = self.arx['unfinished'][3]
         
         return (bounds[0], bounds[1], timestamps[0], timestamps[1])
     
@@ -277,8 +478,8 @@ class TweetArchive(object):
             
             # Write the new tweets to the "finished" file
             if verbose : print('Writing to finished file...')
-            with open(fin_file, 'a+') as fopen :
-
+            with self.getTAJWriter(fin_file) as fwriter :
+                
                 if len(tweets) != 0 :
                     # Look for our new bounds
                     max_bound = None; max_time = None
@@ -287,44 +488,29 @@ class TweetArchive(object):
                         if max_time  is None : max_time  = self.Tweet.getDate(tweet)
                         if max_bound is not None and max_time is not None :
                             break
-                            
+                    
                     # We must write tweets old-to-new
-                    tweet_strings = []; buffer_len = 100; ctr = 0
-                    for n, tweet in enumerate(reversed(tweets)) :
-                        
-                        ctr += 1
+                    for tweet in reversed(tweets) :
                         
                         # Look for our min bounds
                         if min_bound is None : min_bound = self.Tweet.getTweetID(tweet)
                         if min_time  is None : min_time  = self.Tweet.getDate(tweet)
                         
-                        # Copy tweet to our write buffer
-                        tweet_strings.append(json.dumps(tweet) + '\n')
-                        
-                        if n % 4000 == 0 and n > 0 :
-                            print('Processed ' + str(n) + ' tweets.')
-                        
-                        if ctr > buffer_len : 
-                            # Write our buffer to the "finished" file
-                            fopen.write(''.join(tweet_strings))
-                            tweet_strings = []
-                            ctr = 0
-                            
-                    # Append remaining tweets
-                    fopen.write(''.join(tweet_strings))
-                    tweet_strings = []
+                        fwriter.write(tweet)
                 
-                # Update the data file's contents in your archive index
-                if must_create_fin :
-                    
-                    # Generate graphs for the old finished file
-                    if len(self.arx['finished']) > 0 :
-                        self.loadGraphForTAJ(self.arx['query'], self.arx['finished'][-1][0])
-                    
-                    # Add new data file to index
-                    self.addNewDataFileReg(fin_file_name, min_bound, min_time)
-                    
-                self.updateLastDataFileReg(min_bound, min_time, max_bound, max_time, len(tweets))
+            if verbose : print('Wrote ' + str(len(tweets)) + ' tweets.')
+                
+            # Update the data file's contents in your archive index
+            if must_create_fin :
+                
+                # Generate edges for the old finished file
+                if len(self.arx['finished']) > 0 :
+                    self.loadEdgesForTAJ(self.arx['query'], self.arx['finished'][-1][0])
+                
+                # Add new data file to index
+                self.addNewDataFileReg(fin_file_name, min_bound, min_time)
+                
+            self.updateLastDataFileReg(min_bound, min_time, max_bound, max_time, len(tweets))
                 
             # You've exhausted your tweet supply in this gap;
             # time to finish the unfinished file data if it exists.
@@ -346,7 +532,7 @@ class TweetArchive(object):
                 
             # Write the new tweets to the "unfinished" file
             if verbose : print('Writing to unfinished file...')
-            with open(unfin_file, 'a+') as fopen :
+            with self.getTAJWriter(unfin_file) as fwriter :
                 
                 # Look for our new bounds
                 min_bound = None; min_time = None
@@ -357,25 +543,23 @@ class TweetArchive(object):
                         break
                 
                 # Write our tweets new-to-old
-                tweet_strings = []
                 for tweet in tweets :
                     
                     # Look for max bounds
                     if max_bound is None : max_bound = self.Tweet.getTweetID(tweet)
                     if max_time  is None : max_time  = self.Tweet.getDate(tweet)
                     
-                    # Copy tweet to our write buffer
-                    tweet_strings.append(json.dumps(tweet) + '\n')
-                    
-                # Write our buffer to the "unfinished" file
-                fopen.write(''.join(tweet_strings))
-                tweet_strings = []
+                    fwriter.write(tweet)
                 
             # Update the data file's contents in your archive index
             if must_create_unfin :
                 self.addUnfinishedFileReg(unfin_file_name, max_bound, max_time)
             self.updateUnfinishedFileReg(min_bound, min_time, len(tweets))
             
+        # Full finished files won't change anymore; shrink them
+        if self.COMPRESS :
+            self.compressFinished(verbose)
+        
         # Commit changes to the archive index
         self.commitArchive()
         if verbose : print('Writing complete.')
@@ -428,12 +612,17 @@ class TweetArchive(object):
         num_tweets = num_new_tweets + self.arx['unfinished'][5]
         self.arx['unfinished'] = (name, min_bound, max_bound, min_time, max_time, num_tweets)
     
-    def finalizeUnfinishedData(self, buffer_len=1000) :
+    def finalizeUnfinishedData(self, block_size=32 * 1024 * 1024) :
         '''
         Push your "unfinished" file to finished file(s) as appropriate. Will
         create new finished files as necessary once the first one fills, and
         deletes the unfinished file upon completion.
         
+        The unfinished file is reversed block_size bytes at a time without
+        parsing it. The finished files' index records and histograms are
+        worked out from the unfinished file's own, so only the tweets at the
+        boundaries of finished files are ever decoded.
+        
         You must have a "finished" and an "unfinished" file to call this!!
         '''
         
@@ -445,99 +634,205 @@ class TweetArchive(object):
         unfin_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + unfin_tuple[0]
         fin_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + fin_tuple[0]
         
+        # Sampled tweets and tweet counts of the unfinished file
+        unfin_index = self.getTAJIndex(unfin_file)
+        unfin_hist = self.getTAJHistogram(unfin_file)
+        samples = {offset : (tweet_id, epoch) for tweet_id, epoch, offset
+                   in zip(unfin_index.ids, unfin_index.epochs, unfin_index.offsets)}
+        
         # Copy the tweets from your unfinished file to finished ones
-        with open(unfin_file, 'r') as fopen :
+        with open(unfin_file, 'rb') as fopen :
+            unfin_size = os.fstat(fopen.fileno()).st_size
+            
+            def olderCounts(start) :
+                # Histogram of the unfinished file's lines from start onwards;
+                # only the tweet at start and the edge of its bin get parsed
+                if start >= unfin_size :
+                    return {}
+                if start == 0 :
+                    return dict(unfin_hist.counts)
+                tweet = TajIO.firstTweet(fopen, start)
+                if tweet is None :
+                    return {}
+                bin_start = unfin_hist.binOf(TajIO.tweetEpoch(self.Tweet, tweet))
+                counts = {b : count for b, count in unfin_hist.counts.items() if b < bin_start}
+                split = TajIO.splitByTime(unfin_file, self.Tweet, bin_start, newest_first=True, index=unfin_index)[0]
+                if split > start :
+                    counts[bin_start] = TajIO.countLines(unfin_file, start, split)
+                return counts
+            
+            def closeFinished(fwriter, start, older) :
+                # Count the tweets of the unfinished file from start up to
+                # where older began, which went to the file being closed
+                counts = olderCounts(start)
+                if fwriter.histogram is not None :
+                    for b, count in counts.items() :
+                        count -= older.get(b, 0)
+                        if count > 0 :
+                            fwriter.histogram.add(b, count)
+                fwriter.close()
+                return counts
             
             # Append to your latest "finished" file
-            fwrite = open(fin_file, 'a+')
+            fwriter = self.getTAJWriter(fin_file)
             
-            # Read the file line by line in reverse order (end-to-start)
-            ctr = 0; tweets = ''
-            for line in enildaer(fopen) :
+            # Read the file in blocks, from the end back to the start
+            mapped = mmap.mmap(fopen.fileno(), 0, access=mmap.ACCESS_READ) if unfin_size > 0 else b''
+            ctr = 0; total = 0
+            older = {}
+            block_stop = unfin_size
+            while block_stop > 0 :
                 
-                # Read some tweets
-                tweets += line + '\n'
-                ctr += 1
+                # Start each block on a line
+                block_start = max(block_stop - block_size, 0)
+                if block_start > 0 :
+                    block_start = mapped.rfind(b'\n', 0, block_start) + 1
+                lines = mapped[block_start :block_stop].split(b'\n')
+                starts = [block_start]
+                for line in lines :
+                    starts.append(starts[-1] + len(line) + 1)
                 
-                if ctr % 1000 == 0 :
-                    print('Loaded ' + str(ctr) + ' tweets.')
-                
-                # Periodically copy them to the finished file
-                if ctr > buffer_len :
-                    fwrite.write(tweets)
-                    tweets = ''
+                # Write its lines out in reverse order
+                for n in range(len(lines) - 1, -1, -1) :
+                    line = lines[n]
+                    if not line :
+                        continue
+                    offset = fwriter.writeLine(line)
+                    ctr += 1
+                    
+                    # Carry sampled tweets over to the new index
+                    if fwriter.index is not None and starts[n] in samples :
+                        tweet_id, epoch = samples[starts[n]]
+                        fwriter.index.add(tweet_id, epoch, offset)
                     
                     # If the finished file is full, start a fresh one
-                    if os.path.getsize(fin_file) > self.SIZE_LIMIT :
-                        
-                        # Find our new bounds for "finished" file
-                            # Max bounds
-                        last_bound = None; last_time = None
-                        for l2 in enildaer(fwrite) :
-                            try :
-                                tweet = json.loads(l2)
-                                if last_bound is None : last_bound = self.Tweet.getTweetID(tweet)
-                                if last_time is None : last_time = self.Tweet.getDate(tweet)
-                                if last_bound is not None and last_time is not None : break
-                            except ValueError :
-                                continue
-                            except TypeError :
-                                continue
-                        max_bound = last_bound; max_time = last_time
-                        
-                            # Min bounds
-                        fwrite.close()
-                        fwrite = open(fin_file, 'a+')
-                        last_bound = None; last_time = None
-                        for l2 in fwrite.readline() :
-                            try :
-                                tweet = json.loads(l2)
-                                if last_bound is None : last_bound = self.Tweet.getTweetID(tweet)
-                                if last_time is None : last_time = self.Tweet.getDate(tweet)
-                                if last_bound is not None and last_time is not None : break
-                            except ValueError :
-                                continue
-                            except TypeError :
-                                continue
-                        min_bound = last_bound; min_time = last_time
+                    if fwriter.offset > self.SIZE_LIMIT :
+                        older = closeFinished(fwriter, starts[n], older)
                         
-                        # Close the finished file
-                        self.updateLastDataFileReg(min_bound, min_time, max_bound, max_time, ctr)
-                        ctr = 0
-                        fwrite.close()
+                        # Its last tweet is the one we just wrote
+                        tweet = TajIO.firstTweet(fopen, starts[n])
+                        max_bound = self.Tweet.getTweetID(tweet)
+                        max_time = self.Tweet.getDate(tweet)
+                        self.updateLastDataFileReg(None, None, max_bound, max_time, ctr)
+                        total += ctr; ctr = 0
                         
                         # Create a fresh one starting at the last's end bounds
                         fin_file = 'tweets-' + str(uuid4()) + '.taj'
                         self.addNewDataFileReg(fin_file, max_bound, max_time)
                         fin_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + fin_file 
-                        fwrite = open(fin_file, 'a+')
-                        
-            # Write the remaining tweets to file
-            fwrite.write(tweets)
-        
-        # Dunno why I have to reopen it; seeking didn't work
-        with open(unfin_file, 'r') as fopen :    
+                        fwriter = self.getTAJWriter(fin_file)
+                
+                lines = None
+                block_stop = block_start
+                print('Loaded ' + str(total + ctr) + ' tweets.')
+            
+            # Close the file
+            closeFinished(fwriter, 0, older)
+            if unfin_size > 0 :
+                mapped.close()
+            
             # Get the end bounds for the finished file we just finished writing
+            tweet = TajIO.firstTweet(fopen, 0)
             max_bound = None; max_time = None
-            for tweet in fopen :
-                try :
-                    tweet = json.loads(tweet)
-                    if max_bound is None : max_bound = self.Tweet.getTweetID(tweet)
-                    if max_time is None : max_time = self.Tweet.getDate(tweet)
-                    if max_bound is not None and max_time is not None : break
-                except ValueError :
-                    continue
-                except TypeError :
-                    continue
+            if tweet is not None :
+                max_bound = self.Tweet.getTweetID(tweet)
+                max_time = self.Tweet.getDate(tweet)
         
-        # Close the file
         self.updateLastDataFileReg(None, None, max_bound, max_time, ctr)
-        fwrite.close()
         
         # Delete the unfinished file, remove it from the archive index
         os.remove(unfin_file)
+        TajIndex(unfin_file, self.Tweet).remove()
+        TajHistogram(unfin_file, self.Tweet).remove()
+        self.histograms.pop(unfin_file, None)
         self.arx['unfinished'] = None
         
+    def compressFinished(self, verbose=True) :
+        '''
+        Compress every finished TAJ file that can't have tweets added to it
+        anymore, i.e. all but the latest. Their indexes, histograms and edge
+        lists stay valid.
+        '''
+        for n in range(len(self.arx['finished']) - 1) :
+            if not TajIO.isCompressed(self.arx['finished'][n][0]) :
+                self.compressTAJ(n, verbose)
+    
+    def compressTAJ(self, n, verbose=True) :
+        '''
+        Replace the n-th finished TAJ file with its compressed version
+        '''
+        bound = self.arx['finished'][n]
+        taj_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + bound[0]
+        t1 = time.time()
+        tajz_file = TajIO.compressTAJ(taj_file)
+        
+        # Point the archive index at the new file before dropping the old one
+        self.arx['finished'][n] = (os.path.basename(tajz_file),) + tuple(bound[1:])
+        self.commitArchive()
+        os.remove(taj_file)
+        
+        if verbose : print('Compressing ' + bound[0] + ' took ' + str(time.time() - t1) + ' to complete.')
+    
+    def getTAJIndex(self, taj_file) :
+        '''
+        Load the line-offset index of a TAJ file, rebuilding it if it's missing
+        '''
+        index = TajIndex(taj_file, self.Tweet)
+        index.load()
+        return index
+    
+    def getTAJIndexWriter(self, taj_file) :
+        '''
+        Load the line-offset index of a TAJ file you're about to append to.
+        Returns None for legacy files that don't have one; those are indexed
+        lazily the next time they're read.
+        '''
+        index = TajIndex(taj_file, self.Tweet)
+        if not os.path.exists(taj_file) or os.path.getsize(taj_file) == 0 :
+            # Fresh file; don't inherit records from a stale sidecar
+            index.remove()
+            return index
+        if index.load(rebuild=False) :
+            return index
+        return None
+        
+    def getTAJHistogram(self, taj_file) :
+        '''
+        Load the tweet count histogram of a TAJ file, rebuilding it if it's
+        missing or stale. Loaded histograms are kept until their file grows.
+        '''
+        taj_size = os.path.getsize(taj_file)
+        cached = self.histograms.get(taj_file)
+        if cached is not None and cached[0] == taj_size :
+            return cached[1]
+        hist = TajHistogram(taj_file, self.Tweet, HISTOGRAM_BIN)
+        hist.load()
+        self.histograms[taj_file] = (taj_size, hist)
+        return hist
+    
+    def getTAJHistogramWriter(self, taj_file) :
+        '''
+        Load the tweet count histogram of a TAJ file you're about to append
+        to. Returns None for files without an up-to-date one; those are
+        rebuilt lazily the next time they're counted.
+        '''
+        hist = TajHistogram(taj_file, self.Tweet, HISTOGRAM_BIN)
+        if not os.path.exists(taj_file) or os.path.getsize(taj_file) == 0 :
+            # Fresh file; don't inherit counts from a stale sidecar
+            hist.remove()
+            return hist
+        if hist.load(rebuild=False) :
+            return hist
+        return None
+    
+    def getTAJWriter(self, taj_file) :
+        '''
+        Open a buffered writer appending to a TAJ file, keeping its index and
+        histogram up to date
+        '''
+        return TajWriter(taj_file, self.getTAJIndexWriter(taj_file), self.getTAJHistogramWriter(taj_file),
+                         TAJ_WRITE_BUFFER, TAJ_FSYNC, TAJ_FSYNC_BYTES)
+        
     def writeJSON(self, graph, filename, pretty_print=False) :
         '''
         Super stupid, naive function for writing JSON graphs to file
@@ -557,148 +852,77 @@ class TweetArchive(object):
             data = json.load(fin)
         return json_graph.node_link_graph(data)
     
-    def generateJSONFromTAJ(self, query, taj_name, verbose=True) :
+    def tweetEdges(self, tweet, rows, tweet_id=None) :
         '''
-        Generate a JSON file for the given TAJ file and return the influence graph
+        Append the src, dst, tweet_id, edge_type values of every relation found
+        in a tweet to rows (see tweetEdges)
         '''
-        
-        # Parse the file
-        with open(self.ARCHIVE_DIR + query + '/' + taj_name, 'r') as fopen :
-            
-            # Strip the .taj file extension
-            taj_name = taj_name[0:len(taj_name)-4]
-            
-            t1 = time.time()
-            
-            # Initialize graphs
-            retweet_graph = DiGraph()
-            reply_graph = DiGraph()
-            mention_graph = DiGraph()
-            
-            # Read tweet file, parse relations
-            for line in fopen :
-                line = line.strip()
-                if line :
-                    try :
-                        tweet = json.loads(line)
-                    except ValueError :
-                        continue
-                    tweeter, influencers = self.Tweet.getRetweetInfluencers(tweet)
-                    for influencer in influencers :
-                        retweet_graph.add_edge(influencer, tweeter)
-                    tweeter, influencers = self.Tweet.getReplyInfluencers(tweet)
-                    for influencer in influencers :
-                        reply_graph.add_edge(influencer, tweeter)
-                    tweeter, influencers = self.Tweet.getMentionInfluencers(tweet)
-                    for influencer in influencers :
-                        mention_graph.add_edge(influencer, tweeter)
-            
-            if verbose : print('Building graphs took ' + str(time.time() - t1) + ' to complete.')
-            with open('logs/performance.log','a+') as fout :
-                fout.write('\nBuilding graphs took ' + str(time.time() - t1) + ' to complete.')
-            t1 = time.time()
-                                    
-        # Merge the graphs and store them
-            # Create directory
-        try:
-            os.makedirs(self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/', exist_ok=True)
-        except (FileNotFoundError, FileExistsError):
-            pass
-
-            # Retweet Graph
-        self.writeJSON(retweet_graph, self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/retweet_graph.jnld')
-        graph = retweet_graph   # Pass by reference
-        retweet_graph = None    # Just a human touch for readability
-            # Reply Graph
-        self.writeJSON(reply_graph, self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/reply_graph.jnld')
-        graph.add_edges_from(reply_graph.edges(data=True))
-        reply_graph = None      # Free up memory
-            # Mention Graph
-        self.writeJSON(mention_graph, self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/mention_graph.jnld')
-        graph.add_edges_from(mention_graph.edges(data=True))
-        mention_graph = None    # Free up memory
-            # Merged Graph
-        self.writeJSON(graph, self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/influence_graph.jnld')
-                
-            # Performance logging
-        if verbose : print('Storing graphs took ' + str(time.time() - t1) + ' to complete.')
-        with open('logs/performance.log','a+') as fout :
-            fout.write('\nStoring graphs took ' + str(time.time() - t1) + ' to complete.')
-        
-        # Return your influence graph
-        return graph
+        tweetEdges(self.Tweet, tweet, rows, tweet_id)
     
-    def loadGraphForTAJ(self, query, taj_name, graph_type='influence', create_if_missing=True, update_latest=True) :
+    def getEdgeStorePath(self, query, taj_name) :
         '''
-        Load the graph for a given query and its specified taj file. This will load the graph from a JSON file if it
-        already exists, or else it will create a JSON file for the graph before returning it.
+        Name of the edge list stored for the given TAJ file
         '''
-        
         # Strip .taj extension
-        taj_name = taj_name[0:len(taj_name)-4]
-        
-        # Generate graph name
-        if graph_type == 'influence' :
-            graph_type_str = '/influence_graph.jnld'
-        elif graph_type == 'retweet' :
-            graph_type_str = '/retweet_graph.jnld'
-        elif graph_type == 'reply' :
-            graph_type_str = '/reply_graph.jnld'
-        elif graph_type == 'mention' :
-            graph_type_str = '/mention_graph.jnld'
+        taj_name = os.path.splitext(taj_name)[0]
+        return self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/edges.npy'
+    
+    def generateEdgesFromTAJ(self, query, taj_name, verbose=True) :
+        '''
+        Parse every relation in the given TAJ file, store them as its edge list
+        and return that edge list
+        '''
+        return storeTAJEdges(self.ARCHIVE_DIR + query + '/' + taj_name,
+                             self.getEdgeStorePath(query, taj_name), self.Tweet, verbose)
+    
+    def isLatestTAJ(self, taj_name) :
+        '''
+        True if the given TAJ file may still have tweets added to it, so that
+        its stored edge list may be out of date
+        '''
+        # Get names of our files that might be updated
+        if self.arx['unfinished'] is not None :
+            unfin = self.arx['unfinished'][0]
         else :
-            graph_type = 'influence'
-            graph_type_str = '/influence_graph.jnld'
+            unfin = ''
+        if len(self.arx['finished']) > 0:
+            fin = self.arx['finished'][-1][0]
+        else :
+            fin = ''
+        return taj_name == unfin or taj_name == fin
+    
+    def loadEdgesForTAJ(self, query, taj_name, create_if_missing=True, update_latest=True) :
+        '''
+        Load the edge list for a given query and its specified taj file. The stored edge list is memory-mapped if it
+        already exists, or else it will be generated from the taj file before returning it.
+        '''
         
-        # Read that graph if it exists, otherwise create graphs and return your graph
-        #  Make the directory if it doesn't exist
-        try:
-            os.makedirs(self.ARCHIVE_DIR + query + '/graphs/' + taj_name + '/', exist_ok=True)
-        except (FileNotFoundError, FileExistsError):
-            pass
-
+        # If this is a file that might have been updated, regenerate its edges
+        if update_latest and self.isLatestTAJ(taj_name) :
+            return self.generateEdgesFromTAJ(query, taj_name)
+        
+        # Edges should not have been updated; load them
         try :
-            
-            # If we're not going to update the graph, just pull it out
-            if not update_latest :
-                return self.loadJSON(self.ARCHIVE_DIR + query + '/graphs/' + taj_name + graph_type_str)
-            
-            # If this is a graph that might have been updated, regenerate it
-            else :
-                
-                # Get names of our graphs that might be updated
-                if self.arx['unfinished'] is not None :
-                    unfin = self.arx['unfinished'][0]
-                else :
-                    unfin = ''
-                if len(self.arx['finished']) > 0:
-                    fin = self.arx['finished'][-1][0]
-                else :
-                    fin = ''
-                
-                # Check for match
-                if taj_name + '.taj' == unfin or taj_name + '.taj' == fin :
-                    
-                    # Might have been updated; regenerate graph
-                    graph = self.generateJSONFromTAJ(query, taj_name+'.taj')
-                    if graph_type != 'influence' :
-                        return self.loadJSON(self.ARCHIVE_DIR + query + '/graphs/' + taj_name + graph_type_str)
-                    else :
-                        return graph
-                else :
-                    # Graph should not have been updated; load it
-                    return self.loadJSON(self.ARCHIVE_DIR + query + '/graphs/' + taj_name + graph_type_str)
-        except :
-            # Make our graph if it doesn't exist yet
+            return EdgeStore.loadEdges(self.getEdgeStorePath(query, taj_name))
+        except (OSError, ValueError) :
+            # Make our edge list if it doesn't exist yet
             if create_if_missing :
-                graph = self.generateJSONFromTAJ(query, taj_name + '.taj')
-                if graph_type != 'influence' :
-                    return self.loadJSON(self.ARCHIVE_DIR + query + '/graphs/' + taj_name + graph_type_str)
-                else :
-                    return graph
+                return self.generateEdgesFromTAJ(query, taj_name)
             else :
                 return None
+    
+    def loadGraphForTAJ(self, query, taj_name, graph_type='influence', create_if_missing=True, update_latest=True) :
+        '''
+        Load the graph for a given query and its specified taj file, building its edge list first if necessary.
+        '''
+        edges = self.loadEdgesForTAJ(query, taj_name, create_if_missing, update_latest)
+        if edges is None :
+            return None
+        if graph_type not in EdgeStore.GRAPH_TYPES :
+            graph_type = 'influence'
+        return EdgeStore.edgesToGraph(EdgeStore.selectEdges(edges, graph_type), DiGraph())
                 
+
     def getBoundsFromTo(self, tweet_id_start=None, tweet_id_stop=None):
         """
         Returns a list of bounds containing all tweets from tweet_id_start (included)
@@ -721,24 +945,19 @@ class TweetArchive(object):
         else:
             return []
 
-        first_tids = [bound[1] for bound in bounds]    
-        last_tids = [bound[2] for bound in bounds]
-        
         if tweet_id_start is None:
             min_bound = 0
         else:
-            if tweet_id_start <= min(first_tids):
-                min_bound = 0
-            else:
-                min_bound = max([i for i, first_tid in enumerate(first_tids) if first_tid < tweet_id_start])
+            # Last file starting before the first tweet
+            min_bound = max(bisect_left(self.fin_min_ids, tweet_id_start) - 1, 0)
         
         if tweet_id_stop is None:
             max_bound = -2
         else:
-            if tweet_id_stop > max(last_tids):
+            # First file ending at or after the last tweet
+            max_bound = bisect_left(self.fin_max_ids, tweet_id_stop)
+            if max_bound == len(self.fin_max_ids) :
                 max_bound = -2
-            else:                
-                max_bound = min([i for i, last_tid in enumerate(last_tids) if last_tid >= tweet_id_stop])
         
         
         return bounds[min_bound:max_bound+1]
@@ -747,7 +966,7 @@ class TweetArchive(object):
             
     def buildGraph(self, min_bound=None, max_bound=None, graph_type='influence', 
                    min_date=None, max_date=None, force_reparse=False,
-                   save_tweet_ids=False):
+                   save_tweet_ids=False, workers=1, use_cache=True):
         '''
         Load a NetworkX graph for the tweet range specified. This may require re-parsing
         the first and last graphs in the series if your tweet bounds fall within a graph.
@@ -756,6 +975,8 @@ class TweetArchive(object):
         
         force_reparse : forces the reparsing the taj file
         save_tweet_ids : add the tweet_ids as edge attributes the graph
+        workers : number of processes parsing TAJ files at once
+        use_cache : reuse the edges of an identical earlier call (see GRAPH_CACHE)
         
         returns a networkx DiGraph
         '''
@@ -768,13 +989,26 @@ class TweetArchive(object):
         if min_bound > max_bound :
             raise ValueError
         
+        # Check the kind of influence you want
+        if graph_type not in EdgeStore.GRAPH_TYPES :
+            raise ValueError('Inappropriate graph_type')
+        
+        # Same request on the same archive state; skip the files altogether
+        cache_key = (self.ARCHIVE_DIR, self.arx['query'], graph_type, min_bound, max_bound,
+                     min_date, max_date, self.archiveState())
+        if use_cache and not force_reparse :
+            cached = GRAPH_CACHE.get(cache_key)
+            if cached is not None :
+                edges, graph_attrs = cached
+                graph = DiGraph()
+                graph.graph.update(graph_attrs)
+                return EdgeStore.edgesToGraph(edges, graph, save_tweet_ids)
+        
         # Init
         graph = DiGraph(graph_type=graph_type)
-        bounds = []
-        min_ptr = -1; max_ptr = -1
-        reparse_min = False; reparse_max = False
+        edge_lists = []
         
-        # Add the range of each file to our bounds list
+        # The range of each file
         """ for each bound :
         bound[0] : filename
         bound[1] : first tweet ID (minID)
@@ -782,97 +1016,39 @@ class TweetArchive(object):
             where the tweet IDs (ID) in the file are such as minID < ID <= maxID
         bound[3] and bound[4] are the timestamp corresponding to minID and maxID
         """
-        
-        if len(self.arx['finished']) > 0 :
-            bounds.extend(self.arx['finished'])
-        if self.arx['unfinished'] is not None :
-            bounds.append(self.arx['unfinished'])
-            
+        bounds = self.bound_list
         
         if (min_date is not None) and (max_date is not None):
             # use date range instead of tweet ids
             
             try:
-                taj_min = self.getTAJinfos(min_date)[0]
-            except BeforeFirstTweet:
-                taj_min = bounds[0][0]
-                min_date = parsedate(bounds[0][3])                
+                first_tweet, last_tweet = self.getDateRangeTweets(min_date, max_date)
             except AfterLastTweet:
                 # there is no tweet during this time period
                 raise EmptyGraph('Min date is after the last tweet.' + \
                                 '\n last tweet : ' + bounds[-1][4])
-                                
-            try:
-                taj_max = self.getTAJinfos(max_date)[0]
             except BeforeFirstTweet:
                 # there is no tweet during this time period
                 raise EmptyGraph('Max date is before the first tweet.' + \
-                                '\n first tweet : ' + bounds[0][3])                
-            except AfterLastTweet:
-                taj_max = bounds[-1][0]
-                max_date = parsedate(bounds[-1][4])                 
-            
-            file_min = os.path.join(self.ARCHIVE_DIR, self.arx['query'], taj_min)
-            file_max = os.path.join(self.ARCHIVE_DIR, self.arx['query'], taj_max)
-            
-            # read these files and get all (tweet IDs, timestamp) pairs
-            tid2timestamp = self.Tweet.getTweetIDtoTimestampDict(list({file_min, file_max}))
+                                '\n first tweet : ' + bounds[0][3])
             
             # convert to tweet id
-            # smallest tweet id with corresponding timestamp
-            if min_date <= min(list(tid2timestamp.values())):
-                min_bound = min(list(tid2timestamp.keys()))
-            else:
-                min_bound = min([tid for tid, timestamp in tid2timestamp.items() if timestamp >= min_date])
-            # largest tweet id with corresponding timestamp
-            if max_date >= max(list(tid2timestamp.values())):
-                max_bound = max(list(tid2timestamp.keys()))
-            else:
-                max_bound = max([tid for tid, timestamp in tid2timestamp.items() if timestamp <= max_date])
+            min_bound = self.Tweet.getTweetID(first_tweet)
+            max_bound = self.Tweet.getTweetID(last_tweet)
           
         # Find first and last TAJ files to parse
-        for n, bound in enumerate(bounds) :
-            
-            # Unpack
-            # tweet numbers
-            taj_min = bound[1] 
-            taj_max = bound[2]
-            
-            if taj_min is None and taj_max is None :
-                continue
-            
-            assert taj_min <= taj_max
-            
-            # Check min bound
-            if min_ptr == -1 :
-                if min_bound < taj_min :
-                    min_ptr = n
-                elif min_bound < taj_max :
-                    min_ptr = n; reparse_min = True
-            
-            # Check max bound
-            if max_ptr == -1 :
-                if max_bound < taj_min :
-                    if n > 0 :
-                        max_ptr = n
-                    else :
-                        return graph
-                elif max_bound <= taj_max :
-                    max_ptr = n+1; reparse_max = True
-            
-            # Once you find both bounds, stop looking
-            if min_ptr != -1 and max_ptr != -1 :
-                break
-        
-        # Eliminate bounds outside collection range
-        if min_ptr == -1 : min_ptr = 0
-        if max_ptr == -1 : max_ptr = len(bounds)
+        pointers = self.filePointers(min_bound, max_bound)
+        if pointers is None :
+            return graph
+        min_ptr, max_ptr, reparse_min, reparse_max = pointers
         bounds = bounds[min_ptr:max_ptr]
         
         # Built TAJ list
         taj_list = [bound[0] for bound in bounds]
         
         # Load TAJ files, reparse as necessary
+        query_dir = self.ARCHIVE_DIR + self.arx['query'] + '/'
+        tasks = []
         for n, taj in enumerate(taj_list) :
             
             # Check if we need to reparse this TAJ's graph
@@ -882,70 +1058,43 @@ class TweetArchive(object):
             elif n == len(taj_list) - 1 and reparse_max :
                 reparse_me = True
             
-            # Create graph for this TAJ
-            sub_g = DiGraph()
+            # Collect edges for this TAJ
             if reparse_me or force_reparse:
-                
-                # Check if tweets are new-to-old or old-to-new
-                newest_first = taj[0:3] == 'new'
-                
+                # Parse just the tweets you want
+                tasks.append((n, (query_dir + taj, None, self.Tweet.__name__, min_bound, max_bound, graph_type)))
+                edge_lists.append(None)
+                continue
+            
+            # Load pregenerated edges, or make them if they're missing or stale
+            edges = None
+            if not self.isLatestTAJ(taj) :
+                edges = self.loadEdgesForTAJ(self.arx['query'], taj, create_if_missing=False, update_latest=False)
+            if edges is None :
+                tasks.append((n, (query_dir + taj, self.getEdgeStorePath(self.arx['query'], taj),
+                                  self.Tweet.__name__, None, None, graph_type)))
+                edge_lists.append(None)
+                continue
+            
+            # Keep the kind of influence you want
+            edge_lists.append(EdgeStore.selectEdges(edges, graph_type))
+        
+        # Parse files across worker processes; only the edge arrays come back
+        if workers > 1 and len(tasks) > 1 :
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor :
+                results = list(executor.map(_graphEdgesTask, [task for n, task in tasks]))
+        else :
+            results = []
+            for n, task in tasks :
                 # Surrender the thread
                 time.sleep(0)
-                
-                # Parse the file
-                with open(self.ARCHIVE_DIR + self.arx['query'] + '/' + taj, 'r') as fopen :
-                    
-                    # Set the kind of influence you want to parse
-                    if graph_type == 'retweet' :
-                        getAppropriateInfluencers = self.Tweet.getRetweetInfluencers
-                    elif graph_type == 'reply' :
-                        getAppropriateInfluencers = self.Tweet.getReplyInfluencers
-                    elif graph_type == 'mention' :
-                        getAppropriateInfluencers = self.Tweet.getMentionInfluencers
-                    elif graph_type == 'quote' :
-                        getAppropriateInfluencers = self.Tweet.getQuoteInfluencers
-                    elif graph_type == 'influence' :
-                        getAppropriateInfluencers = self.Tweet.getInfluencers
-                    else:
-                        raise ValueError('Inappropriate graph_type')
-                    
-                    # Parse influencers
-                    for line in fopen :
-                        line = line.strip()
-                        if line :
-                            try :
-                                tweet = json.loads(line)
-                            except ValueError :
-                                continue                            
-                            tweet_id = self.Tweet.getTweetID(tweet)
-                                                        
-                            # Skip tweets that occur before the ones you want
-                            if newest_first and tweet_id > max_bound \
-                                or not newest_first and tweet_id < min_bound :
-                                continue
-                                
-                            # Stop looking when you pass the tweets you want
-                            if newest_first and tweet_id < min_bound \
-                                or not newest_first and tweet_id > max_bound :
-                                break                            
-                                
-                            # Collect the tweets you want
-                            tweeter, influencers = getAppropriateInfluencers(tweet)
-                            for influencer in influencers:
-                                if save_tweet_ids:
-                                    addEdgeWithTweetID(sub_g, influencer, tweeter, tweet_id)                                    
-                                else:    
-                                    sub_g.add_edge(influencer, tweeter)
-                        
-            else :
-                # Load pregenerated graph
-                sub_g = self.loadGraphForTAJ(self.arx['query'],taj)
-            
-            # Merge to total graph
-            if save_tweet_ids:
-                addEdgesFromWithTweetID(graph, sub_g)
-            else:
-                graph.add_edges_from(sub_g.edges(data=True))
+                results.append(_graphEdgesTask(task))
+        for (n, task), edges in zip(tasks, results) :
+            edge_lists[n] = edges
+        
+        # Merge to total graph
+        edges = EdgeStore.concatEdges(edge_lists)
+        EdgeStore.edgesToGraph(edges, graph, save_tweet_ids)
+        edge_lists = None       # Free up memory
             
         # add information about start and end time to the graph
         if min_bound < float('inf') :
@@ -959,12 +1108,25 @@ class TweetArchive(object):
             graph.graph['last_tweet_id'] = None
             
         if (min_date is not None) and (max_date is not None):
-            graph.graph['first_tweet_time'] = tid2timestamp[min_bound]
-            graph.graph['last_tweet_time'] = tid2timestamp[max_bound]
+            graph.graph['first_tweet_time'] = self.Tweet.getTimeStamp(first_tweet)
+            graph.graph['last_tweet_time'] = self.Tweet.getTimeStamp(last_tweet)
+        
+        if use_cache :
+            GRAPH_CACHE.put(cache_key, edges, graph.graph)
             
         # Return the influencers graph
         return graph
     
+    def archiveState(self) :
+        '''
+        Hashable snapshot of the file bounds in the archive index; it changes
+        whenever tweets are committed
+        '''
+        finished = tuple(tuple(bound) for bound in self.arx['finished'])
+        if self.arx['unfinished'] is not None :
+            return finished, tuple(self.arx['unfinished'])
+        return finished, None
+    
     def getTAJinfos(self, timestamp):
         """ Returns a tuple with: 
         
@@ -976,28 +1138,122 @@ class TweetArchive(object):
         
             timestamp is a datetime object
         """
-        bounds = []
-        
-        if len(self.arx['finished']) > 0 :
-            bounds.extend(self.arx['finished'])
-        if self.arx['unfinished'] is not None :
-            bounds.append(self.arx['unfinished'])
-
-        d2tid_min = {parsedate(bound[3]) : bound[1] for bound in bounds}
+        return self.bound_list[self.getTAJPosition(timestamp)]
+    
+    def getTAJPosition(self, timestamp) :
+        '''
+        Position in the archive's file list of the TAJ file containing this
+        tweet timestamp (see getTAJinfos)
+        '''
+        epoch = timestamp.timestamp()
+        (start_epochs, time_positions, first_time, last_time) = self.timeIndex()[0:4]
         
-        if timestamp < min(list(d2tid_min.keys())):
-            raise BeforeFirstTweet('No tweets at this date.\nFirst tweet was at ' \
-            + min(list(d2tid_min.keys())).strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
+        if first_time is None or epoch < start_epochs[0] :
+            raise BeforeFirstTweet('No tweets at this date.' + \
+            ('' if first_time is None else \
+             '\nFirst tweet was at ' + first_time.strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z')))
             
-        if timestamp > max(parsedate(bound[4]) for bound in bounds):
+        if epoch > last_time.timestamp() :
             raise AfterLastTweet('No tweets at this date.\nLast tweet was at ' \
-            + max(parsedate(bound[4]) for bound in bounds).strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
-                                       
-        # find the min_tweet_id bound of the file containing the timestamp
-        timestamp_min_bound = max([date for date in list(d2tid_min.keys()) if date < timestamp])
+            + last_time.strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
         
-        # return the filename
-        return [bound for bound in bounds if bound[1] == d2tid_min[timestamp_min_bound]][0]
+        # Last file starting before the timestamp
+        n = max(bisect_left(start_epochs, epoch) - 1, 0)
+        return time_positions[n]
+
+    def splitByDate(self, timestamp, inclusive=False) :
+        '''
+        Find where the archive goes from tweets older than timestamp (or at
+        it, if inclusive) to newer ones, by binary search over the files and
+        then over the bytes of the one file the split falls in.
+        
+        Returns (n, offset, older, newer): the split falls at the given byte
+        offset of the n-th file, between the tweets older and newer (None at
+        either end of the archive). Returns None for an empty archive.
+        '''
+        bounds = self.bound_list
+        if len(bounds) == 0 :
+            return None
+        epoch = timestamp.timestamp()
+        end_epochs, end_positions = self.timeIndex()[4:6]
+        
+        # First file ending past the split, else the latest
+        k = bisect_right(end_epochs, epoch) if inclusive else bisect_left(end_epochs, epoch)
+        n = end_positions[k] if k < len(end_positions) else len(bounds) - 1
+        (offset, older, newer) = self.splitTAJByDate(n, epoch, inclusive)
+        
+        # The neighbouring tweets may sit in the files on either side
+        m = n
+        while older is None and m > 0 :
+            m -= 1
+            older = self.splitTAJByDate(m, epoch, inclusive)[1]
+        m = n
+        while newer is None and m < len(bounds) - 1 :
+            m += 1
+            newer = self.splitTAJByDate(m, epoch, inclusive)[2]
+        
+        return n, offset, older, newer
+    
+    def splitTAJByDate(self, n, epoch, inclusive=False) :
+        '''
+        TajIO.splitByTime on the n-th file of the archive
+        '''
+        taj = self.bound_list[n][0]
+        taj_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + taj
+        return TajIO.splitByTime(taj_file, self.Tweet, epoch, inclusive,
+                                 newest_first=taj[0 :3] == 'new', index=self.getTAJIndex(taj_file))
+    
+    def getDateRangeTweets(self, min_date, max_date) :
+        '''
+        The first and last tweets of the archive such that
+        
+            min_date <= tweet_time <= max_date
+        
+        Raises AfterLastTweet if no tweet comes at or after min_date, and
+        BeforeFirstTweet if none comes at or before max_date.
+        '''
+        split = self.splitByDate(min_date)
+        if split is None or split[3] is None :
+            raise AfterLastTweet('No tweets at or after ' + min_date.strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
+        first_tweet = split[3]
+        
+        split = self.splitByDate(max_date, inclusive=True)
+        if split[2] is None :
+            raise BeforeFirstTweet('No tweets at or before ' + max_date.strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
+        last_tweet = split[2]
+        
+        return first_tweet, last_tweet
+    
+    def getDateRangeIDs(self, min_date, max_date) :
+        '''
+        Tweet ID bounds [min_id, max_id] of the tweets such that
+        
+            min_date <= tweet_time <= max_date
+        
+        On an archive of snowflake IDs these are worked out from the dates
+        alone; otherwise they're the IDs of the tweets getDateRangeTweets
+        finds. Raises AfterLastTweet and BeforeFirstTweet as it does.
+        '''
+        if not self.hasSnowflakeIDs() :
+            first_tweet, last_tweet = self.getDateRangeTweets(min_date, max_date)
+            return self.Tweet.getTweetID(first_tweet), self.Tweet.getTweetID(last_tweet)
+        
+        # Tweets are timed to the second
+        min_id = self.Tweet.epochToID(min_date.timestamp())
+        max_id = self.Tweet.epochToID(math.floor(max_date.timestamp()) + 1) - 1
+        if min_id > self.max_ids[-1] :
+            raise AfterLastTweet('No tweets at or after ' + min_date.strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
+        if max_id < self.min_ids[0] :
+            raise BeforeFirstTweet('No tweets at or before ' + max_date.strftime('%Y-%m-%d %Hh%Mm%Ss %Z%z'))
+        return min_id, max_id
+    
+    def hasSnowflakeIDs(self) :
+        '''
+        Whether every tweet ID in the archive tells the time it was tweeted
+        (see Tweet.idToEpoch)
+        '''
+        return hasattr(self.Tweet, 'epochToID') and len(self.min_ids) > 0 \
+            and self.Tweet.isSnowflake(self.min_ids[0])
 
     
     def getNumTweets(self, min_date=None, max_date=None):
@@ -1007,56 +1263,124 @@ class TweetArchive(object):
             
             /!\ does not distinguish all duplicated tweets
             
-        """        
+        """
+        bounds = self.bound_list
+        if len(bounds) == 0 :
+            return 0
         
-        bounds = []
+        # Whole histogram bins within the window
+        bin_seconds = TajHistogram.BIN_SECONDS if HISTOGRAM_BIN is None else HISTOGRAM_BIN
+        min_epoch = None if min_date is None else min_date.timestamp()
+        max_epoch = None if max_date is None else max_date.timestamp()
+        min_bin = None if min_epoch is None else -(-min_epoch // bin_seconds) * bin_seconds
+        max_bin = None if max_epoch is None else max_epoch // bin_seconds * bin_seconds
+        if min_bin is not None and max_bin is not None and min_bin >= max_bin :
+            # Window within a single bin
+            return self.countTweetsBetween(min_date, max_date)
+        
+        # Count those from the histograms of the files they span
+        num_tweets = 0
+        for n in self.datePositions(min_bin, max_bin) :
+            taj_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + bounds[n][0]
+            num_tweets += self.getTAJHistogram(taj_file).count(min_bin, max_bin)
+        
+        # Count the ragged ends of the window off the TAJ files
+        if min_epoch is not None and min_epoch < min_bin :
+            num_tweets += self.countTweetsBetween(min_date, datetime.fromtimestamp(min_bin, pytz.UTC))
+        if max_epoch is not None and max_bin < max_epoch :
+            num_tweets += self.countTweetsBetween(datetime.fromtimestamp(max_bin, pytz.UTC), max_date)
+        
+        return num_tweets
+    
+    def getVolumeSeries(self, min_date=None, max_date=None, bin_seconds=None) :
+        '''
+        Tweet counts over time, read from the TAJ histograms alone. Returns
+        (bin start datetime, count) pairs for consecutive bins from the bin
+        holding min_date to the one holding max_date, empty bins included.
         
-        if len(self.arx['finished']) > 0 :
-            bounds.extend(self.arx['finished'])
-        if self.arx['unfinished'] is not None :
-            bounds.append(self.arx['unfinished'])
-            
-        # find taj files corresponding to min_date and max_date
-
-        try:
-            taj_min = self.getTAJinfos(min_date)[0]
-        except BeforeFirstTweet:
-            taj_min = bounds[0][0]
-            min_date = parsedate(bounds[0][3])
-            
-        except AfterLastTweet:
-            # there is no tweet during this time period
-            return 0
-            
-        try:
-            taj_max = self.getTAJinfos(max_date)[0]
-        except BeforeFirstTweet:
-            # there is no tweet during this time period
+        bin_seconds should be a multiple of the histogram bins' width.
+        '''
+        bounds = self.bound_list
+        hist_seconds = TajHistogram.BIN_SECONDS if HISTOGRAM_BIN is None else HISTOGRAM_BIN
+        if bin_seconds is None :
+            bin_seconds = hist_seconds
+        min_bin = None if min_date is None else min_date.timestamp() // bin_seconds * bin_seconds
+        max_bin = None if max_date is None else (max_date.timestamp() // bin_seconds + 1) * bin_seconds
+        
+        # Sum the histograms of every file in range into the wider bins
+        counts = {}
+        for n in self.datePositions(min_bin, max_bin) :
+            taj_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + bounds[n][0]
+            for bin_start, count in self.getTAJHistogram(taj_file).series(min_bin, max_bin) :
+                bin_start = bin_start // bin_seconds * bin_seconds
+                counts[bin_start] = counts.get(bin_start, 0) + count
+        if len(counts) == 0 :
+            return []
+        
+        # Fill in the gaps
+        if min_bin is None : min_bin = min(counts)
+        if max_bin is None : max_bin = max(counts) + bin_seconds
+        return [(datetime.fromtimestamp(bin_start, pytz.UTC), counts.get(bin_start, 0))
+                for bin_start in range(int(min_bin), int(max_bin), int(bin_seconds))]
+    
+    def datePositions(self, min_epoch=None, max_epoch=None) :
+        '''
+        Positions in the archive's file list of the files that may hold
+        tweets in [min_epoch, max_epoch)
+        '''
+        end_epochs, end_positions = self.timeIndex()[4:6]
+        
+        # From the first file ending at or past the min to the first ending past the max
+        k_min = 0 if min_epoch is None else bisect_left(end_epochs, min_epoch)
+        k_max = len(end_positions) if max_epoch is None else bisect_left(end_epochs, max_epoch) + 1
+        return end_positions[k_min:k_max]
+    
+    def countTweetsBetween(self, min_date=None, max_date=None) :
+        '''
+        Number of tweets in the TAJ files between the tweets at min_date and
+        max_date (see getNumTweets), found by bisecting the files at either
+        date and counting the non-blank lines in between
+        '''
+        bounds = self.bound_list
+        if len(bounds) == 0 :
             return 0
-        except AfterLastTweet:
-            taj_max = bounds[-1][0]
-            max_date = parsedate(bounds[-1][4])            
-            
-            
-        ind_min, ind_max = [i for i, bound in enumerate(bounds) if bound[0] == taj_min or bound[0] == taj_max]
         
-        intermediate_tweets = 0
+        # Where the archive splits at each date; no date means either end
+        if min_date is None :
+            n_min = 0; off_min = None
+        else :
+            n_min, off_min = self.splitByDate(min_date)[0:2]
+        if max_date is None :
+            n_max = len(bounds) - 1; off_max = None
+        else :
+            n_max, off_max = self.splitByDate(max_date)[0:2]
         
-        if ind_max - ind_min > 1:
-            
-            intermediate_tweets = sum(bound[5] for bound in bounds[ind_min+1:ind_max])
-                
-
-        tid2timestamp = self.Tweet.getTweetIDtoTimestampDict(list({os.path.join(self.ARCHIVE_DIR,
-                                                                 self.arx['query'], 
-                                                                 taj_min), 
-                                                                 os.path.join(self.ARCHIVE_DIR,
-                                                                 self.arx['query'], 
-                                                                 taj_max)}))
-        bound_tweets = len([tid for tid, dt in tid2timestamp.items() if \
-                    dt >= min_date and dt < max_date])
-
-        return bound_tweets + intermediate_tweets
+        # Count the lines between the two splits
+        if n_min > n_max :
+            return 0
+        if n_min == n_max :
+            return self.countTAJRange(n_min, off_min, off_max)
+        intermediate_tweets = sum(bound[5] for bound in bounds[n_min+1:n_max])
+        return self.countTAJRange(n_min, off_min, None) + intermediate_tweets + \
+               self.countTAJRange(n_max, None, off_max)
+    
+    def countTAJRange(self, n, start=None, stop=None) :
+        '''
+        Number of tweets in the n-th file between the split offsets start and
+        stop, in tweet ID order. None stands for either end of the file.
+        '''
+        bound = self.bound_list[n]
+        if start is None and stop is None :
+            return bound[5]
+        
+        # Unfinished files run newest to oldest
+        if bound[0][0 :3] == 'new' :
+            start, stop = stop, start
+        if start is None :
+            start = 0
+        if stop is not None and stop <= start :
+            return 0
+        return TajIO.countLines(self.ARCHIVE_DIR + self.arx['query'] + '/' + bound[0], start, stop)
 
 
     def verifyIndex(self) :
@@ -1104,7 +1428,7 @@ class TweetArchive(object):
         max_id = None
         
         # Feed forward
-        with open(taj_filename) as taj :
+        with TajIO.openTAJ(taj_filename, 'rb') as taj :
             for line in taj :
                 tweet = json.loads(line)
                 
@@ -1127,9 +1451,9 @@ class TweetArchive(object):
                         break
         
         # Feed in reverse
-        with open(taj_filename) as taj :
-            for line in enildaer(taj) :
-                tweet = json.loads(line)
+        with TajIO.openTAJ(taj_filename, 'rb') as taj :
+            for line in TajIO.reverseLines(taj) :
+                tweet = json.loads(bytes(line))
                 
                 # Get date and ID bounds from the bottom of the file
                 if not old_to_new :
@@ -1170,12 +1494,7 @@ class TweetArchive(object):
         if min_bound > max_bound :
             raise ValueError
         
-        # Init
-        bounds = []
-        min_ptr = -1
-        max_ptr = -1
-        
-        # Add the range of each file to our bounds list
+        # The range of each file
         """ for each bound :
         bound[0] : filename
         bound[1] : first tweet ID (minID)
@@ -1183,89 +1502,23 @@ class TweetArchive(object):
             where the tweet IDs (ID) in the file are such as minID < ID <= maxID
         bound[3] and bound[4] are the timestamp corresponding to minID and maxID
         """
-        
-        if len(self.arx['finished']) > 0 :
-            bounds.extend(self.arx['finished'])
-        if self.arx['unfinished'] is not None :
-            bounds.append(self.arx['unfinished'])
+        bounds = self.bound_list
         
         if (min_date is not None) and (max_date is not None) :
             # use date range instead of tweet ids
             
             try :
-                taj_min = self.getTAJinfos(min_date)[0]
-            except BeforeFirstTweet :
-                taj_min = bounds[0][0]
-                min_date = parsedate(bounds[0][3])
-            except AfterLastTweet :
+                min_bound, max_bound = self.getDateRangeIDs(min_date, max_date)
+            except (BeforeFirstTweet, AfterLastTweet) :
                 # there is no tweet during this time period
                 return
-            
-            try :
-                taj_max = self.getTAJinfos(max_date)[0]
-            except BeforeFirstTweet :
-                # there is no tweet during this time period
-                return
-            except AfterLastTweet :
-                taj_max = bounds[-1][0]
-                max_date = parsedate(bounds[-1][4])
-            
-            file_min = os.path.join(self.ARCHIVE_DIR, self.arx['query'], self.getTAJinfos(min_date)[0])
-            file_max = os.path.join(self.ARCHIVE_DIR, self.arx['query'], self.getTAJinfos(max_date)[0])
-            
-            # read these files and get all (tweet IDs, timestamp) pairs
-            tid2timestamp = self.Tweet.getTweetIDtoTimestampDict(list({file_min, file_max}))
-            
-            # convert to tweet id
-            # smallest tweet id with corresponding timestamp
-            if min_date <= min(list(tid2timestamp.values())) :
-                min_bound = min(list(tid2timestamp.keys()))
-            else :
-                min_bound = min([tid for tid, timestamp in tid2timestamp.items() if timestamp >= min_date])
-            # largest tweet id with corresponding timestamp
-            if max_date >= max(list(tid2timestamp.values())) :
-                max_bound = max(list(tid2timestamp.keys()))
-            else :
-                max_bound = max([tid for tid, timestamp in tid2timestamp.items() if timestamp <= max_date])
         
         # Find first and last TAJ files to parse
-        for n, bound in enumerate(bounds) :
-            
-            # Unpack
-            # tweet numbers
-            taj_min = bound[1]
-            taj_max = bound[2]
-            
-            if taj_min is None and taj_max is None :
-                continue
-            
-            assert taj_min <= taj_max
-            
-            # Check min bound
-            if min_ptr == -1 :
-                if min_bound < taj_min :
-                    min_ptr = n
-                elif min_bound < taj_max :
-                    min_ptr = n
-            
-            # Check max bound
-            if max_ptr == -1 :
-                if max_bound < taj_min :
-                    if n > 0 :
-                        max_ptr = n
-                    else :
-                        return
-                elif max_bound <= taj_max :
-                    max_ptr = n + 1
-            
-            # Once you find both bounds, stop looking
-            if min_ptr != -1 and max_ptr != -1 :
-                break
-        
-        # Eliminate bounds outside collection range
-        if min_ptr == -1 : min_ptr = 0
-        if max_ptr == -1 : max_ptr = len(bounds)
-        bounds = bounds[min_ptr :max_ptr]
+        pointers = self.filePointers(min_bound, max_bound)
+        if pointers is None :
+            return
+        min_ptr, max_ptr = pointers[0:2]
+        bounds = bounds[min_ptr:max_ptr]
         
         # Built TAJ list
         taj_list = [bound[0] for bound in bounds]
@@ -1281,16 +1534,20 @@ class TweetArchive(object):
             time.sleep(0)
             
             # Parse the file
-            with open(self.ARCHIVE_DIR + self.arx['query'] + '/' + taj, 'r') as fopen :
+            taj_file = self.ARCHIVE_DIR + self.arx['query'] + '/' + taj
+            index = self.getTAJIndex(taj_file)
+            with TajIO.openTAJ(taj_file, 'rb') as fopen :
                 
-                # Iterate through tweets
+                # Iterate through tweets, skipping straight to the
+                # neighbourhood of the ones you want
                 if reverse and not newest_first or \
                                 not reverse and newest_first :
-                    file_iter = enildaer(fopen)
+                    file_iter = TajIO.reverseLines(fopen, end=index.endOffset(min_bound, max_bound, newest_first))
                 else :
+                    fopen.seek(index.startOffset(min_bound, max_bound, newest_first))
                     file_iter = fopen
                 for line in file_iter :
-                    line = line.strip()
+                    line = bytes(line).strip()
                     if line :
                         try :
                             tweet = json.loads(line)
@@ -1299,11 +1556,13 @@ class TweetArchive(object):
                         tweet_id = self.Tweet.getTweetID(tweet)
                         
                         # Skip tweets that occur before the ones you want
-                        if tweet_id < min_bound :
+                        if reverse and tweet_id > max_bound \
+                            or not reverse and tweet_id < min_bound :
                             continue
                         
                         # Stop looking when you pass the tweets you want
-                        if tweet_id > max_bound :
+                        if reverse and tweet_id < min_bound \
+                            or not reverse and tweet_id > max_bound :
                             break
                         
                         yield tweet
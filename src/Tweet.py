@@ -3,12 +3,28 @@ Created on Oct 21, 2015
 
 @author: geofurb
 '''
+from collections import namedtuple
 from datetime import datetime
+from functools import lru_cache
+import calendar
+import math
 import pytz
 import json
 
 tweet_format = 'twitter'
 
+CREATED_AT_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
+MONTHS = {month : n for n, month in enumerate(('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                                               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+TIME_CACHE_SIZE = 1 << 16
+
+# Snowflake tweet IDs carry their creation time: milliseconds since
+# TWITTER_EPOCH_MS, above the low SNOWFLAKE_SHIFT bits. IDs up to
+# LAST_SEQUENTIAL_ID were handed out in sequence before that, and carry none.
+TWITTER_EPOCH_MS = 1288834974657
+SNOWFLAKE_SHIFT = 22
+LAST_SEQUENTIAL_ID = 29700859247
+
 
 # If properly included, return the tweet ID
 def getTweetID(tweet) :
@@ -26,31 +42,75 @@ def getDate(tweet) :
         return None
 
 
+# Layout of the records extractRelations and getRelations return
+RELATION_FIELDS = ('tweeter', 'retweeted', 'replied', 'quoted', 'mentions')
+Relations = namedtuple('Relations', RELATION_FIELDS)
+
+def extractRelations(tweet, fields=None) :
+    """ Pull the tweeter's ID and the IDs of the users they retweeted, replied
+        to and quoted, and the IDs they mentioned, in one walk of the tweet.
+        If fields (a subset of RELATION_FIELDS) is given, only those are
+        looked up.
+    
+        returns : Relations of tweeter, retweeted, replied, quoted (int or
+                  None for each) and mentions (list of ints); fields not
+                  looked up are None
+    """
+    tweeter = retweeted = replied = quoted = mentions = None
+    every = fields is None
+    
+    if every or 'tweeter' in fields :
+        if 'user' in tweet :
+            user = tweet['user']
+            if user is not None and 'id' in user :
+                tweeter = user['id']
+    
+    if every or 'retweeted' in fields :
+        if 'retweeted_status' in tweet :
+            status = tweet['retweeted_status']
+            if status is not None and 'user' in status :
+                user = status['user']
+                if user is not None and 'id' in user :
+                    retweeted = user['id']
+    
+    if every or 'replied' in fields :
+        if 'in_reply_to_user_id' in tweet :
+            replied = tweet['in_reply_to_user_id']
+    
+    if every or 'quoted' in fields :
+        if 'quoted_status' in tweet :
+            status = tweet['quoted_status']
+            if status is not None and 'user' in status :
+                user = status['user']
+                if user is not None and 'id' in user :
+                    quoted = user['id']
+    
+    if every or 'mentions' in fields :
+        mentions = []
+        if 'entities' in tweet :
+            entities = tweet['entities']
+            if entities is not None and 'user_mentions' in entities and entities['user_mentions'] :
+                for mention in entities['user_mentions'] :
+                    if 'id' in mention and mention['id'] is not None :
+                        mentions.append(mention['id'])
+    
+    return Relations(tweeter, retweeted, replied, quoted, mentions)
+
 def getInfluencers(tweet):
     """ Get all the influencers from this tweet
     
         returns : tweeter(int), influencers(list of ints)    
     """
-    
-    # Get the tweeter
-    tweeter = getUserID(tweet)
-    influencers = set()
+    relations = extractRelations(tweet)
+    tweeter = relations.tweeter
     
     # Nothing to do if we couldn't get the tweeter
     if tweeter is None :
         return None, []
     
-    # Add person they're replying to
-    influencers.add(getReplyID(tweet))
-    
-    # Add person they retweeted
-    influencers.add(getRetweetID(tweet))
-    
-    # Add person they quoted
-    influencers.add(getQuotedUserID(tweet))
-    
-    # Add mentions
-    influencers.update(getUserMentions(tweet))
+    # Add people they replied to, retweeted, quoted and mentioned
+    influencers = {relations.replied, relations.retweeted, relations.quoted}
+    influencers.update(relations.mentions)
   
     influencers.discard(tweeter)    
     influencers.discard(None)
@@ -63,45 +123,36 @@ def getRetweetInfluencers(tweet) :
     
         returns : tweeter(int), influencers(list of ints)
     """
-
-    # Get the tweeter
-    tweeter = getUserID(tweet)
-    influencers = []
+    relations = extractRelations(tweet, ('tweeter', 'retweeted'))
+    tweeter, retweeter = relations.tweeter, relations.retweeted
     
     # Nothing to do if we couldn't get the tweeter
     if tweeter is None :
-        return None, influencers
+        return None, []
     
     # Add person they retweeted
-    retweeter = getRetweetID(tweet)
     if retweeter is not None and \
     retweeter != tweeter:
-        influencers.append(retweeter)
-    
-    # Return our tweeter and their influencers
-    return tweeter, influencers
+        return tweeter, [retweeter]
+    return tweeter, []
 
 def getReplyInfluencers(tweet) :
     """ Get the reply influencers from this tweet 
     
         returns : tweeter(int), influencers(list of ints)
-    """    
-    # Get the tweeter
-    tweeter = getUserID(tweet)
-    influencers = []
+    """
+    relations = extractRelations(tweet, ('tweeter', 'replied'))
+    tweeter, replier = relations.tweeter, relations.replied
     
     # Nothing to do if we couldn't get the tweeter
     if tweeter is None :
-        return None, influencers
+        return None, []
     
     # Add person they're replying to
-    replier = getReplyID(tweet)
     if replier is not None and \
     replier != tweeter :
-        influencers.append(replier)
-    
-    # Return our tweeter and their influencers
-    return tweeter, influencers
+        return tweeter, [replier]
+    return tweeter, []
 
 def getQuoteInfluencers(tweet) :
     """ Get the quote influencers from this tweet
@@ -109,22 +160,17 @@ def getQuoteInfluencers(tweet) :
         /!\ the retweet influencers are exculded from the list
     
         returns : tweeter(int), influencers(list of ints)
-    """    
-    # Get the tweeter
-    tweeter = getUserID(tweet)
-    influencers = set()
+    """
+    relations = extractRelations(tweet, ('tweeter', 'retweeted', 'quoted'))
+    tweeter, quote = relations.tweeter, relations.quoted
     
     # Nothing to do if we couldn't get the tweeter
     if tweeter is None :
         return None, []
     
-    influencers.add(getQuotedUserID(tweet))
-    influencers.discard(getRetweetID(tweet))
-    influencers.discard(tweeter)    
-    influencers.discard(None)
-    
-    # Return our tweeter and their influencers
-    return tweeter, list(influencers)
+    if quote is not None and quote != tweeter and quote != relations.retweeted :
+        return tweeter, [quote]
+    return tweeter, []
 
 def getMentionInfluencers(tweet) :
     """ Get the mentioned influencers from this tweet.
@@ -132,27 +178,55 @@ def getMentionInfluencers(tweet) :
         /!\ retweeted, quoted and replied users are excluded from the list
     
         returns : tweeter(int), influencers(list of ints)
-    """        
-    # Get the tweeter
-    tweeter = getUserID(tweet)
-    influencers = set()
+    """
+    relations = extractRelations(tweet)
+    tweeter = relations.tweeter
     
     # Nothing to do if we couldn't get the tweeter
     if tweeter is None :
         return None, []
     
     # Add mentions
-    influencers.update(getUserMentions(tweet))
+    influencers = set(relations.mentions)
     
-    influencers.discard(getRetweetID(tweet))
-    influencers.discard(getReplyID(tweet))
-    influencers.discard(getQuotedUserID(tweet))
+    influencers.discard(relations.retweeted)
+    influencers.discard(relations.replied)
+    influencers.discard(relations.quoted)
     influencers.discard(tweeter)
     influencers.discard(None)
     
     # Return our tweeter and their influencers
     return tweeter, list(influencers)
 
+def getRelations(tweet) :
+    """ Get the influencers of every kind from this tweet in one pass,
+        with the same exclusions as the get*Influencers functions
+    
+        returns : Relations of tweeter(int), and the retweeted, replied,
+                  quoted and mentions influencers (lists of ints)
+    """
+    relations = extractRelations(tweet)
+    tweeter = relations.tweeter
+    
+    # Nothing to do if we couldn't get the tweeter
+    if tweeter is None :
+        return Relations(None, [], [], [], [])
+    
+    retweet, reply, quote = relations.retweeted, relations.replied, relations.quoted
+    retweeted = [retweet] if retweet is not None and retweet != tweeter else []
+    replied = [reply] if reply is not None and reply != tweeter else []
+    quoted = [quote] if quote is not None and quote != tweeter and quote != retweet else []
+    
+    # Mentions exclude everyone already related to the tweeter another way
+    mentioned = []
+    excluded = {tweeter, retweet, reply, quote}
+    for user in relations.mentions :
+        if user not in excluded :
+            excluded.add(user)
+            mentioned.append(user)
+    
+    return Relations(tweeter, retweeted, replied, quoted, mentioned)
+
 # If properly included, return the tweeter's ID
 def getUserID(tweet) :
     if 'user' in tweet and \
@@ -398,16 +472,70 @@ def getTimeStamp(tweet, timezone='US/Eastern'):
     unless specified differently
     
     """
-    
-    if 'created_at' in tweet and tweet['created_at'] is not None:
-        try:
-            timestamp = datetime.strptime(tweet['created_at'],'%a %b %d %H:%M:%S +0000 %Y').replace(tzinfo=pytz.UTC)
-            return timestamp.astimezone(pytz.timezone(timezone))
-        except ValueError:
-            return None
-    else:
+    epoch = getEpoch(tweet)
+    if epoch is None :
+        return None
+    return epochToTimeStamp(epoch, timezone)
+
+def getEpoch(tweet) :
+    """If properly included, get the time of the tweet from the 'created_at'
+    field, in integer seconds since the epoch"""
+    if 'created_at' in tweet and tweet['created_at'] is not None :
+        return parseCreatedAt(tweet['created_at'])
+    else :
         return None
 
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def parseCreatedAt(created_at) :
+    """Integer epoch seconds of a 'created_at' string, or None if it isn't one.
+    Twitter's fixed-width layout ('Wed Oct 10 20:19:24 +0000 2018') is sliced
+    apart; anything else goes through strptime. Tweets arrive clustered in
+    time, so results are cached per second."""
+    try :
+        if len(created_at) == 30 and created_at[19 :26] == ' +0000 ' :
+            moment = datetime(int(created_at[26 :30]), MONTHS[created_at[4 :7]], int(created_at[8 :10]),
+                              int(created_at[11 :13]), int(created_at[14 :16]), int(created_at[17 :19]))
+        else :
+            moment = datetime.strptime(created_at, CREATED_AT_FORMAT)
+    except (ValueError, KeyError, TypeError) :
+        return None
+    return calendar.timegm(moment.timetuple())
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def epochToTimeStamp(epoch, timezone='US/Eastern') :
+    """Timezone-aware datetime of integer epoch seconds"""
+    return datetime.fromtimestamp(epoch, pytz.timezone(timezone))
+
+def isSnowflake(tweet_id) :
+    """Whether a tweet ID is a snowflake, i.e. has its creation time in it"""
+    return tweet_id is not None and tweet_id > LAST_SEQUENTIAL_ID
+
+def idToEpochMs(tweet_id) :
+    """Creation time of a tweet in milliseconds since the epoch, read off
+    its snowflake ID; None if the ID isn't a snowflake"""
+    if not isSnowflake(tweet_id) :
+        return None
+    return (tweet_id >> SNOWFLAKE_SHIFT) + TWITTER_EPOCH_MS
+
+def idToEpoch(tweet_id) :
+    """Creation time of a tweet in integer seconds since the epoch, as its
+    'created_at' field has it, read off its snowflake ID; None if the ID
+    isn't a snowflake"""
+    epoch_ms = idToEpochMs(tweet_id)
+    if epoch_ms is None :
+        return None
+    return epoch_ms // 1000
+
+def epochToID(epoch) :
+    """Lowest snowflake ID a tweet created at or after epoch seconds can
+    have, so that the tweets created in [start, end) are exactly those with
+    
+        epochToID(start) <= tweet_id < epochToID(end)
+    
+    Times before the snowflake epoch give the lowest snowflake ID."""
+    epoch_ms = math.ceil(epoch) * 1000 - TWITTER_EPOCH_MS
+    return max(epoch_ms << SNOWFLAKE_SHIFT, LAST_SEQUENTIAL_ID + 1)
+
 
 def getTweetIDtoTimestampDict(tweets_filenames, timezone='US/Eastern'):
     """ Returns a dictonary with
@@ -0,0 +1,29 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Test setup: the modules in src/ import each other flat, so put src/ on the
+path, and point the system config at a scratch directory.
+'''
+
+import os
+import sys
+import tempfile
+import types
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+# Keep the tests away from real archives
+DATAROOT = tempfile.mkdtemp(prefix='kcore-tests-')
+config_sys = types.ModuleType('config_sys')
+config_sys.DATAROOT = DATAROOT
+config_sys.ARCHIVE_DIR = os.path.join(DATAROOT, 'archives')
+sys.modules['config_sys'] = config_sys
+
+# The tests bring their own credentials; they never load the real ones
+try :
+    import api_secrets
+except ImportError :
+    sys.modules['api_secrets'] = types.ModuleType('api_secrets')
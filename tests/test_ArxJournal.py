@@ -0,0 +1,61 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Committing and replaying archive index journals.
+'''
+
+import pytest
+
+from ArxJournal import ArxJournal, JournalConflict, writeIndex
+
+
+def newArx() :
+    return {'query' : 'alpha', 'filters' : None, 'unfinished' : None, 'finished' : []}
+
+def loadArx(index_file) :
+    return ArxJournal(str(index_file)).load(newArx())
+
+
+def testReplaysCommits(tmp_path) :
+    index_file = tmp_path / 'index.arx'
+    writeIndex(str(index_file), newArx())
+    journal = ArxJournal(str(index_file))
+    arx = journal.load(newArx())
+    arx['finished'].append([1, 10, 100, 1000])
+    journal.commit(arx)
+    arx['unfinished'] = [11, 20, 1001, 2000]
+    journal.commit(arx)
+    assert journal.num_entries == 2
+    assert loadArx(index_file) == arx
+
+def testCutsOffTornLine(tmp_path) :
+    index_file = tmp_path / 'index.arx'
+    journal = ArxJournal(str(index_file))
+    arx = journal.load(newArx())
+    arx['finished'].append([1, 10, 100, 1000])
+    journal.commit(arx)
+    with open(journal.journal_file, 'ab') as fout :
+        fout.write(b'[["unfinished",null,[11,')
+
+    # A new reader skips the torn line, and its next commit replaces it
+    journal = ArxJournal(str(index_file))
+    arx = journal.load(newArx())
+    arx['unfinished'] = [11, 20, 1001, 2000]
+    journal.commit(arx)
+    assert loadArx(index_file) == arx
+
+def testRefusesToCutOffOtherWriters(tmp_path) :
+    index_file = tmp_path / 'index.arx'
+    first = ArxJournal(str(index_file)); second = ArxJournal(str(index_file))
+    first_arx = first.load(newArx()); second_arx = second.load(newArx())
+
+    second_arx['finished'].append([1, 10, 100, 1000])
+    second.commit(second_arx)
+    first_arx['unfinished'] = [11, 20, 1001, 2000]
+    with pytest.raises(JournalConflict) :
+        first.commit(first_arx)
+
+    # The other writer's entry is still there
+    assert loadArx(index_file) == second_arx
@@ -0,0 +1,72 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+The batch and incremental CI engines against CIGraph.calcCI.
+'''
+
+import numpy as np
+import pytest
+
+from CIGraph import CIGraph, IncrementalCI
+
+
+def randomGraph(num_nodes, num_edges, seed) :
+    '''
+    Directed graph with a few hubs, duplicate edges dropped
+    '''
+    rng = np.random.RandomState(seed)
+    src = rng.randint(0, num_nodes, num_edges)
+    dst = (rng.pareto(1.2, num_edges) * 3).astype(int) % num_nodes
+    edges = sorted(set((u, v) for u, v in zip(src.tolist(), dst.tolist()) if u != v))
+    return CIGraph([u for u, v in edges], [v for u, v in edges], list(range(num_nodes)))
+
+def calcCIs(cig, ball_rad, directed=True, treelike=True, CP=False) :
+    return [cig.calcCI(node, ball_rad, directed, treelike, CP) for node in range(cig.num_nodes)]
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('ball_rad', [1, 2, 3])
+def testBatchCIMatchesCalcCI(seed, ball_rad) :
+    cig = randomGraph(150, 500, seed)
+    removals = np.random.RandomState(seed).permutation(cig.num_nodes)[:20]
+    for removed in (False, True) :
+        if removed :
+            for node in removals.tolist() :
+                cig.removeNode(node)
+        for directed in (True, False) :
+            for treelike in (True, False) :
+                for CP in (False, True) :
+                    expected = calcCIs(cig, ball_rad, directed, treelike, CP)
+                    assert cig.batchCI(ball_rad, directed, treelike, CP) == expected
+                    assert cig.batchCI(ball_rad, directed, treelike, CP, chunk_size=7) == expected
+
+                    # Any subset of nodes, in any order
+                    nodes = np.random.RandomState(seed).permutation(cig.num_nodes)[:40]
+                    assert cig.batchCI(ball_rad, directed, treelike, CP, nodes=nodes) == [expected[n] for n in nodes]
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('ball_rad', [1, 2, 3])
+def testIncrementalCIMatchesCalcCI(seed, ball_rad) :
+    cig = randomGraph(150, 500, seed)
+    engine = IncrementalCI(cig, ball_rad)
+    assert engine.allCIs() == calcCIs(cig, ball_rad)
+
+    # Take out the top node each time, like the CI run does
+    for k in range(40) :
+        ci_values = engine.allCIs()
+        node = int(np.argmax(ci_values))
+        if k % 2 == 0 :
+            engine.removeNode(node, cig.inBall(node, ball_rad))
+        else :
+            engine.removeNode(node)
+        expected = calcCIs(cig, ball_rad)
+        assert engine.allCIs() == expected
+        assert [engine.calcCI(n) for n in range(cig.num_nodes)] == expected
+
+def testShellSumsSplitAcrossRanges() :
+    cig = randomGraph(200, 700, 5)
+    sums = cig.shellSums(2)
+    assert np.concatenate([cig.shellSums(2, nodes=np.arange(start, min(start + 64, 200)))
+                           for start in range(0, 200, 64)]).tolist() == sums.tolist()
@@ -0,0 +1,266 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Search collection against stub and local fake search endpoints.
+'''
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+
+import TwAPIer
+from TwAPIer import TwiAPIer, collectSearch
+from RateLimits import RateScheduler
+from SearchCollector import SearchCollector
+from TwArchive import TweetArchive
+
+
+TWEPOCH_MS = 1288834974657
+
+def makeTweets(n, offset=0) :
+    '''
+    n tweets ten seconds apart, newest first, with snowflake IDs
+    '''
+    tweets = []
+    for k in range(n) :
+        epoch = 1500000000 + 10 * k
+        tweets.append({'id' : ((epoch * 1000 - TWEPOCH_MS) << 22) + offset,
+                       'created_at' : datetime.fromtimestamp(epoch, timezone.utc).strftime('%a %b %d %H:%M:%S +0000 %Y'),
+                       'text' : 'tweet %d' % k})
+    tweets.reverse()
+    return tweets
+
+
+class StubArchive(dict) :
+    '''
+    Just enough of a TweetArchive for collectSearch
+    '''
+
+    def __init__(self, query, filters=None) :
+        dict.__init__(self, query=query, filters=filters)
+        self.appended = []
+
+    def getBounds(self) :
+        return (None, None, None, None)
+
+    def appendTweets(self, tweets, exhausted=False) :
+        self.appended.append((tweets, exhausted))
+
+
+def stubSend(pages) :
+    '''
+    A send() answering with pages of tweets of the given sizes, then None
+    (out of requests). Records the bounds and options it was sent.
+    '''
+    tweets = makeTweets(sum(pages))
+    sent = []
+    def send(query, bounds, lang, filters, wait) :
+        sent.append((bounds, lang, filters, wait))
+        if len(sent) > len(pages) :
+            return None, [], True
+        start = sum(pages[:len(sent) - 1])
+        return SimpleNamespace(status_code=200), tweets[start:start + pages[len(sent) - 1]], False
+    return send, sent, tweets
+
+
+def testCollectsUntilEmptyPage() :
+    arx = StubArchive('alpha')
+    send, sent, tweets = stubSend([100, 100, 50, 0])
+    assert collectSearch(arx, send, req_limit=10) == (True, False, 4, 250)
+    assert arx.appended == [(tweets, True)]
+
+    # Each request picks up below the oldest tweet so far
+    assert sent[0][0][1] is None
+    assert [bounds[1] for bounds, _, _, _ in sent[1:]] == [tweets[99]['id'] - 1, tweets[199]['id'] - 1, tweets[249]['id'] - 1]
+
+def testExhaustsOnThinPages() :
+    arx = StubArchive('alpha')
+    send, sent, tweets = stubSend([5, 5, 5, 5])
+    assert collectSearch(arx, send, req_limit=10) == (True, False, 3, 15)
+    assert arx.appended == [(tweets[:15], True)]
+
+def testStopsAtRequestLimit() :
+    arx = StubArchive('alpha')
+    send, sent, tweets = stubSend([100, 100, 100])
+    assert collectSearch(arx, send, req_limit=2) == (False, False, 2, 200)
+    assert arx.appended == [(tweets[:200], False)]
+
+    arx = StubArchive('alpha')
+    send, sent, tweets = stubSend([100, 100, 100])
+    collectSearch(arx, send, req_limit=2, auto_exhaust=True)
+    assert arx.appended == [(tweets[:200], True)]
+
+def testStopsOutOfRequests() :
+    for exhaust_on_ratelimit in (False, True) :
+        arx = StubArchive('alpha')
+        send, sent, tweets = stubSend([100])
+        assert collectSearch(arx, send, exhaust_on_ratelimit=exhaust_on_ratelimit) == (False, True, 1, 100)
+        assert arx.appended == [(tweets[:100], exhaust_on_ratelimit)]
+
+        # No request limit means no waiting on the rate limit
+        assert [wait for _, _, _, wait in sent] == [False, False]
+
+def testLanguageFilter() :
+    filters = {'lang' : 'fr', 'result_type' : 'mixed'}
+    arx = StubArchive('alpha', filters)
+    send, sent, tweets = stubSend([0])
+    collectSearch(arx, send, req_limit=1)
+    assert sent[0][1:3] == ('fr', {'result_type' : 'mixed'})
+    assert arx['filters'] == {'lang' : 'fr', 'result_type' : 'mixed'}
+
+
+class FakeSearch(object) :
+    '''
+    Local stand-in for the search endpoint: pages back through canned tweets
+    for each query, and rate-limits each credential (told apart by its
+    Authorization header) to limit requests a window, reporting it in the
+    x-rate-limit-* headers unless report_limits is cleared.
+    '''
+
+    def __init__(self, tweets, limit, window=15 * 60) :
+        self.tweets = tweets
+        self.limit = limit
+        self.window = window
+        self.report_limits = True
+        self.remaining = {}
+        self.hits = {}          # (credential, query) : requests answered
+        self.lock = threading.Lock()
+        search = self
+
+        class Handler(BaseHTTPRequestHandler) :
+            protocol_version = 'HTTP/1.1'
+            def log_message(self, *args) :
+                pass
+            def do_GET(self) :
+                code, headers, body = search.answer(self.headers.get('Authorization'),
+                                                    parse_qs(urlparse(self.path).query))
+                self.send_response(code)
+                for key, value in headers.items() :
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/search' % self.server.server_address[1]
+        self.reset = int(time.time() + window)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, credential, params) :
+        query = params['q'][0]
+        max_id = int(params['max_id'][0]) if 'max_id' in params else None
+        since_id = int(params['since_id'][0]) if 'since_id' in params else None
+        with self.lock :
+            remaining = self.remaining.get(credential, self.limit)
+            headers = {'x-rate-limit-limit' : str(self.limit),
+                       'x-rate-limit-remaining' : str(max(remaining - 1, 0)),
+                       'x-rate-limit-reset' : str(self.reset)} if self.report_limits else {}
+            if remaining <= 0 :
+                return 429, headers, b'{"errors":[{"code":88,"message":"Rate limit exceeded"}]}'
+            self.remaining[credential] = remaining - 1
+            self.hits[credential, query] = self.hits.get((credential, query), 0) + 1
+        page = [tweet for tweet in self.tweets[query]
+                if (max_id is None or tweet['id'] <= max_id) and (since_id is None or tweet['id'] > since_id)]
+        return 200, headers, json.dumps({'statuses' : page[:int(params['count'][0])]}).encode('utf-8')
+
+    def requests(self, credential=None, query=None) :
+        return sum(hits for (cred, q), hits in self.hits.items()
+                   if credential in (None, cred) and query in (None, q))
+
+    def close(self) :
+        self.server.shutdown()
+        self.server.server_close()
+
+
+TOPICS = {'alpha' : makeTweets(250, 1), 'beta' : makeTweets(120, 2), 'gamma' : makeTweets(5, 3)}
+
+@pytest.fixture
+def search(monkeypatch) :
+    '''
+    Fake search endpoint for TOPICS, allowing 20 requests per credential
+    '''
+    fake = FakeSearch(TOPICS, 20)
+    monkeypatch.setattr(TwAPIer, 'SEARCH_URL', fake.url)
+    yield fake
+    fake.close()
+
+def searchAPIs(num_creds) :
+    apis = []
+    for k in range(num_creds) :
+        api = TwiAPIer(api_keys={})
+        api.tcp_sess = requests.Session()
+        api.tcp_sess.headers['Authorization'] = 'cred%d' % k
+        apis.append(api)
+    return apis
+
+def archivedIDs(query, archive_dir) :
+    return sorted(tweet['id'] for tweet in TweetArchive(query, archive_dir=str(archive_dir)).iterTweets())
+
+
+def testCollectorFillsEveryArchive(search, tmp_path) :
+    collector = SearchCollector(apis=searchAPIs(3), limit=20, verbose=False)
+    results = collector.collect(list(TOPICS), req_limit=10, archive_dir=str(tmp_path))
+    assert results == {query : (True, False) for query in TOPICS}
+    for query, tweets in TOPICS.items() :
+        assert archivedIDs(query, tmp_path) == sorted(tweet['id'] for tweet in tweets)
+
+    # Full pages until an empty one; the thin one ends early
+    assert [search.requests(query=query) for query in TOPICS] == [4, 3, 2]
+
+    # The requests went round the credentials, as their budgets show
+    assert sorted(search.requests(credential='cred%d' % k) for k in range(3)) == [3, 3, 3]
+    assert collector.budgets.remaining() == 3 * 20 - 9
+
+def testCollectorRespectsRequestLimit(search, tmp_path) :
+    collector = SearchCollector(apis=searchAPIs(2), limit=20, verbose=False)
+    results = collector.collect(['alpha', 'beta'], req_limit=2, archive_dir=str(tmp_path))
+    assert results == {'alpha' : (False, False), 'beta' : (False, False)}
+    assert search.requests(query='alpha') == search.requests(query='beta') == 2
+    assert archivedIDs('alpha', tmp_path) == sorted(tweet['id'] for tweet in TOPICS['alpha'][:200])
+    assert archivedIDs('beta', tmp_path) == sorted(tweet['id'] for tweet in TOPICS['beta'])
+
+def testCollectorEndsPassOutOfRequests(search, tmp_path) :
+    # Two credentials with 3 requests each can't finish alpha, beta and gamma (9 requests)
+    search.limit = 3
+    collector = SearchCollector(apis=searchAPIs(2), limit=3, verbose=False)
+    results = collector.collect(list(TOPICS), req_limit=0, archive_dir=str(tmp_path))
+    assert search.requests() == 6
+    assert [search.requests(credential='cred%d' % k) for k in range(2)] == [3, 3]
+    assert collector.budgets.remaining() == 0
+    assert any(rate_limited and not exhausted for exhausted, rate_limited in results.values())
+
+    # Whatever came back was archived, newest first without gaps
+    for query, tweets in TOPICS.items() :
+        ids = archivedIDs(query, tmp_path)
+        assert ids == sorted(tweet['id'] for tweet in tweets[:len(ids)])
+
+def testCollectorMovesOnFromRateLimitedCredential(search, tmp_path) :
+    # Without rate-limit headers the budgets only learn of the limit from a 429
+    search.limit = 1
+    search.report_limits = False
+    collector = SearchCollector(apis=searchAPIs(2), limit=20, verbose=False)
+    results = collector.collect(['alpha'], req_limit=0, archive_dir=str(tmp_path))
+    assert results == {'alpha' : (False, True)}
+    assert search.requests() == 2
+    assert collector.budgets.remaining() == 0
+    assert archivedIDs('alpha', tmp_path) == sorted(tweet['id'] for tweet in TOPICS['alpha'][:200])
+
+
+def testSchedulerSplitsBudgetByYield() :
+    scheduler = RateScheduler(limit=100)
+    scheduler.record('busy', 4, 400)
+    scheduler.record('slow', 4, 40)
+    allocation = scheduler.allocate(['busy', 'slow', 'new'], 24)
+    assert allocation == {'busy' : 11, 'slow' : 2, 'new' : 11}
+
+    # Everyone keeps a floor, however little the window has left
+    assert scheduler.allocate(['busy', 'slow', 'new'], 3) == {'busy' : 1, 'slow' : 1, 'new' : 1}
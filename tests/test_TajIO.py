@@ -0,0 +1,26 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Counting tweets in TAJ files without parsing them.
+'''
+
+import TajIO
+
+
+LINES = [b'{"id":1}\n', b'\n', b'{"id":2}\n', b'  \r\n', b'\n', b'{"id":3}\n', b'{"id":\n', b'\n']
+
+def testCountSkipsBlankLines(tmp_path) :
+    taj_file = str(tmp_path / 'tweets.taj')
+    with open(taj_file, 'wb') as fout :
+        fout.write(b''.join(LINES))
+    offsets = [0]
+    for line in LINES :
+        offsets.append(offsets[-1] + len(line))
+
+    # Garbled lines still count, blank ones don't, however the reads split them
+    for buf_size in (1, 2, 3, 8192) :
+        assert TajIO.countLines(taj_file, buf_size=buf_size) == 4
+        assert TajIO.countLines(taj_file, offsets[1], offsets[5], buf_size=buf_size) == 1
+        assert TajIO.countLines(taj_file, offsets[3], buf_size=buf_size) == 2
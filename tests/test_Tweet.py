@@ -0,0 +1,37 @@
+'''
+Created on Oct 18, 2026
+
+@author: geofurb
+
+Relations pulled out of a tweet.
+'''
+
+import Tweet
+
+
+TWEET = {'id' : 10, 'user' : {'id' : 1},
+         'retweeted_status' : {'user' : {'id' : 2}},
+         'in_reply_to_user_id' : 3,
+         'quoted_status' : {'user' : {'id' : 4}},
+         'entities' : {'user_mentions' : [{'id' : 2}, {'id' : 5}, {'id' : 1}, {'id' : 5}, {'id' : 6}]}}
+
+
+def testRelationFields() :
+    relations = Tweet.extractRelations(TWEET)
+    assert relations._fields == Tweet.RELATION_FIELDS
+    assert tuple(relations) == (1, 2, 3, 4, [2, 5, 1, 5, 6])
+
+    # Fields not looked up are left out
+    assert Tweet.extractRelations(TWEET, ('tweeter', 'quoted')) == (1, None, None, 4, None)
+
+def testRelationsMatchInfluencers() :
+    relations = Tweet.getRelations(TWEET)
+    assert relations._fields == Tweet.RELATION_FIELDS
+    assert tuple(relations) == (1, [2], [3], [4], [5, 6])
+    assert relations.retweeted == Tweet.getRetweetInfluencers(TWEET)[1]
+    assert relations.replied == Tweet.getReplyInfluencers(TWEET)[1]
+    assert relations.quoted == Tweet.getQuoteInfluencers(TWEET)[1]
+    assert sorted(relations.mentions) == sorted(Tweet.getMentionInfluencers(TWEET)[1])
+
+def testRelationsWithoutTweeter() :
+    assert tuple(Tweet.getRelations({'id' : 10})) == (None, [], [], [], [])